@@ -14,9 +14,15 @@ import time
 from ADCS_Util import *
 import csv
 from RobotClock import Clock
+from IMU_Sampler import IMUSampler
 
 class ADCS(object):
-    def __init__(self, test_points:int=10, verbose:bool=False, enabled:bool=True):
+    def __init__(self, test_points:int=10, verbose:bool=False, enabled:bool=True, sensor=None, sample_rate:float=None):
+        """
+        sensor => the BNO055 driver, defaults to the one on the Pi's I2C bus (IMU_Sampler.FakeBNO055 off the robot).\n
+        sample_rate => samples per second for a background IMU_Sampler.IMUSampler started after calibration, update()
+        then reads its latest sample instead of the bus. None reads the sensor inside update().
+        """
         #Set number of test points for calibration
         self.__test_points = test_points
         #Determine whether the ADCS System will print testing data to terminal
@@ -25,8 +31,11 @@ class ADCS(object):
         self.__enabled = enabled
         
         #Declare the sensor device
-        self.__i2c = busio.I2C(board.SCL, board.SDA)
-        self.__sensor = adafruit_bno055.BNO055_I2C(self.__i2c)
+        if sensor is None:
+            self.__i2c = busio.I2C(board.SCL, board.SDA)
+            sensor = adafruit_bno055.BNO055_I2C(self.__i2c)
+        self.__sensor = sensor
+        self.__sampler = None
         #initialize the clock.
         self.__clock = Clock()
 
@@ -39,6 +48,8 @@ class ADCS(object):
 
         self.__position = (0,0,0)
         self.__previous_position = (0,0,0)
+
+        self.__gyro = (0,0,0)
         
         #calibrate accelerometer and get offset values
         self.__accelerometer_offset = self.calibrate_accelerometer()
@@ -62,18 +73,30 @@ class ADCS(object):
         self.__runtime = self.__clock.get_time("run")
         self.__time = self.__clock.get_time("current")
 
+        #calibration reads the sensor directly, the sampler only starts once it is done
+        if sample_rate is not None:
+            self.__sampler = IMUSampler(self.__sensor, rate=sample_rate, verbose=verbose)
+            self.__sampler.start()
+
     def calibrate(self):
-        #calibrate accelerometer and get offset values
-        self.__accelerometer_offset = self.calibrate_accelerometer()
+        #calibration reads the sensor directly, keep the sampler off the I2C bus until it is done
+        if self.__sampler is not None:
+            self.__sampler.pause()
+        try:
+            #calibrate accelerometer and get offset values
+            self.__accelerometer_offset = self.calibrate_accelerometer()
 
-        #calibrate magnetometer and get offset values
-        self.__mag_offset = self.calibrate_mag()
+            #calibrate magnetometer and get offset values
+            self.__mag_offset = self.calibrate_mag()
 
-        #calibrate gyroscope and get offset values
-        self.__gyro_offset = self.calibrate_gyro()
+            #calibrate gyroscope and get offset values
+            self.__gyro_offset = self.calibrate_gyro()
 
-        #set initial angle
-        self.__previous_orientation = self.__orientation = self.__initial_orientation = self.set_initial(self.__mag_offset)
+            #set initial angle
+            self.__previous_orientation = self.__orientation = self.__initial_orientation = self.set_initial(self.__mag_offset)
+        finally:
+            if self.__sampler is not None:
+                self.__sampler.resume()
 
         self.__orientation_zeroed = self.zero_orientation()
         #zero the orientation to intitial orientation of robot
@@ -92,13 +115,23 @@ class ADCS(object):
         self.__clock.update()
         self.__runtime = self.__clock.get_time("run")
         self.__time = self.__clock.get_time("current")
-        self.__euler = self.__sensor.euler
-        self.__quaternion = self.__sensor.quaternion
-        self.__linear_acceleration = self.__sensor.linear_acceleration
-        self.__gravity = self.__sensor.gravity
-        self.__raw_acceleration = self.__sensor.acceleration
-        self.__magnetometer = self.__sensor.magnetic
-        self.__gyro = self.__sensor.gyro
+        sample = None if self.__sampler is None else self.__sampler.get_latest()
+        if sample is not None:
+            self.__euler = tuple(sample['euler'])
+            self.__quaternion = tuple(sample['quaternion'])
+            self.__linear_acceleration = tuple(sample['linear_acceleration'])
+            self.__gravity = tuple(sample['gravity'])
+            self.__raw_acceleration = tuple(sample['acceleration'])
+            self.__magnetometer = tuple(sample['magnetic'])
+            self.__gyro = tuple(sample['gyro'])
+        else:
+            self.__euler = self.__sensor.euler
+            self.__quaternion = self.__sensor.quaternion
+            self.__linear_acceleration = self.__sensor.linear_acceleration
+            self.__gravity = self.__sensor.gravity
+            self.__raw_acceleration = self.__sensor.acceleration
+            self.__magnetometer = self.__sensor.magnetic
+            self.__gyro = self.__sensor.gyro
 
         self.__acceleration = self.__linear_acceleration
 
@@ -170,6 +203,16 @@ class ADCS(object):
             print(f"[INFO] RPY_AM {(round(self.__roll_am,2), round(self.__pitch_am,2), round(self.__yaw_am,2))} (degrees)")
             print(f"[INFO] RPY_F {self.__orientation}")
 
+    def __read_sensor(self, name):
+        """reads a sensor property, with the background sampler paused so the two never share the I2C bus"""
+        if self.__sampler is None:
+            return getattr(self.__sensor, name)
+        self.__sampler.pause()
+        try:
+            return getattr(self.__sensor, name)
+        finally:
+            self.__sampler.resume()
+
     def calibrate_accelerometer(self):
         calibration_pause = 1
 
@@ -182,7 +225,7 @@ class ADCS(object):
         print("Calibrating...")
         numTestPoints = 0;
         while numTestPoints < self.__test_points:
-            accelX, accelY, accelZ = self.__sensor.linear_acceleration
+            accelX, accelY, accelZ = self.__read_sensor("linear_acceleration")
             if(self.__verbose):
                 print(f"Acceleration (x,y,z) @ n={numTestPoints}: {(accelX, accelY, accelZ)}")
             accelXList.append(accelX)
@@ -214,8 +257,8 @@ class ADCS(object):
 
     def set_initial(self, mag_offset = [0,0,0]):
         calibration_pause=.001
-        accelX, accelY, accelZ =  self.__sensor.acceleration #m/s^2
-        magX, magY, magZ = self.__sensor.magnetic #gauss
+        accelX, accelY, accelZ = self.__read_sensor("acceleration") #m/s^2
+        magX, magY, magZ = self.__read_sensor("magnetic") #gauss
 
         #Sets the initial position for plotting and gyro calculations.
         print("[CALIBRATION] Preparing to set initial orientation. Please hold the IMU still.")
@@ -246,7 +289,7 @@ class ADCS(object):
         print("Calibrating...")
         numTestPoints = 0;
         while numTestPoints < self.__test_points:
-            magX, magY, magZ = self.__sensor.magnetic
+            magX, magY, magZ = self.__read_sensor("magnetic")
             if(self.__verbose):
                 print(f"Mag(x,y,z)@{numTestPoints}: {(magX, magY, magZ)}")
             rollList.append(magX)
@@ -276,7 +319,7 @@ class ADCS(object):
 
         numTestPoints = 0;
         while numTestPoints < self.__test_points:
-            gyroX, gyroY, gyroZ = self.__sensor.gyro
+            gyroX, gyroY, gyroZ = self.__read_sensor("gyro")
             if(self.__verbose):
                 print(f"Gyro(x,y,z)@{numTestPoints}: {(gyroX, gyroY, gyroZ)}")
             rollList = rollList + [gyroX]
@@ -315,6 +358,18 @@ class ADCS(object):
     def get_data(self):
         return(self.__time, self.__raw_acceleration, self.__acceleration, self.__velocity, self.__position, self.__orientation)
 
+    def get_gyro(self):
+        """returns the offset corrected angular rate (x,y,z) in deg/s from the last update()"""
+        return self.__gyro
+
+    def get_sampler(self):
+        """returns the background IMUSampler (latest sample and history windows), or None when update() reads the bus"""
+        return self.__sampler
+
+    def stop(self):
+        if self.__sampler is not None:
+            self.__sampler.stop()
+
     def init_csv(self):
         with open('./imu_data.csv', 'w') as csvfile:
             data = csv.writer(csvfile, delimiter =',', quotechar='|', quoting=csv.QUOTE_MINIMAL)
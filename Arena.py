@@ -0,0 +1,133 @@
+import numpy as np
+
+
+class Sphere(object):
+    """
+    An object repersenting the ping pong ball / tennis ball / buoy.\n
+    position => (x, y, range, bearing): x forward and y right of the camera in cm, range in cm and bearing in degrees.\n
+    Spheres made by Sphere_Detector also carry the pixel center and radius they were seen at.
+    """
+    def __init__(self, position, radius, pixel_center=None, pixel_radius=None):
+        self.__position = position
+        self.__radius = radius
+        self.__pixel_center = pixel_center
+        self.__pixel_radius = pixel_radius
+
+    def __repr__(self):
+        return f"{type(self).__name__} @ {self.get_range():.1f} cm, {self.get_bearing():.1f} deg"
+
+    def update_position(self, newpos):
+        postn = (newpos[0], newpos[1], self.__position[2], self.__position[3])
+        self.__position = postn
+
+    def get_position(self):
+        return self.__position
+
+    def get_radius(self):
+        """returns the radius in cm"""
+        return self.__radius
+
+    def get_range(self):
+        """returns the distance from the camera to the sphere center in cm"""
+        return self.__position[2]
+
+    def get_bearing(self):
+        """returns the azimuth of the sphere in degrees, positive to the right"""
+        return self.__position[3]
+
+    def get_pixel_center(self):
+        return self.__pixel_center
+
+    def get_pixel_radius(self):
+        return self.__pixel_radius
+
+
+class PingPongBall(Sphere):
+    RADIUS = 2.0 #cm, a 40 mm ball (0.79 inches)
+    def __init__(self, position, **kwargs):
+        super().__init__(position, self.RADIUS, **kwargs)
+
+    
+class TennisBall(Sphere):
+    RADIUS = 3.35 #cm, a 6.7 cm ball
+    def __init__(self, position, **kwargs):
+        super().__init__(position, self.RADIUS, **kwargs)
+
+
+class RedBuoy(Sphere):
+    RADIUS = 3.5 #cm, a 7 cm buoy (Floor_ROI.TARGET_HEIGHT)
+    def __init__(self, position, **kwargs):
+        super().__init__(position, self.RADIUS, **kwargs)
+
+
+class SimulatedArena(object):
+    """
+    A stand-in arena around a stationary robot, for trying camera pan strategies off the robot. Balls appear at
+    random times, mostly inside a few hot sectors (the corners and walls they collect against), stay for a random
+    lifetime and are then gone (picked up or pushed away).\n
+    observe() returns what the camera would see at a pan angle. Bearings are robot bearings in degrees (positive to
+    the right, +-180 behind), as Sweep_Scheduler.robot_bearings gives for real detections.
+    """
+    def __init__(self, hot_sectors:tuple=((-135.0, 40.0), (45.0, 30.0), (100.0, 20.0)), spawn_rate:float=0.5,
+                 mean_lifetime:float=8.0, background_fraction:float=0.15, detect_probability:float=0.9,
+                 seed:int=0):
+        """
+        hot_sectors => (center bearing, width) in degrees of the sectors balls collect in.\n
+        spawn_rate => new balls per second, background_fraction of them anywhere around the robot.\n
+        mean_lifetime => mean seconds a ball stays.\n
+        detect_probability => chance a ball in view is detected on a frame.
+        """
+        self.__rng = np.random.default_rng(seed)
+        self.__hot_sectors = hot_sectors
+        self.__spawn_rate = spawn_rate
+        self.__mean_lifetime = mean_lifetime
+        self.__background_fraction = background_fraction
+        self.__detect_probability = detect_probability
+        self.__time = 0.0
+        self.__next_id = 0
+        self.__balls = {}
+        self.__spawned = 0
+
+    def get_spawned(self):
+        return self.__spawned
+
+    def get_balls(self):
+        """returns {id: (Sphere, expiry time)} of the balls currently in the arena"""
+        return dict(self.__balls)
+
+    def __spawn(self, t:float):
+        rng = self.__rng
+        if rng.random() < self.__background_fraction:
+            bearing = rng.uniform(-180.0, 180.0)
+        else:
+            center, width = self.__hot_sectors[rng.integers(len(self.__hot_sectors))]
+            bearing = (center + rng.uniform(-width / 2, width / 2) + 180.0) % 360.0 - 180.0
+        distance = rng.uniform(30.0, 200.0)
+        position = (distance * np.cos(np.radians(bearing)), distance * np.sin(np.radians(bearing)),
+                    distance, bearing)
+        ball = PingPongBall(position) if rng.random() < 0.5 else TennisBall(position)
+        self.__balls[self.__next_id] = (ball, t + rng.exponential(self.__mean_lifetime))
+        self.__next_id += 1
+        self.__spawned += 1
+
+    def advance(self, t:float):
+        """moves the arena on to time t (seconds), spawning and removing balls"""
+        rng = self.__rng
+        while True:
+            spawn_time = self.__time + rng.exponential(1.0 / self.__spawn_rate)
+            if spawn_time > t:
+                break
+            self.__time = spawn_time
+            self.__spawn(spawn_time)
+        self.__time = t
+        self.__balls = {i: (ball, expiry) for i, (ball, expiry) in self.__balls.items() if expiry > t}
+
+    def observe(self, pan_deg:float, t:float, fov_deg:float=62.2):
+        """returns [(id, robot bearing)] of the balls detected from pan angle pan_deg at time t"""
+        self.advance(t)
+        seen = []
+        for i, (ball, _) in self.__balls.items():
+            offset = (ball.get_bearing() - pan_deg + 180.0) % 360.0 - 180.0
+            if (abs(offset) <= fov_deg / 2) and (self.__rng.random() < self.__detect_probability):
+                seen.append((i, ball.get_bearing()))
+        return seen
@@ -1,6 +1,7 @@
 import os
 import pathlib
 import sys
+import atexit
 # if (os.uname().nodename == 'robotpi') or (os.uname().nodename == 'terminatorpi'):
 #     pass
 from gpiozero import Motor
@@ -17,6 +18,8 @@ from Sonar import Sonar
 from Servo_Motors import ServoMotor
 from RGB_Indicator import RGB_Indicator
 from CameraMount import CameraMount
+from Sweep_Scheduler import SweepScheduler
+from Pan_Planner import PanPlanner
 from RobotClock import Clock
 
 import psutil
@@ -67,8 +70,13 @@ class AutonomousController(object):
         self.ultrasound_enabled = False
         
         self.__camera_mount = CameraMount(top_servo_pin, bottom_servo_pin)
-        self.__adcs = ADCS(test_points=10, verbose=True, enabled=True)
-        self.__image_processor = ImageProcessor('./', verbose=True, enabled=True)
+        #the mount sweeps on its own thread, frames are stamped with its pose instead of the loop waiting for the servos
+        #the planner is fed the spheres seen on each frame (sphere_detection), not the red buoys
+        self.__sweep = SweepScheduler(self.__camera_mount, planner=PanPlanner())
+        self.__sweep.start()
+        #the IMU is sampled on its own thread, update() reads the latest sample instead of the I2C bus
+        self.__adcs = ADCS(test_points=10, verbose=True, enabled=True, sample_rate=100.0)
+        self.__image_processor = ImageProcessor('./', verbose=True, enabled=True, threaded_capture=True, motion_gating=True, floor_roi=True, tracking=True, sphere_detection=True, sweep=self.__sweep)
         
         self.__first_start = True
         self.__start_time = None
@@ -139,6 +147,13 @@ class AutonomousController(object):
         self.driveMotors.stop_drive_motors()
         # self.stop_intake()
 
+    def shutdown(self):
+        """stops the motors and the sweep, vision and IMU threads/processes, so the servos and camera are released"""
+        self.stop_motors()
+        self.__sweep.stop()
+        self.__image_processor.stop()
+        self.__adcs.stop()
+
     def run_avoidance_check(self, threshold, ignore = False):
         left_distance, right_distance = self.get_distances()
         print("check")
@@ -285,11 +300,9 @@ class AutonomousController(object):
             self.__timer = self.__current_time - self.__start_time
             self.__competition_timer = self.__current_time - self.__competition_start_time
         
-        self.__camera_mount.revolve()
-
         if(self.__camera_enabled):
             try:
-                self.__image_processor.run()
+                self.__image_processor.run(gyro_rate=self.__adcs.get_gyro())
             except:
                 pass
         
@@ -321,6 +334,8 @@ class AutonomousController(object):
         pass
 if __name__ == "__main__":
     autonomousController = AutonomousController()
+    #runs on the endgame sys.exit(), Ctrl+C or any other way out of the loop
+    atexit.register(autonomousController.shutdown)
     
     while(True):
         # autonomousController.decide()
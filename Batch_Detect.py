@@ -0,0 +1,261 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import pathlib
+import pickle
+import shutil
+import sys
+import sqlite3
+import time
+
+import numpy as np
+import cv2
+
+from Frame_Logger import sorted_frame_paths, parse_frame_timestamp
+
+#bump when the detectors change in a way that makes cached results stale
+RESULTS_VERSION = 2
+
+DEFAULT_PARAMS = {"red_range": (110, 255), "green_range": (0, 50), "blue_range": (0, 50),
+                  "filter_size": 9, "blob_size": 30, "thresh": 50, "min_area": 100,
+                  "tags": False}
+
+
+def params_key(params:dict):
+    """returns a short hash of the detector parameters, part of every cache key"""
+    text = json.dumps({"version": RESULTS_VERSION, **params}, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+class ResultCache(object):
+    """On-disk cache of per-frame detection results, keyed by frame content hash plus detector parameters."""
+    def __init__(self, path:str):
+        self.__connection = sqlite3.connect(str(path))
+        self.__connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB)")
+        self.__connection.commit()
+
+    def get(self, key:str):
+        row = self.__connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def put(self, key:str, result:dict):
+        self.__connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?)", (key, pickle.dumps(result)))
+
+    def commit(self):
+        self.__connection.commit()
+
+    def close(self):
+        self.__connection.commit()
+        self.__connection.close()
+
+
+def _init_worker(params:dict):
+    """sets up the Camera_Util detectors once per worker process"""
+    global Camera_Util, _params
+    import Camera_Util
+    _params = params
+    Camera_Util.buoy_detector = Camera_Util.BuoyDetector(red_range=params["red_range"],
+                                                         green_range=params["green_range"],
+                                                         blue_range=params["blue_range"],
+                                                         filter_size=params["filter_size"],
+                                                         blob_size=params["blob_size"],
+                                                         thresh=params["thresh"],
+                                                         min_area=params["min_area"])
+
+
+def frame_key(path, key_suffix:str):
+    """returns the cache key of a frame file, the hash of its bytes plus the parameters key"""
+    return hashlib.sha1(pathlib.Path(path).read_bytes()).hexdigest() + key_suffix
+
+
+def _detect(job):
+    """reads and runs the detectors on one frame file, called in the worker processes"""
+    index, path = job
+    image = cv2.imread(str(path), cv2.IMREAD_COLOR)
+    result = {"buoys": np.empty((0,), dtype=Camera_Util.DETECTION_DTYPE),
+              "tag_ids": [], "tag_families": [], "tag_centers": [], "tag_angles": []}
+    if image is None:
+        return index, result
+    result["buoys"], _, _ = Camera_Util.detect_buoys(image)
+    if _params["tags"]:
+        tags = Camera_Util.detect_apriltags(image)
+        result["tag_ids"] = [int(i) for i in tags['id']]
+        result["tag_families"] = [str(f) for f in tags['family']]
+        result["tag_centers"] = [(float(x), float(y)) for x, y in zip(tags['x'], tags['y'])]
+        result["tag_angles"] = [float(a) for a in tags['bearing']]
+    return index, result
+
+
+#raw column files a ColumnWriter appends to, "done" (written last) lists the frames whose rows are complete
+PART_DTYPES = {"buoys": None, "buoy_frame": np.int64, "tag_frame": np.int64, "tag_id": np.int32,
+               "tag_family": 'U16', "tag_x": np.float32, "tag_y": np.float32, "tag_bearing": np.float32,
+               "done": np.int64}
+
+
+def parts_dir(out_path:str):
+    """returns the directory a ColumnWriter streams the columns of out_path into"""
+    return pathlib.Path(str(out_path) + ".parts")
+
+
+def _part_dtype(name:str):
+    if name == "buoys":
+        from Camera_Util import DETECTION_DTYPE
+        return DETECTION_DTYPE
+    return np.dtype(PART_DTYPES[name])
+
+
+class ColumnWriter(object):
+    """
+    Streams per-frame results into column files as they arrive, so memory does not grow with the run and an
+    interrupted run keeps what it finished. Results come in out of order, every row is appended with its frame
+    index to a raw file in <out_path>.parts/ (flushed every flush_every results). close() writes the .npz in frame
+    order with assemble(), which can also be run on the parts an interrupted run left behind.
+    """
+    def __init__(self, out_path:str, frames:list, timestamps, flush_every:int=100):
+        self.__out_path = out_path
+        self.__parts = parts_dir(out_path)
+        shutil.rmtree(self.__parts, ignore_errors=True)
+        self.__parts.mkdir(parents=True)
+        np.save(self.__parts / "frame.npy", np.array(frames))
+        np.save(self.__parts / "timestamp.npy", np.asarray(timestamps, dtype=np.float64))
+        self.__dtypes = {name: _part_dtype(name) for name in PART_DTYPES}
+        self.__files = {name: open(self.__parts / f"{name}.bin", 'ab') for name in PART_DTYPES}
+        self.__flush_every = flush_every
+        self.__added = 0
+
+    def add(self, index:int, result:dict):
+        buoys = result["buoys"]
+        tags = len(result["tag_ids"])
+        centers = np.array(result["tag_centers"], dtype=np.float32).reshape(-1, 2)
+        rows = {"buoys": buoys, "buoy_frame": np.full(len(buoys), index), "tag_frame": np.full(tags, index),
+                "tag_id": result["tag_ids"], "tag_family": result["tag_families"], "tag_x": centers[:, 0],
+                "tag_y": centers[:, 1], "tag_bearing": result["tag_angles"], "done": [index]}
+        for name, values in rows.items():
+            self.__files[name].write(np.asarray(values, dtype=self.__dtypes[name]).tobytes())
+        self.__added += 1
+        if self.__added % self.__flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        for file in self.__files.values():
+            file.flush()
+
+    def close(self):
+        """writes the .npz from the parts and removes them"""
+        for file in self.__files.values():
+            file.close()
+        assemble(self.__parts, self.__out_path)
+        shutil.rmtree(self.__parts)
+
+
+def assemble(parts, out_path:str):
+    """
+    writes the columnar .npz from a ColumnWriter's parts directory. Variable length detections are stored flattened,
+    with <name>_offsets[i]:<name>_offsets[i+1] giving the rows that belong to frame i, and done[i] says whether
+    frame i has a result (False for the frames an interrupted run never reached).
+    """
+    parts = pathlib.Path(parts)
+
+    def read(name):
+        dtype = _part_dtype(name)
+        data = (parts / f"{name}.bin").read_bytes()
+        #an interrupted write leaves a partial record at the end
+        return np.frombuffer(data[:len(data) - len(data) % dtype.itemsize], dtype=dtype)
+
+    frames = np.load(parts / "frame.npy")
+    count = len(frames)
+    done = np.zeros((count,), dtype=bool)
+    done[read("done")] = True
+    columns = {"frame": frames, "timestamp": np.load(parts / "timestamp.npy"), "done": done}
+    for prefix, names in (("buoy", ("buoys",)), ("tag", ("tag_id", "tag_family", "tag_x", "tag_y", "tag_bearing"))):
+        values = [read(name) for name in names]
+        frame_index = read(f"{prefix}_frame")
+        rows = min([len(frame_index)] + [len(v) for v in values])
+        frame_index = frame_index[:rows]
+        keep = np.nonzero(done[frame_index])[0]
+        order = keep[np.argsort(frame_index[keep], kind='stable')]
+        offsets = np.zeros((count + 1,), dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(frame_index[keep], minlength=count))
+        columns[f"{prefix}_offsets"] = offsets
+        for name, value in zip(names, values):
+            value = value[:rows][order]
+            if value.dtype.names is None:
+                columns[name] = value
+            else:
+                for field in value.dtype.names:
+                    columns[f"{prefix}_{field}"] = value[field]
+    np.savez(out_path, **columns)
+
+
+def run_batch(frame_paths:list, out_path:str, params:dict=DEFAULT_PARAMS, cache_path:str='./detect_cache.sqlite',
+              workers:int=None, verbose:bool=True):
+    """
+    runs the detectors over frame_paths on a process pool, skipping frames already in the cache. The parent only
+    hashes each frame for its cache key, the workers are handed paths and read the frames themselves, so memory does
+    not grow with the frame bytes of the run, and results are streamed to disk by a ColumnWriter as they arrive.\n
+    returns a dictionary of counts (frames, cached, detected).
+    """
+    start = time.time()
+    cache = ResultCache(cache_path)
+    key_suffix = params_key(params)
+    frames = [pathlib.Path(p).name for p in frame_paths]
+    timestamps = [parse_frame_timestamp(p) or 0.0 for p in frame_paths]
+    columns = ColumnWriter(out_path, frames, timestamps)
+    keys = {}
+    cached = 0
+    for index, path in enumerate(frame_paths):
+        key = frame_key(path, key_suffix)
+        result = cache.get(key)
+        if result is not None:
+            columns.add(index, result)
+            cached += 1
+        else:
+            keys[index] = key
+    if(verbose):
+        print(f"[INFO] {len(frame_paths)} frames, {cached} cached, {len(keys)} to detect.")
+
+    if len(keys) != 0:
+        jobs = ((index, str(frame_paths[index])) for index in keys)
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(params,)) as pool:
+            for done, (index, result) in enumerate(pool.imap_unordered(_detect, jobs, chunksize=4), start=1):
+                columns.add(index, result)
+                cache.put(keys[index], result)
+                if done % 100 == 0:
+                    cache.commit()
+                    if(verbose):
+                        print(f"[INFO] {done}/{len(keys)} frames detected.")
+    cache.close()
+    columns.close()
+    if(verbose):
+        print(f"[INFO] Wrote {out_path} in {time.time()-start:.1f} s.")
+    return {"frames": len(frame_paths), "cached": cached, "detected": len(keys)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the buoy (and AprilTag) detectors over logged frames on all cores.")
+    parser.add_argument('frame_dir', nargs='?', default='./Frames')
+    parser.add_argument('--out', default='detections.npz', help="columnar output file (.npz)")
+    parser.add_argument('--cache', default='./detect_cache.sqlite', help="result cache, keyed by frame hash and parameters")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--tags', action='store_true', help="also run the AprilTag detector")
+    parser.add_argument('--assemble', action='store_true', help="write --out from the parts an interrupted run left")
+    parser.add_argument('--red-range', type=int, nargs=2, default=DEFAULT_PARAMS["red_range"])
+    parser.add_argument('--green-range', type=int, nargs=2, default=DEFAULT_PARAMS["green_range"])
+    parser.add_argument('--blue-range', type=int, nargs=2, default=DEFAULT_PARAMS["blue_range"])
+    parser.add_argument('--filter-size', type=int, default=DEFAULT_PARAMS["filter_size"])
+    parser.add_argument('--blob-size', type=int, default=DEFAULT_PARAMS["blob_size"])
+    parser.add_argument('--thresh', type=int, default=DEFAULT_PARAMS["thresh"])
+    parser.add_argument('--min-area', type=int, default=DEFAULT_PARAMS["min_area"])
+    args = parser.parse_args()
+    if args.assemble:
+        assemble(parts_dir(args.out), args.out)
+        sys.exit(0)
+
+    params = {"red_range": tuple(args.red_range), "green_range": tuple(args.green_range), "blue_range": tuple(args.blue_range),
+              "filter_size": args.filter_size, "blob_size": args.blob_size, "thresh": args.thresh,
+              "min_area": args.min_area, "tags": args.tags}
+    if args.tags:
+        from Tag_Detector import apriltag_available
+        assert apriltag_available(), "[ERR] --tags needs the apriltag library."
+    print(run_batch(sorted_frame_paths(args.frame_dir), args.out, params, args.cache, args.workers))
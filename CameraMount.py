@@ -1,15 +1,38 @@
 from Servo_Motors import ServoMotor
 import time
 class CameraMount:
-    def __init__(self, servo_pin_1, servo_pin_2, verbose:bool=False):
+    def __init__(self, servo_pin_1, servo_pin_2, verbose:bool=False, slew_rate:float=300.0, settle_time:float=0.05):
+        """
+        slew_rate, settle_time => servo motion profile (see Servo_Profile), used to know when the camera has arrived.
+        """
         self.__verbose = verbose
-        self.__top_servo = ServoMotor(servo_pin_1, 0)
-        self.__bottom_servo = ServoMotor(servo_pin_2, 0)
+        self.__top_servo = ServoMotor(servo_pin_1, 0, slew_rate=slew_rate, settle_time=settle_time)
+        self.__bottom_servo = ServoMotor(servo_pin_2, 0, slew_rate=slew_rate, settle_time=settle_time)
         self.__counter = 0
     def moveToSphericalCoordinate(self, top_servo_deg, bottom_servo_deg):
+        """starts the move, returns the time both servos will have arrived"""
         self.__top_servo.rotateToDegree(top_servo_deg)
         self.__bottom_servo.rotateToDegree(bottom_servo_deg)
         time.sleep(0.001)
+        return self.getArrivalTime()
+
+    def getArrivalTime(self):
+        """returns the time (time.time() seconds) both servos will have reached their last commanded angles"""
+        return max(self.__top_servo.arrival_time(), self.__bottom_servo.arrival_time())
+
+    def hasArrived(self, t:float=None):
+        return self.__top_servo.arrived(t) and self.__bottom_servo.arrived(t)
+
+    def waitForArrival(self, timeout:float=None):
+        """blocks only as long as the current move physically needs, returns True if the mount arrived"""
+        deadline = None if timeout is None else time.time() + timeout
+        top_arrived = self.__top_servo.wait(timeout)
+        remaining = None if deadline is None else max(deadline - time.time(), 0.0)
+        return top_arrived and self.__bottom_servo.wait(remaining)
+
+    def estimateSphericalCoordinates(self, t:float=None):
+        """returns the (top, bottom) angles the servos are estimated to be at, at time t (now by default)"""
+        return((self.__top_servo.estimate_degree(t), self.__bottom_servo.estimate_degree(t)))
 
     def getSphericalCoordinates(self):
         if(self.__verbose == True):
@@ -38,7 +61,7 @@ class CameraMount:
             self.moveToSphericalCoordinate(currentTopDeg, 90)
         elif(self.__counter == 8):
             self.moveToSphericalCoordinate(currentTopDeg, 0)
-        time.sleep(1)
+        self.waitForArrival()
         self.__counter+=1
         if (self.__counter >= 8):
             self.__counter = 0
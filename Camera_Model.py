@@ -0,0 +1,138 @@
+import hashlib
+import pathlib
+
+import numpy as np
+import cv2
+
+#Pi camera v2 sensor size and focal length in meters
+SENSOR_SIZE = (0.00368, 0.00276)
+FOCAL_LENGTH = 0.00304
+CACHE_DIR = pathlib.Path(__file__).resolve().parent / 'camera_cache'
+
+
+class CameraModel(object):
+    """
+    Pinhole model of the Pi camera that precomputes the azimuth and elevation (degrees) of every pixel at a given
+    resolution, optionally correcting for lens distortion. Bearings for any number of detections are then a single
+    fancy-index lookup into the tables.\n
+    Azimuth is positive to the right of the optical axis, elevation is positive above it. Without distortion the
+    azimuth table matches Camera_Util.sensor_angle(sensor_position(...)).\n
+    The tables are cached to disk per resolution (and per sensor/distortion parameters), so they are only built once.
+    """
+    def __init__(self, resolution:tuple=(640, 480), sensor_size:tuple=SENSOR_SIZE, focal_length:float=FOCAL_LENGTH,
+                 distortion:tuple=None, cache_dir:str=CACHE_DIR, verbose:bool=False):
+        """
+        resolution => (width, height) in pixels.\n
+        distortion => OpenCV distortion coefficients (k1, k2, p1, p2[, k3]), or None for an ideal lens.\n
+        cache_dir => directory to cache the tables in, or None to always build them.
+        """
+        self.__resolution = tuple(resolution)
+        self.__sensor_size = tuple(sensor_size)
+        self.__focal_length = focal_length
+        self.__distortion = None if distortion is None else tuple(float(k) for k in distortion)
+        self.__verbose = verbose
+        width, height = self.__resolution
+        #focal length in pixels and principal point, as used by sensor_position
+        self.__fx = focal_length * width / sensor_size[0]
+        self.__fy = focal_length * height / sensor_size[1]
+        self.__cx = width / 2
+        self.__cy = height / 2
+
+        self.__cache_path = None
+        if cache_dir is not None:
+            self.__cache_path = pathlib.Path(cache_dir) / f"bearing_{width}x{height}_{self.__cache_key()}.npz"
+        self.__azimuth, self.__elevation = self.__load_or_build()
+
+    def __cache_key(self):
+        params = repr((self.__sensor_size, self.__focal_length, self.__distortion)).encode()
+        return hashlib.sha1(params).hexdigest()[:12]
+
+    def __load_or_build(self):
+        if (self.__cache_path is not None) and self.__cache_path.exists():
+            try:
+                with np.load(self.__cache_path) as tables:
+                    azimuth, elevation = tables['azimuth'], tables['elevation']
+                if azimuth.shape == (self.__resolution[1], self.__resolution[0]):
+                    if(self.__verbose):
+                        print(f"[INFO] Loaded bearing tables from {self.__cache_path}")
+                    return azimuth, elevation
+            except Exception as e:
+                print(f"[WARN] Could not read {self.__cache_path} ({e}), rebuilding bearing tables.")
+        azimuth, elevation = self.__build()
+        if self.__cache_path is not None:
+            try:
+                self.__cache_path.parent.mkdir(parents=True, exist_ok=True)
+                np.savez(self.__cache_path, azimuth=azimuth, elevation=elevation)
+                if(self.__verbose):
+                    print(f"[INFO] Saved bearing tables to {self.__cache_path}")
+            except OSError as e:
+                print(f"[WARN] Could not cache bearing tables ({e}).")
+        return azimuth, elevation
+
+    def __build(self):
+        width, height = self.__resolution
+        xs, ys = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+        if self.__distortion is None:
+            x_n = (xs - self.__cx) / self.__fx
+            y_n = (ys - self.__cy) / self.__fy
+        else:
+            camera_matrix = np.array([[self.__fx, 0, self.__cx], [0, self.__fy, self.__cy], [0, 0, 1]], dtype=np.float64)
+            points = np.stack((xs, ys), axis=-1).reshape(-1, 1, 2)
+            undistorted = cv2.undistortPoints(points, camera_matrix, np.array(self.__distortion, dtype=np.float64))
+            x_n = undistorted[:, 0, 0].reshape(height, width)
+            y_n = undistorted[:, 0, 1].reshape(height, width)
+        azimuth = np.degrees(np.arctan2(x_n, 1.0)).astype(np.float32)
+        elevation = np.degrees(np.arctan2(-y_n, np.hypot(x_n, 1.0))).astype(np.float32)
+        return azimuth, elevation
+
+    def get_resolution(self):
+        return self.__resolution
+
+    def get_focal_length_pixels(self):
+        return self.__fx
+
+    def get_azimuth_table(self):
+        return self.__azimuth
+
+    def get_elevation_table(self):
+        return self.__elevation
+
+    def __pixel_indices(self, pix_x, pix_y):
+        width, height = self.__resolution
+        cols = np.clip(np.rint(pix_x), 0, width - 1).astype(np.intp)
+        rows = np.clip(np.rint(pix_y), 0, height - 1).astype(np.intp)
+        return rows, cols
+
+    def bearings(self, pix_x, pix_y):
+        """returns the azimuth (degrees) of each pixel coordinate, pix_x/pix_y may be scalars or arrays"""
+        rows, cols = self.__pixel_indices(pix_x, pix_y)
+        return self.__azimuth[rows, cols]
+
+    def elevations(self, pix_x, pix_y):
+        """returns the elevation (degrees) of each pixel coordinate"""
+        rows, cols = self.__pixel_indices(pix_x, pix_y)
+        return self.__elevation[rows, cols]
+
+    def directions(self, pix_x, pix_y):
+        """returns (azimuth, elevation) in degrees for each pixel coordinate"""
+        rows, cols = self.__pixel_indices(pix_x, pix_y)
+        return self.__azimuth[rows, cols], self.__elevation[rows, cols]
+
+
+camera_models = {}
+
+def get_camera_model(resolution:tuple=(640, 480)):
+    """returns the shared CameraModel for a resolution, building (or loading) it on first use"""
+    resolution = tuple(int(v) for v in resolution)
+    if resolution not in camera_models:
+        camera_models[resolution] = CameraModel(resolution)
+    return camera_models[resolution]
+
+
+if __name__ == '__main__':
+    import time
+    start = time.time()
+    model = CameraModel((640, 480), cache_dir=None)
+    print(f"[INFO] built 640x480 tables in {1000*(time.time()-start):.1f} ms")
+    print(f"[INFO] horizontal FOV {model.bearings(639, 240) - model.bearings(0, 240):.2f} deg, "
+          f"vertical FOV {model.elevations(320, 0) - model.elevations(320, 479):.2f} deg")
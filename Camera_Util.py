@@ -21,6 +21,9 @@ else:
     supported = False
 
 import numpy as np
+from Camera_Model import get_camera_model
+from Tag_Detector import TagDetector
+from Vision_Frame import VisionFrame, as_frame
 
 def sensor_position(pix_x, pix_y, res_x, res_y):
     sensor_width,sensor_height = (0.00368, 0.00276) #mm to meters
@@ -39,70 +42,42 @@ focal_length = 0.00304 #mm is the focal length
 def sensor_angle(sensor_pos_x, sensor_pos_y, f):
     return np.degrees(np.arctan2(sensor_pos_x,f))
 
+tag_detector = None
+
+def get_tag_detector():
+    """returns the shared TagDetector, created on first use so the apriltag detector is only built once"""
+    global tag_detector
+    if tag_detector is None:
+        tag_detector = TagDetector(families=("tag36h11", "tag16h5"))
+    return tag_detector
+
+TAG_DTYPE = np.dtype([('id', np.int32), ('family', 'U16'),
+                      ('x', np.float32), ('y', np.float32),
+                      ('bearing', np.float32),
+                      ('corners', np.float32, (4, 2))])
+
 def detect_apriltags(image):
-    # image = cv2.imread('/home/pi/NuRobotics/Frames/tag16_05_00000.png')
-    
-    #convert image to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    options = apriltag.DetectorOptions(families=["tag36h11","tag16h5"])
-    detector = apriltag.Detector(options)
-    
-    results = detector.detect(gray)
-    centers = []
-    angles = []
-    corners = []
-    tagFamilies = []
-    tagIds = []
-    tag_detected = False
-    for r in results:
-        #find the corners of the april tag
-        (ptA, ptB, ptC, ptD) = r.corners
-        ptB = (int(ptB[0]), int(ptB[1]))
-        ptC = (int(ptC[0]), int(ptC[1]))
-        ptD = (int(ptD[0]), int(ptD[1]))
-        ptA = (int(ptA[0]), int(ptA[1]))
-        
-        corners.append((ptA, ptB, ptC, ptD))
-        #find the centers
-        center = (int(r.center[0]), int(r.center[1]))
-        centers.append(center)
-        
-        #find the angles 
-        a = sensor_position(center[0], center[1], image.shape[1], image.shape[0])
-        angle = sensor_angle(a[0], a[1], focal_length)
-        angles.append(angle)
-
-        print(f"[INFO] tag center @ {center}")
-        print(f"[INFO] tag angle @ {angle}")
-        # draw the bounding box of the AprilTag detection
-        cv2.line(image, ptA, ptB, (0, 255, 0), 2)
-        cv2.line(image, ptB, ptC, (0, 255, 0), 2)
-        cv2.line(image, ptC, ptD, (0, 255, 0), 2)
-        cv2.line(image, ptD, ptA, (0, 255, 0), 2)
-
-       
-        # draw the center (x, y)-coordinates of the AprilTag
-        cv2.circle(image, (center[0], center[1]), 5, (0, 0, 255), -1)
-        
-        # draw the tag family on the image
-        try:
-            tagFamily = r.tag_family.decode("utf-8")
-        except:
-            tagFamily = r.tag_family
-        try:
-            tagId = r.tag_id.decode("utf-8")
-        except:
-            tagId = r.tag_id
-        cv2.putText(image, tagFamily, (ptA[0], ptA[1] - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-        
-        print(f"[INFO] tag family: {tagFamily}")
-        tagFamilies.append(tagFamily)
-        print(f"[INFO tag id {tagId}]")
-        tagIds.append(tagId)
-    
-    tag_detected = True if len(results) != 0 else False
-    return tag_detected, image, tagFamilies, tagIds, centers, angles, corners
+    """
+    image => BGR image or VisionFrame, it is not drawn on (see Overlay.render_overlay).\n
+    returns a structured array of TAG_DTYPE records (id, family, center, bearing, corners A-D), one per tag found.
+    """
+    frame = as_frame(image)
+    height, width = frame.get_shape()[:2]
+    #grayscale image, shared with any other detector that needs it
+    results = get_tag_detector().detect(frame.gray())
+
+    tags = np.empty((len(results),), dtype=TAG_DTYPE)
+    for i, r in enumerate(results):
+        family = r.tag_family
+        tags[i]['id'] = int(r.tag_id)
+        tags[i]['family'] = family.decode("utf-8") if isinstance(family, bytes) else family
+        tags[i]['corners'] = r.corners
+    if len(results) != 0:
+        centers = np.array([r.center for r in results], dtype=np.float64)
+        tags['x'] = centers[:, 0]
+        tags['y'] = centers[:, 1]
+        tags['bearing'] = get_camera_model((width, height)).bearings(centers[:, 0], centers[:, 1])
+    return tags
     
 
 def find_centers(filter_image, rgb_image, thresh):
@@ -155,34 +130,394 @@ def get_ranges(red_range, green_range, blue_range, rgb_image):
 
     return(img_thresh_RGB)
 
-def detect_buoys(img):
-    # hsv_image = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    # rgb_image = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+class ColorClassifier(object):
+    """
+    Classifies pixels by color with a precomputed lookup table.\n
+    Each color class is an exclusive (low, high) range per channel, like get_ranges. The table maps every channel
+    value to a bitmask of the classes whose range contains it, so one cv2.LUT over a BGR image plus two bitwise ANDs
+    gives, for every pixel, a uint8 with bit k set when the pixel belongs to class k (up to 8 classes).
+    """
+    def __init__(self, color_ranges:dict):
+        """color_ranges => {name: (red_range, green_range, blue_range)}"""
+        assert len(color_ranges) <= 8, "[ERR] At most 8 color classes fit in a uint8 bitmask."
+        self.__names = list(color_ranges.keys())
+        self.__lut = np.zeros((1, 256, 3), dtype=np.uint8)
+        values = np.arange(256)
+        for bit, name in enumerate(self.__names):
+            red_range, green_range, blue_range = color_ranges[name]
+            #the image is BGR, so channel 0 is blue and channel 2 is red
+            for channel, (low, high) in ((0, blue_range), (1, green_range), (2, red_range)):
+                inside = np.logical_and(values > low, values < high)
+                self.__lut[0, inside, channel] |= np.uint8(1 << bit)
+
+    def get_names(self):
+        return self.__names
+
+    def get_bit(self, name:str):
+        return 1 << self.__names.index(name)
+
+    def classify(self, bgr_image, out=None, codes=None):
+        """
+        returns a uint8 image of class bitmasks for a (filtered) BGR image.\n
+        out (h, w) and codes (h, w, 3) are optional uint8 buffers to write into, so no new images are allocated.
+        """
+        codes = cv2.LUT(bgr_image, self.__lut, dst=codes)
+        out = np.bitwise_and(codes[:, :, 0], codes[:, :, 1], out=out)
+        np.bitwise_and(out, codes[:, :, 2], out=out)
+        return out
+
+
+class YUVColorClassifier(object):
+    """
+    The ColorClassifier for YUV images. An RGB box is not a box in YUV, so the channels cannot be looked up
+    separately: instead a 3D table, indexed by the top bits of Y, U and V, holds the class bitmask of the BGR color
+    each YUV cell decodes to (with the same I420 conversion used to decode logged frames). Blue and red move by 1.8
+    and 1.4 levels per chroma level, so the chroma keeps all 8 bits and only the luma is quantized.
+    """
+    def __init__(self, color_ranges:dict, bits:tuple=(6, 8, 8)):
+        """color_ranges => {name: (red_range, green_range, blue_range)}\n
+        bits => table bits for Y, U and V."""
+        self.__rgb_classifier = ColorClassifier(color_ranges)
+        self.__bits = bits
+        levels = [1 << b for b in bits]
+        values = [(np.arange(n) * (256 // n) + (256 // n) // 2).astype(np.uint8) for n in levels]
+        #lay every (y, u, v) cell out as one 2x2 block of an I420 image, one row of cells per (y, u) pair
+        y, u, v = np.meshgrid(*values, indexing='ij')
+        rows, cols = levels[0] * levels[1], levels[2]
+        luma = np.repeat(np.repeat(y.reshape(rows, cols), 2, axis=0), 2, axis=1)
+        i420 = np.concatenate((luma, u.reshape(-1, 2 * cols), v.reshape(-1, 2 * cols)), axis=0)
+        bgr = cv2.cvtColor(i420, cv2.COLOR_YUV2BGR_I420)[::2, ::2]
+        self.__lut = self.__rgb_classifier.classify(np.ascontiguousarray(bgr)).reshape(-1)
+
+    def get_names(self):
+        return self.__rgb_classifier.get_names()
+
+    def get_bit(self, name:str):
+        return self.__rgb_classifier.get_bit(name)
+
+    def classify(self, yuv_image, out=None, index=None, scratch=None):
+        """
+        returns a uint8 image of class bitmasks for a (filtered) (h, w, 3) YUV image.\n
+        out (h, w) uint8 and index, scratch (h, w) uint32 are optional buffers to write into.
+        """
+        shape = yuv_image.shape[:2]
+        index = np.empty(shape, dtype=np.uint32) if index is None else index
+        scratch = np.empty(shape, dtype=np.uint32) if scratch is None else scratch
+        y_bits, u_bits, v_bits = self.__bits
+        index[...] = yuv_image[:, :, 0]
+        index >>= 8 - y_bits
+        index <<= u_bits + v_bits
+        scratch[...] = yuv_image[:, :, 1]
+        scratch >>= 8 - u_bits
+        scratch <<= v_bits
+        index |= scratch
+        scratch[...] = yuv_image[:, :, 2]
+        scratch >>= 8 - v_bits
+        index |= scratch
+        out = np.empty(shape, dtype=np.uint8) if out is None else out
+        return np.take(self.__lut, index, out=out, mode='clip')
+
+
+DETECTION_DTYPE = np.dtype([('x', np.float32), ('y', np.float32),
+                            ('area', np.int32),
+                            ('left', np.int32), ('top', np.int32), ('width', np.int32), ('height', np.int32),
+                            ('bearing', np.float32)])
+
+def extract_blobs(binary_image, min_area:int=0, labels=None, origin:tuple=(0, 0), resolution:tuple=None):
+    """
+    Finds the blobs in a thresholded uint8 image with connected component labelling.\n
+    labels => optional int32 buffer the size of binary_image for the label image.\n
+    origin, resolution => when binary_image is a crop, the (x, y) of its top left corner in the full frame and the
+    full frame (width, height), so coordinates and bearings come back in full frame terms.\n
+    returns a structured array of DETECTION_DTYPE records (centroid, area, bbox, bearing), keeping only blobs of at
+    least min_area pixels.
+    """
+    count, _, stats, centroids = cv2.connectedComponentsWithStats(binary_image, labels=labels, connectivity=8)
+    #label 0 is the background
+    stats = stats[1:]
+    centroids = centroids[1:]
+    keep = stats[:, cv2.CC_STAT_AREA] >= min_area
+    stats = stats[keep]
+    centroids = centroids[keep]
+
+    detections = np.empty((stats.shape[0],), dtype=DETECTION_DTYPE)
+    x0, y0 = origin
+    detections['x'] = centroids[:, 0] + x0
+    detections['y'] = centroids[:, 1] + y0
+    detections['area'] = stats[:, cv2.CC_STAT_AREA]
+    detections['left'] = stats[:, cv2.CC_STAT_LEFT] + x0
+    detections['top'] = stats[:, cv2.CC_STAT_TOP] + y0
+    detections['width'] = stats[:, cv2.CC_STAT_WIDTH]
+    detections['height'] = stats[:, cv2.CC_STAT_HEIGHT]
+    if resolution is None:
+        resolution = (binary_image.shape[1], binary_image.shape[0])
+    detections['bearing'] = get_camera_model(resolution).bearings(detections['x'], detections['y'])
+    return detections
+
+
+class BuoyDetector(object):
+    """
+    Single pass red buoy detector, replacing get_ranges + find_centers without the flipped copy,
+    the per-channel boolean masks or the int64 box filter.\n
+    The pixel classification is a lookup table (ColorClassifier), and the blob score is an unnormalized uint16 box
+    sum of the class mask. find_centers keeps pixels where int(255*score/max(score)) > thresh, which for integer scores
+    is the same as score >= ceil((thresh+1)*max(score)/255), so the threshold is applied on the uint16 sums directly.
+    Blobs are then extracted with connected component statistics (extract_blobs).\n
+    With pyramid_level > 0 candidate blobs are first found on the frame downsampled by 2**pyramid_level, and the full
+    resolution pipeline only runs inside windows around the candidates (padded by refine_window pixels).\n
+    The detector owns scratch buffers sized to the camera resolution (reallocated only if the frame size changes) and
+    every full frame step writes into them, so steady state detection allocates nothing but the small detection array.
+    The returned object_detection_surface and img_out are those buffers: they stay valid until the next detect().\n
+    Frames captured as YUV420 (VisionFrame.from_yuv) are detected at chroma resolution, half the frame size, straight
+    from the Y/U/V planes with a YUVColorClassifier, so no BGR image is ever made. Their surface and img_out are half
+    size, while the detections are scaled back to full frame coordinates.
+    """
+    def __init__(self, red_range:tuple=(110,255), green_range:tuple=(0,50), blue_range:tuple=(0,50),
+                 filter_size:int=9, blob_size:int=30, thresh:int=50, min_area:int=100,
+                 pyramid_level:int=0, refine_window:int=32, coarse_margin:int=20, resolution:tuple=(640, 480),
+                 capture_format:str="bgr"):
+        """
+        capture_format => "yuv" builds the YUVColorClassifier table (a few hundred ms) here rather than on the first
+        YUV frame, so it does not stall a control loop tick. "bgr" builds it only if a YUV frame ever arrives.
+        """
+        assert blob_size*blob_size < 2**16, "[ERR] Blob window too large for uint16 sums."
+        self.__classifier = ColorClassifier({"red": (red_range, green_range, blue_range)})
+        self.__filter_size = filter_size
+        self.__blob_size = blob_size
+        self.__thresh = thresh
+        self.__min_area = min_area
+        self.__pyramid_level = pyramid_level
+        self.__refine_window = refine_window
+        #downsampling blends small buoys into the background, so candidates are found with ranges widened by coarse_margin
+        widen = lambda r: (r[0] - coarse_margin, r[1] + coarse_margin)
+        self.__coarse_classifier = ColorClassifier({"red": (widen(red_range), widen(green_range), widen(blue_range))})
+        self.__color_ranges = {"red": (red_range, green_range, blue_range)}
+        self.__yuv_classifier = YUVColorClassifier(self.__color_ranges) if capture_format == "yuv" else None
+        self.__shape = None
+        self.__half_shape = None
+        self.__allocate((resolution[1], resolution[0], 3))
+
+    def __allocate(self, shape:tuple):
+        """(re)allocates the scratch buffers for frames of shape (height, width, 3)"""
+        if shape == self.__shape:
+            return
+        self.__shape = shape
+        height, width = shape[:2]
+        self.__filtered = np.empty(shape, dtype=np.uint8)
+        self.__codes = np.empty(shape, dtype=np.uint8)
+        self.__mask = np.empty((height, width), dtype=np.uint8)
+        self.__surface = np.empty((height, width), dtype=np.uint16)
+        self.__img_out = np.empty((height, width), dtype=np.uint8)
+        self.__labels = np.empty((height, width), dtype=np.int32)
+
+    def __allocate_half(self, shape:tuple):
+        """(re)allocates the scratch buffers of the half resolution YUV path for (height/2, width/2) chroma planes"""
+        if shape == self.__half_shape:
+            return
+        self.__half_shape = shape
+        self.__half_luma = np.empty(shape, dtype=np.uint8)
+        self.__half_yuv = np.empty(shape + (3,), dtype=np.uint8)
+        self.__half_filtered = np.empty(shape + (3,), dtype=np.uint8)
+        self.__half_index = np.empty(shape, dtype=np.uint32)
+        self.__half_scratch = np.empty(shape, dtype=np.uint32)
+        self.__half_mask = np.empty(shape, dtype=np.uint8)
+        self.__half_surface = np.empty(shape, dtype=np.uint16)
+        self.__half_img_out = np.empty(shape, dtype=np.uint8)
+        self.__half_labels = np.empty(shape, dtype=np.int32)
+
+    def get_pyramid_level(self):
+        return self.__pyramid_level
+
+    def __score(self, filtered, blob_size:int, classifier=None, mask=None, codes=None, surface=None):
+        mask = (self.__classifier if classifier is None else classifier).classify(filtered, out=mask, codes=codes)
+        return cv2.boxFilter(mask, cv2.CV_16U, (blob_size, blob_size), dst=surface, normalize=False)
+
+    def __min_score(self, max_score:int):
+        return -(-(self.__thresh + 1) * max_score // 255)
+
+    def detect(self, img, top_row:int=0):
+        """
+        img => BGR image or VisionFrame.\n
+        top_row => rows above this are not searched (see Floor_ROI), the surfaces are zero there.\n
+        returns detections (DETECTION_DTYPE array, full frame coordinates), object_detection_surface (uint16 blob scores), img_out (thresholded uint8 image)
+        """
+        frame = as_frame(img)
+        if frame.is_yuv():
+            return self.__detect_yuv(frame, top_row)
+        image = frame.get_image()
+        self.__allocate(image.shape)
+        if self.__pyramid_level > 0:
+            return self.__detect_pyramid(frame, top_row)
+        height, width = image.shape[:2]
+        top_row = min(max(int(top_row), 0), height)
+        object_detection_surface = self.__surface
+        img_out = self.__img_out
+        if top_row > 0:
+            #row slices of the scratch buffers are still contiguous, so the steps below write straight into them
+            object_detection_surface[:top_row] = 0
+            img_out[:top_row] = 0
+            if top_row == height:
+                return np.empty((0,), dtype=DETECTION_DTYPE), object_detection_surface, img_out
+        #blurred into the scratch buffer rather than frame.blurred(), which would allocate a new image per frame
+        filtered = cv2.boxFilter(image[top_row:], -1, (self.__filter_size, self.__filter_size), dst=self.__filtered[top_row:])
+        surface = self.__score(filtered, self.__blob_size, mask=self.__mask[top_row:], codes=self.__codes[top_row:],
+                               surface=object_detection_surface[top_row:])
+        _, max_score, _, _ = cv2.minMaxLoc(surface)
+        max_score = int(max_score)
+        if max_score <= 0:
+            img_out.fill(0)
+            return np.empty((0,), dtype=DETECTION_DTYPE), object_detection_surface, img_out
+        cv2.compare(surface, self.__min_score(max_score), cv2.CMP_GE, dst=img_out[top_row:])
+        detections = extract_blobs(img_out[top_row:], self.__min_area, labels=self.__labels[top_row:],
+                                   origin=(0, top_row), resolution=(width, height))
+        return detections, object_detection_surface, img_out
+
+    def __detect_yuv(self, frame, top_row:int=0):
+        if self.__yuv_classifier is None:
+            self.__yuv_classifier = YUVColorClassifier(self.__color_ranges)
+        y, u, v = frame.yuv_planes()
+        self.__allocate_half(u.shape)
+        rows, cols = u.shape
+        top = min(max(int(top_row), 0) // 2, rows)
+        object_detection_surface = self.__half_surface
+        img_out = self.__half_img_out
+        if top > 0:
+            object_detection_surface[:top] = 0
+            img_out[:top] = 0
+            if top == rows:
+                return np.empty((0,), dtype=DETECTION_DTYPE), object_detection_surface, img_out
+        #the Y plane is subsampled to the chroma grid, box filtering YUV is the same as box filtering BGR since the conversion is affine
+        cv2.resize(y[2*top:2*rows], (cols, rows - top), dst=self.__half_luma[top:], interpolation=cv2.INTER_NEAREST)
+        cv2.merge((self.__half_luma[top:], u[top:], v[top:]), dst=self.__half_yuv[top:])
+        filter_size = max(1, self.__filter_size // 2)
+        filtered = cv2.boxFilter(self.__half_yuv[top:], -1, (filter_size, filter_size), dst=self.__half_filtered[top:])
+        mask = self.__yuv_classifier.classify(filtered, out=self.__half_mask[top:], index=self.__half_index[top:],
+                                              scratch=self.__half_scratch[top:])
+        blob_size = max(1, self.__blob_size // 2)
+        surface = cv2.boxFilter(mask, cv2.CV_16U, (blob_size, blob_size), dst=object_detection_surface[top:], normalize=False)
+        _, max_score, _, _ = cv2.minMaxLoc(surface)
+        max_score = int(max_score)
+        if max_score <= 0:
+            img_out.fill(0)
+            return np.empty((0,), dtype=DETECTION_DTYPE), object_detection_surface, img_out
+        cv2.compare(surface, self.__min_score(max_score), cv2.CMP_GE, dst=img_out[top:])
+        detections = extract_blobs(img_out[top:], self.__min_area // 4, labels=self.__half_labels[top:], origin=(0, top))
+        #half resolution pixel i covers full resolution pixels 2i and 2i+1
+        detections['x'] = 2 * detections['x'] + 0.5
+        detections['y'] = 2 * detections['y'] + 0.5
+        for field in ('left', 'top', 'width', 'height'):
+            detections[field] *= 2
+        detections['area'] *= 4
+        height, width = y.shape
+        detections['bearing'] = get_camera_model((width, height)).bearings(detections['x'], detections['y'])
+        return detections, object_detection_surface, img_out
+
+    def __candidate_windows(self, frame):
+        """finds candidate blobs on the downsampled frame, returns merged full resolution windows (x0, y0, x1, y1)"""
+        scale = 2 ** self.__pyramid_level
+        small = frame.pyramid(self.__pyramid_level)
+        filter_size = max(1, self.__filter_size // scale)
+        filtered = small if filter_size == 1 else cv2.boxFilter(small, -1, (filter_size, filter_size))
+        surface = self.__score(filtered, max(1, self.__blob_size // scale), self.__coarse_classifier)
+        #any classified pixel is a candidate, the real threshold is applied at full resolution
+        candidates = extract_blobs(cv2.compare(surface, 0, cv2.CMP_GT), 1)
+
+        height, width = frame.get_shape()[:2]
+        pad = self.__refine_window
+        windows = [[max(int(c['left'])*scale - pad, 0), max(int(c['top'])*scale - pad, 0),
+                    min(int(c['left'] + c['width'])*scale + pad, width), min(int(c['top'] + c['height'])*scale + pad, height)]
+                   for c in candidates]
+        #merge overlapping windows so no pixel is refined twice
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(windows)):
+                for j in range(i + 1, len(windows)):
+                    a, b = windows[i], windows[j]
+                    if (a[0] < b[2]) and (b[0] < a[2]) and (a[1] < b[3]) and (b[1] < a[3]):
+                        windows[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del windows[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return windows
+
+    def __detect_pyramid(self, frame, top_row:int=0):
+        image = frame.get_image()
+        height, width = image.shape[:2]
+        object_detection_surface = self.__surface
+        object_detection_surface.fill(0)
+        img_out = self.__img_out
+        img_out.fill(0)
+        windows = [(x0, max(y0, top_row), x1, y1) for x0, y0, x1, y1 in self.__candidate_windows(frame) if y1 > top_row]
+        if len(windows) == 0:
+            return np.empty((0,), dtype=DETECTION_DTYPE), object_detection_surface, img_out
+
+        #score each window on a crop with enough margin that its filters see the same pixels as a full frame pass
+        margin = self.__filter_size // 2 + self.__blob_size // 2 + 1
+        max_score = 0
+        for x0, y0, x1, y1 in windows:
+            cx0, cy0 = max(x0 - margin, 0), max(y0 - margin, 0)
+            cx1, cy1 = min(x1 + margin, width), min(y1 + margin, height)
+            crop = image[cy0:cy1, cx0:cx1]
+            scores = self.__score(cv2.boxFilter(crop, -1, (self.__filter_size, self.__filter_size)), self.__blob_size)
+            window_scores = scores[y0-cy0:y1-cy0, x0-cx0:x1-cx0]
+            object_detection_surface[y0:y1, x0:x1] = window_scores
+            max_score = max(max_score, int(window_scores.max()))
+        if max_score <= 0:
+            return np.empty((0,), dtype=DETECTION_DTYPE), object_detection_surface, img_out
+        min_score = self.__min_score(max_score)
+        for x0, y0, x1, y1 in windows:
+            cv2.compare(object_detection_surface[y0:y1, x0:x1], min_score, cv2.CMP_GE, dst=img_out[y0:y1, x0:x1])
+        return extract_blobs(img_out, self.__min_area, labels=self.__labels), object_detection_surface, img_out
+
+
+buoy_detector = BuoyDetector()
+
+def configure_buoy_detector(**kwargs):
+    """replaces the detector used by detect_buoys, kwargs are BuoyDetector arguments (e.g. pyramid_level=2)"""
+    global buoy_detector
+    buoy_detector = BuoyDetector(**kwargs)
+    return buoy_detector
+
+def detect_buoys_reference(img):
+    """The original get_ranges + find_centers path, kept to check and benchmark BuoyDetector against."""
     rgb_image = np.flip(img, axis=2) 
-    # rgb_image = np.flip(rgb_image, 0)
     r_red_range = (110,255)
     r_green_range = (0,50)
     r_blue_range = (0,50)
     img_thresh_red = get_ranges(r_red_range, r_green_range, r_blue_range, rgb_image)
     reds_centers, reds_angles, object_detection_surface, img_out = find_centers(img_thresh_red, rgb_image, 50)
-    print(reds_angles, reds_centers, object_detection_surface, img_out)
     return reds_angles, reds_centers, object_detection_surface, img_out
 
+def detect_buoys(img, top_row:int=0):
+    """
+    img => BGR image or VisionFrame.\n
+    top_row => first row that can contain a buoy (Floor_ROI), rows above it are skipped.\n
+    returns detections (DETECTION_DTYPE array of red buoys), object_detection_surface, img_out"""
+    return buoy_detector.detect(img, top_row)
+
 # #comment out the below when not testing camera:
 if (__name__=='__main__') & (True):
+    #for timing the detectors without plotting, use Vision_Benchmark.py
+    from Frame_Logger import sorted_frame_paths
+    from Overlay import render_overlay
     fig, ax = plt.subplots(1,3)
     repeat=True
     while(repeat==True):
-        for frame_num in range(1681905135, 1681908011):
-            
-            img = cv2.imread(f'./Frames/frame_{frame_num}.jpg') 
+        for path in sorted_frame_paths('./Frames'):
+            frame_num = path.stem
+            img = cv2.imread(str(path)) 
             if img is not None:
-                r_angles, r_centers, object_detection_surface, img_out = detect_buoys(img)
+                reds, object_detection_surface, img_out = detect_buoys(img)
+                r_angles = reds['bearing']
+                r_centers = np.stack((reds['x'], reds['y']), axis=1)
                 if(len(r_angles)!=0):
                     print("Detected")
                 else:
                     print("Not detected")
-                img = np.flip(img, axis=2)
+                img = np.flip(render_overlay(img, buoys=reds), axis=2)
                 print(frame_num)
                 print('\n')
                 print(r_angles)
@@ -197,7 +532,7 @@ if (__name__=='__main__') & (True):
                     ax[0].plot(r_centers[0][0], r_centers[0][1], 'ro')
                     ax[1].plot(r_centers[0][0], r_centers[0][1], 'ro')
                     ax[2].plot(r_centers[0][0], r_centers[0][1], 'ro')
-                plt.pause(2)
+                plt.pause(0.5)
                 
                 plt.draw()
                 
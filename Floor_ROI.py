@@ -0,0 +1,67 @@
+import numpy as np
+
+from Camera_Model import get_camera_model
+
+#camera lens height above the arena floor and tallest floor target (a buoy) in meters
+CAMERA_HEIGHT = 0.12
+TARGET_HEIGHT = 0.07
+
+
+class FloorROI(object):
+    """
+    Works out which image rows can contain targets standing on the arena floor, from the camera tilt (the CameraMount
+    top servo) and a flat floor model: a target of height target_height between min_range and max_range from a camera
+    camera_height above the floor is never seen above the elevation atan2(target_height - camera_height, range).
+    Rows whose pixels all look higher than that (plus margin_deg) are walls or ceiling, and the detectors skip them.\n
+    Pan (the bottom servo) does not move the horizon, so only the tilt matters. Roll is assumed to be zero.
+    """
+    def __init__(self, camera_height:float=CAMERA_HEIGHT, target_height:float=TARGET_HEIGHT, max_range:float=3.0,
+                 min_range:float=0.05, margin_deg:float=3.0, resolution:tuple=(640, 480), level_deg:float=0.0,
+                 tilt_sign:float=1.0, verbose:bool=False):
+        """
+        max_range, min_range => distances (m) targets are searched for at.\n
+        margin_deg => extra elevation kept above the computed limit, for pitch error and bouncing.\n
+        level_deg, tilt_sign => camera pitch (degrees, positive up) is tilt_sign * (top servo degrees - level_deg).
+        """
+        self.__margin_deg = margin_deg
+        self.__level_deg = level_deg
+        self.__tilt_sign = tilt_sign
+        self.__verbose = verbose
+        rise = target_height - camera_height
+        self.__max_elevation = max(np.degrees(np.arctan2(rise, max_range)), np.degrees(np.arctan2(rise, min_range)))
+        camera_model = get_camera_model(resolution)
+        #unit view direction of every pixel in camera coordinates (up, forward)
+        azimuth = np.radians(camera_model.get_azimuth_table())
+        elevation = np.radians(camera_model.get_elevation_table())
+        up = np.tan(elevation) * np.sqrt(1 + np.tan(azimuth) ** 2)
+        norm = np.sqrt(1 + np.tan(azimuth) ** 2 + up ** 2)
+        self.__up = (up / norm).astype(np.float32)
+        self.__forward = (1 / norm).astype(np.float32)
+        self.__height = resolution[1]
+        self.__rows = {}
+
+    def get_max_elevation(self):
+        """returns the highest world elevation (degrees) a floor target can appear at, before the margin"""
+        return self.__max_elevation
+
+    def camera_pitch(self, top_servo_deg:float):
+        return self.__tilt_sign * (top_servo_deg - self.__level_deg)
+
+    def top_row(self, top_servo_deg:float):
+        """returns the first image row that can contain a floor target at this tilt, 0 when the whole frame can"""
+        key = round(float(top_servo_deg), 1)
+        if key not in self.__rows:
+            pitch = np.radians(self.camera_pitch(key))
+            world_up = self.__up * np.cos(pitch) + self.__forward * np.sin(pitch)
+            #the highest looking pixel of each row decides whether the row is kept
+            row_elevation = np.degrees(np.arcsin(np.clip(world_up.max(axis=1), -1, 1)))
+            keep = np.nonzero(row_elevation <= self.__max_elevation + self.__margin_deg)[0]
+            self.__rows[key] = int(keep[0]) if len(keep) else self.__height
+            if(self.__verbose):
+                print(f"[ROI] tilt {key} deg => rows {self.__rows[key]}:{self.__height}")
+        return self.__rows[key]
+
+    def from_mount(self, camera_mount):
+        """returns the first floor row for the current CameraMount angles"""
+        top_servo_deg, _ = camera_mount.getSphericalCoordinates()
+        return self.top_row(top_servo_deg)
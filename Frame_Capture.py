@@ -0,0 +1,282 @@
+import threading
+import pathlib
+import time
+
+import numpy as np
+import cv2
+
+
+def yuv_buffer_shape(resolution:tuple):
+    """
+    returns the (rows, width) shape of a picamera YUV420 (I420) capture at resolution (width, height).\n
+    picamera pads the width to a multiple of 32 and the height to a multiple of 16. The Y plane fills the first
+    padded height rows and the quarter size U and V planes follow, which is also the layout cv2.COLOR_YUV2BGR_I420 reads.
+    """
+    width, height = resolution
+    padded_width = (width + 31) // 32 * 32
+    padded_height = (height + 15) // 16 * 16
+    return (padded_height * 3 // 2, padded_width)
+
+
+def yuv_planes(buffer, resolution:tuple):
+    """returns zero-copy (Y, U, V) views of a YUV420 buffer, Y is (height, width) and U, V are (height/2, width/2)"""
+    width, height = resolution
+    rows, padded_width = buffer.shape
+    padded_height = rows * 2 // 3
+    flat = buffer.reshape(-1)
+    chroma_size = (padded_height // 2) * (padded_width // 2)
+    y = buffer[:height, :width]
+    u = flat[padded_height * padded_width:][:chroma_size].reshape(padded_height // 2, padded_width // 2)
+    v = flat[padded_height * padded_width + chroma_size:][:chroma_size].reshape(padded_height // 2, padded_width // 2)
+    return y, u[:height // 2, :width // 2], v[:height // 2, :width // 2]
+
+
+class FrameRingBuffer(object):
+    """
+    A small ring of preallocated frame buffers shared between the capture thread (the writer)
+    and the control loop (the reader). The writer always fills a slot that is neither the newest
+    finished frame nor the frame the reader is currently holding, so the reader never waits on
+    the camera and never sees a half written frame.
+    """
+    def __init__(self, shape:tuple=(480, 640, 3), slots:int=3, dtype=np.uint8):
+        assert slots >= 3, "[ERR] The ring needs at least 3 slots (writing, newest, reading)."
+        self.__shape = tuple(shape)
+        self.__slots = slots
+        self.__buffers = np.zeros((slots,) + self.__shape, dtype=dtype)
+        self.__frame_ids = np.full((slots,), -1, dtype=np.int64)
+        self.__timestamps = np.zeros((slots,), dtype=np.float64)
+        self.__lock = threading.Lock()
+        self.__write_slot = 0
+        self.__latest_slot = -1
+        self.__reading_slot = -1
+        self.__next_frame_id = 0
+        self.__last_read_id = -1
+        self.__published = 0
+        self.__dropped = 0
+
+    def get_shape(self):
+        return self.__shape
+
+    def get_write_buffer(self):
+        """returns the buffer the writer should fill next"""
+        return self.__buffers[self.__write_slot]
+
+    def publish(self, timestamp:float=None):
+        """
+        marks the write buffer as the newest finished frame, and moves the writer on to a free slot.\n
+        returns the id given to the published frame.
+        """
+        with self.__lock:
+            if (self.__latest_slot != -1) and (self.__frame_ids[self.__latest_slot] > self.__last_read_id):
+                # the previous frame was never read before being replaced
+                self.__dropped += 1
+            frame_id = self.__next_frame_id
+            self.__next_frame_id += 1
+            self.__frame_ids[self.__write_slot] = frame_id
+            self.__timestamps[self.__write_slot] = time.time() if timestamp is None else timestamp
+            self.__latest_slot = self.__write_slot
+            self.__published += 1
+            for slot in range(self.__slots):
+                if (slot != self.__latest_slot) and (slot != self.__reading_slot):
+                    self.__write_slot = slot
+                    break
+        return frame_id
+
+    def get_latest(self):
+        """
+        returns (frame_id, timestamp, frame) for the newest finished frame, or (-1, 0.0, None) if no frame has
+        been captured yet. The frame is a view into the ring and stays valid until the next call.
+        """
+        with self.__lock:
+            if self.__latest_slot == -1:
+                return (-1, 0.0, None)
+            self.__reading_slot = self.__latest_slot
+            self.__last_read_id = self.__frame_ids[self.__reading_slot]
+            return (int(self.__frame_ids[self.__reading_slot]),
+                    float(self.__timestamps[self.__reading_slot]),
+                    self.__buffers[self.__reading_slot])
+
+    def get_counters(self):
+        """returns a dictionary with the number of published and dropped (never read) frames"""
+        with self.__lock:
+            return {"published": self.__published, "dropped": self.__dropped}
+
+
+class _RingOutput(object):
+    """
+    A file-like output for picamera that writes the raw frame bytes straight into the write buffer of a
+    FrameRingBuffer, so no intermediate frame copy is made.
+    """
+    def __init__(self, ring:FrameRingBuffer):
+        self.__ring = ring
+        self.__offset = 0
+
+    def write(self, data):
+        flat = self.__ring.get_write_buffer().reshape(-1)
+        size = len(data)
+        end = min(self.__offset + size, flat.shape[0])
+        flat[self.__offset:end] = np.frombuffer(data, dtype=np.uint8, count=end - self.__offset)
+        self.__offset += size
+        return size
+
+    def flush(self):
+        pass
+
+    def finish(self, timestamp:float=None):
+        """publishes the frame that was just written, returns its frame id"""
+        self.__offset = 0
+        return self.__ring.publish(timestamp)
+
+
+class CaptureThread(threading.Thread):
+    """
+    Runs camera.capture_continuous(use_video_port=True) on its own thread, writing each frame into a
+    FrameRingBuffer. The control loop calls get_latest() to grab the newest finished frame without blocking.\n
+    With capture_format='yuv' the ring holds raw YUV420 buffers (yuv_buffer_shape), see yuv_planes and VisionFrame.from_yuv.
+    """
+    def __init__(self, camera, ring:FrameRingBuffer=None, capture_format:str='bgr', verbose:bool=False):
+        super().__init__(daemon=True)
+        self.__camera = camera
+        width, height = camera.resolution
+        if ring is None:
+            ring = FrameRingBuffer(yuv_buffer_shape(camera.resolution) if capture_format == 'yuv' else (height, width, 3))
+        self.__ring = ring
+        self.__output = _RingOutput(self.__ring)
+        self.__format = capture_format
+        self.__verbose = verbose
+        self.__stop_event = threading.Event()
+        self.__interval_sum = 0.0
+        self.__interval_max = 0.0
+        self.__interval_last = 0.0
+        self.__frames = 0
+        self.__errors = 0
+
+    def run(self):
+        if(self.__verbose):
+            print(f"[INFO] Capture thread started ({self.__format}, {self.__camera.resolution}).")
+        while not self.__stop_event.is_set():
+            try:
+                #capture_continuous only hands back finished frames, so the time between them is what can be measured
+                last = time.time()
+                for _ in self.__camera.capture_continuous(self.__output, format=self.__format, use_video_port=True):
+                    now = time.time()
+                    self.__output.finish(now)
+                    interval = now - last
+                    self.__interval_last = interval
+                    self.__interval_sum += interval
+                    self.__interval_max = max(self.__interval_max, interval)
+                    self.__frames += 1
+                    if self.__stop_event.is_set():
+                        break
+                    last = now
+            except Exception as e:
+                self.__errors += 1
+                if(self.__verbose):
+                    print(f"[ERR] Capture thread error: {e}")
+                time.sleep(0.05)
+
+    def stop(self, timeout:float=1.0):
+        self.__stop_event.set()
+        self.join(timeout)
+
+    def get_latest(self):
+        """returns (frame_id, timestamp, frame) for the newest finished frame"""
+        return self.__ring.get_latest()
+
+    def get_counters(self):
+        """
+        returns a dictionary of capture counters: frames captured, frames dropped (overwritten before they
+        were read), capture errors, and the last/mean/max interval between published frames in seconds.
+        """
+        counters = self.__ring.get_counters()
+        counters["frames"] = self.__frames
+        counters["errors"] = self.__errors
+        counters["interval_last"] = self.__interval_last
+        counters["interval_mean"] = (self.__interval_sum / self.__frames) if self.__frames else 0.0
+        counters["interval_max"] = self.__interval_max
+        return counters
+
+
+class FakeCamera(object):
+    """
+    A stand-in for picamera.PiCamera that feeds the recorded Frames/*.jpg images, so the capture code can
+    be run on a plain Linux box. Only the parts of the PiCamera interface used by the robot are provided.
+    """
+    def __init__(self, frame_dir:str='./Frames', resolution:tuple=(640, 480), framerate:float=24, loop:bool=True):
+        self.resolution = resolution
+        self.framerate = framerate
+        self.__loop = loop
+        self.__paths = sorted(pathlib.Path(frame_dir).glob('*.jpg'))
+        assert len(self.__paths) != 0, f"[ERR] No frames found in {frame_dir}"
+        self.__index = 0
+        self.__closed = False
+
+    def __next_frame(self, capture_format:str='bgr'):
+        if self.__index >= len(self.__paths):
+            if not self.__loop:
+                return None
+            self.__index = 0
+        image = cv2.imread(str(self.__paths[self.__index]))
+        self.__index += 1
+        width, height = self.resolution
+        if image.shape[:2] != (height, width):
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        if capture_format == 'rgb':
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        elif capture_format == 'yuv':
+            #laid out like the camera's padded I420 buffer
+            planes = yuv_planes(cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420), self.resolution)
+            image = np.zeros(yuv_buffer_shape(self.resolution), dtype=np.uint8)
+            for plane, values in zip(yuv_planes(image, self.resolution), planes):
+                plane[:] = values
+        return image
+
+    def __write(self, output, image):
+        if isinstance(output, np.ndarray):
+            output.reshape(-1)[:image.size] = image.reshape(-1)
+        else:
+            output.write(image.tobytes())
+            output.flush()
+
+    def start_preview(self):
+        pass
+
+    def stop_preview(self):
+        pass
+
+    def capture(self, output, format:str='bgr', use_video_port:bool=False):
+        image = self.__next_frame(format)
+        if image is not None:
+            self.__write(output, image)
+
+    def capture_continuous(self, output, format:str='bgr', use_video_port:bool=False):
+        period = 1.0 / self.framerate
+        next_time = time.time()
+        while not self.__closed:
+            image = self.__next_frame(format)
+            if image is None:
+                return
+            next_time += period
+            delay = next_time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.__write(output, image)
+            yield output
+
+    def close(self):
+        self.__closed = True
+
+
+if __name__ == '__main__':
+    camera = FakeCamera('./Frames')
+    capture = CaptureThread(camera, verbose=True)
+    capture.start()
+    last_id = -1
+    for tick in range(50):
+        frame_id, timestamp, frame = capture.get_latest()
+        if frame_id != last_id:
+            print(f"tick {tick}: frame {frame_id} @ {timestamp:.3f} mean={frame.mean():.1f}")
+            last_id = frame_id
+        time.sleep(0.1)
+    capture.stop()
+    print(capture.get_counters())
@@ -0,0 +1,153 @@
+import threading
+import queue
+import pathlib
+import re
+import time
+
+import cv2
+
+from Overlay import render_overlay
+
+DROP_POLICIES = ("newest", "oldest", "detection")
+
+
+def frame_filename(timestamp:float, sequence:int, extension:str='jpg'):
+    """
+    returns a unique frame filename, frame_<microseconds since the Epoch>_<sequence>.jpg.\n
+    The sequence number keeps frames taken within the same microsecond (or after a clock step) from overwriting each other.
+    """
+    return f"frame_{int(round(timestamp * 1e6)):016d}_{sequence:06d}.{extension}"
+
+
+def parse_frame_timestamp(path):
+    """
+    returns the capture time (seconds since the Epoch) encoded in a frame filename.\n
+    Handles both the frame_<microseconds>_<sequence>.jpg names and the older frame_<seconds>.jpg names.
+    """
+    match = re.match(r"frame_(\d+)", pathlib.Path(path).stem)
+    if match is None:
+        return None
+    digits = match.group(1)
+    return int(digits) / 1e6 if len(digits) > 12 else float(digits)
+
+
+def sorted_frame_paths(frame_dir:str, pattern:str='frame_*.jpg'):
+    """returns the frame paths in a directory sorted by capture time, then name"""
+    paths = [p for p in pathlib.Path(frame_dir).glob(pattern) if parse_frame_timestamp(p) is not None]
+    return sorted(paths, key=lambda p: (parse_frame_timestamp(p), p.name))
+
+
+class FrameWriter(threading.Thread):
+    """
+    Writes frames to disk on a background thread, so JPEG encoding never runs on the control loop.\n
+    Frames are handed over through a bounded queue. When the queue is full the drop policy decides what is lost:\n
+    newest => the incoming frame is dropped.\n
+    oldest => the oldest queued frame is dropped to make room.\n
+    detection => only frames submitted with detected=True are logged, and the incoming frame is dropped when full.
+    """
+    def __init__(self, image_dir:str='./Frames', max_queue:int=8, drop_policy:str="newest", jpeg_quality:int=90, verbose:bool=False):
+        super().__init__(daemon=True)
+        assert drop_policy in DROP_POLICIES, f"[ERR] drop_policy must be one of {DROP_POLICIES}"
+        self.__image_dir = pathlib.Path(image_dir)
+        self.__image_dir.mkdir(parents=True, exist_ok=True)
+        self.__queue = queue.Queue(maxsize=max_queue)
+        self.__drop_policy = drop_policy
+        self.__params = [int(cv2.IMWRITE_JPEG_QUALITY), int(jpeg_quality)]
+        self.__verbose = verbose
+        self.__lock = threading.Lock()
+        self.__sequence = 0
+        self.__queued = 0
+        self.__written = 0
+        self.__dropped = 0
+        self.__skipped = 0
+        self.__errors = 0
+        self.__write_time = 0.0
+
+    def get_drop_policy(self):
+        return self.__drop_policy
+
+    def submit(self, image, timestamp:float=None, detected:bool=False, overlays:dict=None, yuv_resolution:tuple=None):
+        """
+        queues a copy of image to be written, never blocks.\n
+        overlays => optional detection records to draw before writing, e.g. {"buoys": reds, "tags": tags}. They are
+        rendered on the writer thread (Overlay.render_overlay), so dropped frames are never annotated.\n
+        yuv_resolution => (width, height) when image is a YUV420 capture buffer, it is then converted to BGR on the writer thread.\n
+        returns True if the frame was queued.
+        """
+        if (self.__drop_policy == "detection") and (not detected):
+            with self.__lock:
+                self.__skipped += 1
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.__lock:
+            sequence = self.__sequence
+            self.__sequence += 1
+            if self.__queue.full():
+                if self.__drop_policy == "oldest":
+                    try:
+                        self.__queue.get_nowait()
+                        self.__dropped += 1
+                    except queue.Empty:
+                        pass
+                else:
+                    self.__dropped += 1
+                    return False
+            # the capture buffer is reused, so the writer needs its own copy
+            self.__queue.put_nowait((sequence, timestamp, image.copy(), overlays, yuv_resolution))
+            self.__queued += 1
+        return True
+
+    def get_image_dir(self):
+        return self.__image_dir
+
+    def write_frame(self, sequence:int, timestamp:float, image):
+        """writes one frame, called on the writer thread. Subclasses override this to log to other formats."""
+        fn = self.__image_dir / frame_filename(timestamp, sequence)
+        if cv2.imwrite(str(fn), image, self.__params):
+            if(self.__verbose):
+                print(f"[LOG] Wrote {fn}.")
+            return True
+        print(f"[ERR] Could not write {fn}.")
+        return False
+
+    def close_output(self):
+        """called on the writer thread once the queue has been drained"""
+        pass
+
+    def run(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            sequence, timestamp, image, overlays, yuv_resolution = item
+            start = time.time()
+            if yuv_resolution is not None:
+                width, height = yuv_resolution
+                image = cv2.cvtColor(image, cv2.COLOR_YUV2BGR_I420)[:height, :width]
+            if overlays:
+                #the queued image is the writer's own copy, so it is annotated in place
+                render_overlay(image, copy=False, **overlays)
+            if self.write_frame(sequence, timestamp, image):
+                with self.__lock:
+                    self.__written += 1
+                    self.__write_time += time.time() - start
+            else:
+                with self.__lock:
+                    self.__errors += 1
+        self.close_output()
+
+    def stop(self, timeout:float=5.0):
+        """writes out the frames still queued, then stops the writer thread"""
+        self.__queue.put(None)
+        self.join(timeout)
+
+    def get_counters(self):
+        """returns a dictionary with the queued, written, dropped, skipped (not a detection) and pending frame counts"""
+        with self.__lock:
+            return {"queued": self.__queued,
+                    "written": self.__written,
+                    "dropped": self.__dropped,
+                    "skipped": self.__skipped,
+                    "errors": self.__errors,
+                    "pending": self.__queue.qsize(),
+                    "write_time_mean": (self.__write_time / self.__written) if self.__written else 0.0}
@@ -0,0 +1,112 @@
+import argparse
+import json
+import pathlib
+import time
+
+import numpy as np
+import cv2
+
+from Frame_Logger import sorted_frame_paths, parse_frame_timestamp
+
+
+class FrameStore(object):
+    """
+    Read-only access to a decoded frame store: a memory-mapped uint8 array of shape (N, height, width, 3) in
+    frames.npy with the capture timestamps in timestamps.npy. Frames are returned as zero-copy views into the map,
+    so analysis scripts and notebooks never decode the JPEGs again, e.g.\n
+        store = FrameStore('./frame_store')\n
+        run = store.between(1681905135, 1681905200)   # (n, 480, 640, 3) view, nothing is read until used
+    """
+    def __init__(self, store_dir:str='./frame_store'):
+        self.__store_dir = pathlib.Path(store_dir)
+        self.__frames = np.load(self.__store_dir / 'frames.npy', mmap_mode='r')
+        self.__timestamps = np.load(self.__store_dir / 'timestamps.npy')
+        assert self.__frames.shape[0] == self.__timestamps.shape[0], f"[ERR] {store_dir} frames and timestamps differ in length."
+
+    def __len__(self):
+        return self.__frames.shape[0]
+
+    def __getitem__(self, index):
+        """returns a frame (or a stack of frames for a slice) as a read-only view, no copy is made for ints and slices"""
+        return self.__frames[index]
+
+    def get_frames(self):
+        """returns the whole (N, height, width, 3) memory-mapped array"""
+        return self.__frames
+
+    def get_timestamps(self):
+        return self.__timestamps
+
+    def index_range(self, start_time:float, end_time:float):
+        """returns the slice of frames captured in [start_time, end_time]"""
+        start = int(np.searchsorted(self.__timestamps, start_time, side='left'))
+        end = int(np.searchsorted(self.__timestamps, end_time, side='right'))
+        return slice(start, end)
+
+    def between(self, start_time:float, end_time:float):
+        """returns a zero-copy view of the frames captured in [start_time, end_time]"""
+        return self.__frames[self.index_range(start_time, end_time)]
+
+    def frame_at(self, timestamp:float):
+        """returns the index of the last frame captured at or before timestamp"""
+        return max(int(np.searchsorted(self.__timestamps, timestamp, side='right')) - 1, 0)
+
+
+def build_frame_store(frame_dir:str='./Frames', store_dir:str='./frame_store', video_path:str=None,
+                      shape:tuple=(480, 640), verbose:bool=False):
+    """
+    decodes every frame of a Frames/ directory (or an indexed video log) once into a memory-mapped store.\n
+    Frames of a different size are resized to shape (height, width). Returns the number of frames stored.
+    """
+    store_dir = pathlib.Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    if video_path is not None:
+        from Video_Log import VideoLogReader
+        reader = VideoLogReader(video_path)
+        count = len(reader)
+        timestamps = np.array(reader.get_timestamps(), dtype=np.float64)
+        read = reader.read
+        names = [f"{pathlib.Path(video_path).name}#{i}" for i in range(count)]
+    else:
+        paths = sorted_frame_paths(frame_dir)
+        count = len(paths)
+        timestamps = np.array([parse_frame_timestamp(p) for p in paths], dtype=np.float64)
+        read = lambda i: cv2.imread(str(paths[i]))
+        names = [p.name for p in paths]
+
+    height, width = shape
+    frames = np.lib.format.open_memmap(store_dir / 'frames.npy', mode='w+', dtype=np.uint8, shape=(count, height, width, 3))
+    valid = np.ones((count,), dtype=bool)
+    for i in range(count):
+        image = read(i)
+        if image is None:
+            print(f"[WARN] Could not decode {names[i]}, storing a black frame.")
+            frames[i] = 0
+            valid[i] = False
+            continue
+        if image.shape[:2] != (height, width):
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        frames[i] = image
+        if(verbose and (i % 50 == 0)):
+            print(f"[INFO] Decoded {i+1}/{count} frames.")
+    frames.flush()
+    del frames
+    np.save(store_dir / 'timestamps.npy', timestamps)
+    with open(store_dir / 'index.json', 'w') as f:
+        json.dump({"names": names, "valid": valid.tolist()}, f)
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Decode a Frames/ directory or video log once into a memory-mapped frame store.")
+    parser.add_argument('frame_dir', nargs='?', default='./Frames')
+    parser.add_argument('store_dir', nargs='?', default='./frame_store')
+    parser.add_argument('--video', default=None, help="indexed video log to decode instead of frame_dir")
+    args = parser.parse_args()
+    start = time.time()
+    count = build_frame_store(args.frame_dir, args.store_dir, video_path=args.video, verbose=True)
+    print(f"[INFO] Stored {count} frames in {args.store_dir} in {time.time()-start:.1f} s.")
+    start = time.time()
+    store = FrameStore(args.store_dir)
+    total = sum(int(store[i][::8, ::8].sum()) for i in range(len(store)))
+    print(f"[INFO] Touched every stored frame in {time.time()-start:.2f} s (checksum {total}).")
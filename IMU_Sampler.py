@@ -0,0 +1,225 @@
+import threading
+import time
+
+import numpy as np
+
+#BNO055 properties read per sample and their lengths, in adafruit_bno055 units (degrees, m/s^2, microteslas, rad/s)
+IMU_FIELDS = (("euler", 3), ("quaternion", 4), ("linear_acceleration", 3), ("gravity", 3),
+              ("acceleration", 3), ("magnetic", 3), ("gyro", 3))
+IMU_DTYPE = np.dtype([('timestamp', np.float64)] + [(name, np.float32, (size,)) for name, size in IMU_FIELDS])
+
+
+def make_bno055():
+    """returns the BNO055 on the Pi's I2C bus (adafruit_bno055.BNO055_I2C)"""
+    import board
+    import busio
+    import adafruit_bno055
+    return adafruit_bno055.BNO055_I2C(busio.I2C(board.SCL, board.SDA))
+
+
+class IMUSampler(threading.Thread):
+    """
+    Samples the BNO055 at a fixed rate on its own thread, so the control loop never waits on the I2C bus.\n
+    Each sample is written into a preallocated ring of IMU_DTYPE records (timestamp plus the IMU_FIELDS readings).
+    There is a single writer and readers take no lock: get_latest() returns the last finished record, published by swapping one
+    reference. The ring has one spare slot, so the slot being written is never one of the capacity published
+    samples, and get_window() copies a span of the ring then drops any record the writer may have moved on to while
+    it was being copied (the write count is read before and after the copy, like a seqlock).\n
+    Readings the driver reports as None (the BNO055 does while it restarts) are stored as NaN.\n
+    pause() hands the I2C bus to the caller (ADCS calibration reads the sensor directly) until resume().
+    """
+    def __init__(self, sensor=None, rate:float=100.0, capacity:int=1024, fields:tuple=None, verbose:bool=False):
+        """
+        sensor => an adafruit_bno055 driver or FakeBNO055, defaults to make_bno055().\n
+        rate => samples per second.\n
+        capacity => samples kept in the ring (about 10 s at the default rate).\n
+        fields => IMU_FIELDS names to read, fewer fields means less time on the bus per sample (the rest stay NaN).
+        """
+        super().__init__(daemon=True)
+        self.__sensor = make_bno055() if sensor is None else sensor
+        self.__period = 1.0 / rate
+        self.__capacity = capacity
+        self.__slots = capacity + 1
+        self.__fields = [name for name, _ in IMU_FIELDS] if fields is None else list(fields)
+        self.__verbose = verbose
+        self.__ring = np.zeros((self.__slots,), dtype=IMU_DTYPE)
+        self.__ring[:] = np.nan
+        self.__count = 0
+        self.__latest = None
+        self.__stop_event = threading.Event()
+        #held for every read, so pause() waits for a sample in progress before the caller gets the bus
+        self.__bus_lock = threading.Lock()
+        self.__pauses = 0
+
+        self.__errors = 0
+        self.__overruns = 0
+        self.__read_time_sum = 0.0
+        self.__read_time_max = 0.0
+
+    def __read(self, slot):
+        """reads every field straight into a ring slot"""
+        record = self.__ring[slot]
+        for name in self.__fields:
+            value = getattr(self.__sensor, name)
+            if (value is None) or (None in value):
+                record[name] = np.nan
+            else:
+                record[name] = value
+        record['timestamp'] = time.time()
+
+    def sample(self):
+        """takes one sample now (run() calls this at the configured rate), returns the new record, or None while paused"""
+        slot = self.__count % self.__slots
+        with self.__bus_lock:
+            if self.__pauses:
+                return None
+            start = time.perf_counter()
+            try:
+                self.__read(slot)
+            except (OSError, RuntimeError) as e:
+                #I2C hiccups are common on the BNO055, skip the sample
+                self.__errors += 1
+                if(self.__verbose):
+                    print(f"[ERR] IMU read failed: {e}")
+                return None
+            read_time = time.perf_counter() - start
+        self.__read_time_sum += read_time
+        self.__read_time_max = max(self.__read_time_max, read_time)
+        latest = self.__ring[slot].copy()
+        self.__count += 1
+        self.__latest = latest
+        return latest
+
+    def run(self):
+        if(self.__verbose):
+            print(f"[INFO] IMU sampler started at {1/self.__period:.0f} Hz.")
+        next_time = time.perf_counter()
+        while not self.__stop_event.is_set():
+            self.sample()
+            next_time += self.__period
+            delay = next_time - time.perf_counter()
+            if delay < 0:
+                #the bus is slower than the rate, start the schedule again from now rather than bursting
+                self.__overruns += 1
+                next_time = time.perf_counter()
+            elif self.__stop_event.wait(delay):
+                break
+
+    def stop(self, timeout:float=1.0):
+        self.__stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def pause(self):
+        """stops sampling until resume() (pauses nest), returns once a read in progress has finished so the caller has the bus"""
+        with self.__bus_lock:
+            self.__pauses += 1
+
+    def resume(self):
+        with self.__bus_lock:
+            self.__pauses = max(self.__pauses - 1, 0)
+
+    def is_paused(self):
+        return self.__pauses > 0
+
+    def get_latest(self):
+        """returns the newest IMU_DTYPE record (a private copy), or None before the first sample"""
+        return self.__latest
+
+    def get_count(self):
+        """returns the number of samples taken so far"""
+        return self.__count
+
+    def get_window(self, start:float=None, end:float=None):
+        """
+        returns the samples with start <= timestamp <= end (time.time() seconds, None leaves that side open) still in
+        the ring, oldest first, as an IMU_DTYPE array copy.
+        """
+        count = self.__count
+        first = max(count - self.__capacity, 0)
+        index = np.arange(first, count) % self.__slots
+        window = self.__ring[index]
+        #writing sample n overwrites sample n - slots, drop those the writer may have reached while the copy was made
+        stale = max(self.__count - self.__capacity - first, 0)
+        window = window[stale:]
+        keep = np.ones(len(window), dtype=bool)
+        if start is not None:
+            keep &= window['timestamp'] >= start
+        if end is not None:
+            keep &= window['timestamp'] <= end
+        return window[keep]
+
+    def get_counters(self):
+        """returns a dictionary with the samples taken, read errors, schedule overruns and the mean/max read time in seconds"""
+        samples = self.__count
+        return {"samples": samples,
+                "errors": self.__errors,
+                "overruns": self.__overruns,
+                "read_time_mean": (self.__read_time_sum / samples) if samples else 0.0,
+                "read_time_max": self.__read_time_max}
+
+
+class FakeBNO055(object):
+    """
+    A stand-in for adafruit_bno055.BNO055_I2C, so the IMU code runs on a plain Linux box. The robot sits level and
+    turns about z at yaw_rate deg/s, with a little noise on every reading. read_delay (seconds) imitates the I2C
+    transfer time of each property read.
+    """
+    def __init__(self, yaw_rate:float=30.0, noise:float=0.01, read_delay:float=0.0, seed:int=0):
+        self.__yaw_rate = yaw_rate
+        self.__noise = noise
+        self.__read_delay = read_delay
+        self.__rng = np.random.default_rng(seed)
+        self.__start = time.time()
+
+    def __reading(self, values):
+        if self.__read_delay > 0:
+            time.sleep(self.__read_delay)
+        values = np.asarray(values, dtype=np.float64)
+        return tuple(float(v) for v in values + self.__noise * self.__rng.standard_normal(values.shape))
+
+    def __heading(self):
+        return (self.__yaw_rate * (time.time() - self.__start)) % 360.0
+
+    @property
+    def euler(self):
+        return self.__reading((self.__heading(), 0.0, 0.0))
+
+    @property
+    def quaternion(self):
+        half = np.radians(self.__heading()) / 2
+        return self.__reading((np.cos(half), 0.0, 0.0, np.sin(half)))
+
+    @property
+    def linear_acceleration(self):
+        return self.__reading((0.0, 0.0, 0.0))
+
+    @property
+    def gravity(self):
+        return self.__reading((0.0, 0.0, 9.81))
+
+    @property
+    def acceleration(self):
+        return self.__reading((0.0, 0.0, 9.81))
+
+    @property
+    def magnetic(self):
+        heading = np.radians(self.__heading())
+        return self.__reading((30.0 * np.cos(heading), -30.0 * np.sin(heading), -40.0))
+
+    @property
+    def gyro(self):
+        return self.__reading((0.0, 0.0, np.radians(self.__yaw_rate)))
+
+
+if __name__ == '__main__':
+    sampler = IMUSampler(FakeBNO055(read_delay=0.0005), rate=100.0, verbose=True)
+    sampler.start()
+    for tick in range(10):
+        time.sleep(0.1)
+        latest = sampler.get_latest()
+        print(f"tick {tick}: heading {latest['euler'][0]:.1f} deg, gyro z {np.degrees(latest['gyro'][2]):.1f} deg/s")
+    window = sampler.get_window(time.time() - 0.5)
+    print(f"[INFO] {len(window)} samples in the last 0.5 s, mean gyro z {np.degrees(window['gyro'][:, 2].mean()):.1f} deg/s")
+    sampler.stop()
+    print(f"[INFO] {sampler.get_counters()}")
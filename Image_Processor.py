@@ -16,20 +16,111 @@ except:
 
 from Camera_Util import detect_apriltags
 from Camera_Util import detect_buoys
+from Camera_Util import configure_buoy_detector
+from Camera_Util import DETECTION_DTYPE
+from Frame_Capture import CaptureThread, FakeCamera, yuv_buffer_shape
+from Vision_Frame import VisionFrame
+from Frame_Logger import FrameWriter
+from Video_Log import VideoFrameWriter
+from Floor_ROI import FloorROI
+from Sphere_Detector import detect_spheres_and_buoys, configure_sphere_detector
+from Tracker import Tracker, sphere_records
+from Vision_Worker import VisionWorker
+from Vision_Pipeline import VisionPipeline
+from Sweep_Scheduler import robot_bearings
+from Motion_Gate import MotionGate, DETECT, REUSE, DISCARD
 class ImageProcessor():
-    def __init__(self, log_dir:str='./', verbose:bool=False, enabled:bool=True):
-        self.__camera = picamera.PiCamera()
-        self.__camera.resolution = (640, 480)
-        self.__camera.framerate = 24
-        time.sleep(0.1) #camera warm up time
-        self.__image = np.empty((480*640*3,), dtype=np.uint8)
+    def __init__(self, log_dir:str='./', verbose:bool=False, enabled:bool=True, threaded_capture:bool=False, camera=None,
+                 log_policy:str="newest", log_queue:int=8, log_mode:str="jpeg", buoy_pyramid_level:int=0,
+                 motion_gating:bool=False, log_overlay:bool=False, capture_format:str="bgr", floor_roi:bool=False,
+                 sphere_detection:bool=False, tracking:bool=False, detect_every:int=6, process_isolated:bool=False,
+                 tag_detection:bool=False, parallel_detectors:bool=False, detector_deadline:float=0.030,
+                 sweep=None):
+        """
+        threaded_capture => capture frames on a background thread into a ring buffer, run() then uses the newest frame without waiting.\n
+        camera => the camera to use, defaults to the PiCamera. Pass a Frame_Capture.FakeCamera to replay the Frames/ directory.\n
+        log_policy => which frames the background frame writer drops when it falls behind, "newest", "oldest" or "detection" (only log frames with detections).\n
+        log_queue => number of frames the frame writer may hold before dropping.\n
+        buoy_pyramid_level => find buoy candidates at 1/2**level scale and refine them at full resolution, 0 searches the full frame (see Vision_Benchmark.py --pyramid).\n
+        motion_gating => skip detection on frames that barely changed (reusing the last results) and drop frames taken while turning fast, see Motion_Gate.\n
+        log_overlay => draw the detections onto logged frames (on the writer thread). Off by default, so logged frames stay clean for replay.\n
+        capture_format => "bgr", or "yuv" to capture YUV420 into a preallocated buffer: tag detection then reads the Y plane as its grayscale image and buoy detection classifies the half resolution chroma planes, with no full frame color conversion (logged frames are converted on the writer thread).\n
+        floor_roi => only search the image rows that can contain floor targets at the current camera tilt (passed to run()), see Floor_ROI.\n
+        sphere_detection => find ping pong balls, tennis balls and buoys with range estimates in one shared pass, see Sphere_Detector and get_spheres(). The buoy records then come from the same pass, so BuoyDetector does not run.\n
+        tracking, detect_every => keep persistent ids and velocities for the targets (spheres when sphere_detection is on, else buoys), running the detectors every detect_every frames or when a track goes stale and only predicting the tracks in between, see Tracker and get_tracks().\n
+        process_isolated => capture and detect in a separate process (Vision_Worker), frames come back through shared memory and detections over a pipe, so vision time never delays the control loop. run() then only collects the newest result. threaded_capture is implied and the camera is opened in the worker. The worker runs its detectors in order, so parallel_detectors cannot be combined with it.\n
+        tag_detection => also detect AprilTags, see get_tags().\n
+        parallel_detectors, detector_deadline => run the detectors concurrently on a thread pool (Vision_Pipeline) and wait at most detector_deadline seconds per frame, a detector that is still running keeps its previous result. Each frame is copied into a buffer no late detector is reading, since the capture buffer is reused.\n
+        sweep => a running Sweep_Scheduler (with a Pan_Planner, it is told what each detected frame saw). Each frame is stamped with the mount pose at its exposure (VisionFrame.get_mount()), the tilt is taken from it when run() is not given one, frames taken before the mount settled are not detected on, and get_robot_bearings() turns the buoy bearings into robot bearings.\n
+        log_mode => "jpeg" writes one Frames/frame_*.jpg per frame, "video" appends frames to Frames/run_<time>.avi with a seekable timestamp index (see Video_Log).
+        """
+        assert capture_format in ["bgr", "yuv"], "[ERR] capture_format must be bgr or yuv"
+        self.__capture_format = capture_format
+        self.__resolution = (640, 480)
+        if(capture_format == "yuv"):
+            self.__image = np.empty(yuv_buffer_shape(self.__resolution), dtype=np.uint8)
+        else:
+            self.__image = np.empty((480*640*3,), dtype=np.uint8)
         self.__verbose = verbose
         self.__enabled = enabled
+        self.__capture_thread = None
+        self.__worker = None
+        self.__framerate = 24
+        assert not (process_isolated and parallel_detectors), "[ERR] parallel_detectors is not supported with process_isolated."
+        if(process_isolated):
+            #started first, so the fork does not copy the other threads, the worker configures its own detectors
+            self.__worker = VisionWorker(camera, capture_format=capture_format, resolution=self.__resolution,
+                                         framerate=self.__framerate, motion_gating=motion_gating, floor_roi=floor_roi,
+                                         sphere_detection=sphere_detection, tag_detection=tag_detection,
+                                         buoy_pyramid_level=buoy_pyramid_level, verbose=verbose)
+            self.__camera = None
+        else:
+            self.__camera = picamera.PiCamera() if camera is None else camera
+            self.__camera.resolution = self.__resolution
+            self.__camera.framerate = self.__framerate
+            time.sleep(0.1) #camera warm up time
+            #the YUV lookup tables are built now, not on the first frame's control loop tick
+            if(buoy_pyramid_level > 0) or (capture_format == "yuv"):
+                configure_buoy_detector(pyramid_level=buoy_pyramid_level, capture_format=capture_format)
+            if sphere_detection and (capture_format == "yuv"):
+                configure_sphere_detector(capture_format=capture_format)
+        self.__last_frame_id = -1
+        self.__motion_gate = MotionGate(verbose=verbose) if (motion_gating and not process_isolated) else None
+        self.__reds = np.empty((0,), dtype=DETECTION_DTYPE)
+        self.__sphere_detection = sphere_detection
+        self.__spheres = []
+        self.__tag_detection = tag_detection
+        self.__sweep = sweep
+        self.__pose = None
+        self.__tags = []
+        self.__pipeline = None
+        self.__pipeline_buffers = []
+        if(parallel_detectors and not process_isolated):
+            if sphere_detection:
+                detectors = {"spheres": lambda frame, top_row: detect_spheres_and_buoys(frame, top_row)}
+            else:
+                detectors = {"buoys": lambda frame, top_row: detect_buoys(frame, top_row)[0]}
+            if tag_detection:
+                detectors["tags"] = lambda frame, top_row: detect_apriltags(frame)
+            self.__pipeline = VisionPipeline(detectors, deadline=detector_deadline, verbose=verbose)
+        self.__tracker = Tracker(detect_every=detect_every, resolution=self.__resolution, verbose=verbose) if tracking else None
+        self.__log_overlay = log_overlay
+        self.__floor_roi = FloorROI(resolution=self.__resolution, verbose=verbose) if floor_roi else None
+        if(threaded_capture and not process_isolated):
+            self.__capture_thread = CaptureThread(self.__camera, capture_format=capture_format, verbose=verbose)
+            self.__capture_thread.start()
         #create image save directory
         self.__image_dir = pathlib.Path(log_dir,'Frames')
         if(self.__image_dir.exists() == False):
             print(f"[INFO] {self.__image_dir} does not exist, creating directory.")
         self.__image_dir.mkdir(parents=True, exist_ok=True)
+        assert log_mode in ["jpeg", "video"], "[ERR] log_mode must be jpeg or video"
+        if(log_mode == "video"):
+            video_path = self.__image_dir / f"run_{int(time.time())}.avi"
+            self.__frame_writer = VideoFrameWriter(video_path, fps=self.__framerate, max_queue=log_queue, drop_policy=log_policy, verbose=verbose)
+        else:
+            self.__frame_writer = FrameWriter(self.__image_dir, max_queue=log_queue, drop_policy=log_policy, verbose=verbose)
+        self.__frame_writer.start()
         self.__buzzer = TonalBuzzer(11)    
     # ------------------------------------------------------------------------ #
     # Run an iteration of the image processor. 
@@ -37,50 +128,287 @@ class ImageProcessor():
     # the PICAM does not need any robot_state input
     # ------------------------------------------------------------------------ #
     reds = []
-    def run(self):
+    def get_capture_counters(self):
+        """returns the capture thread counters (frames, dropped, frame interval), or None when capturing inline"""
+        if self.__capture_thread is None:
+            return None
+        return self.__capture_thread.get_counters()
+
+    def get_log_counters(self):
+        """returns the frame writer counters (queued, written, dropped)"""
+        return self.__frame_writer.get_counters()
+
+    def get_worker_counters(self):
+        """returns the vision worker counters (results, latency, detection time), or None when running in process"""
+        if self.__worker is None:
+            return None
+        return self.__worker.get_counters()
+
+    def get_gate_counters(self):
+        """returns the motion gate counters (detected, reused, discarded, time saved), or None when gating is off"""
+        if self.__motion_gate is None:
+            return None
+        return self.__motion_gate.get_counters()
+
+    def get_spheres(self):
+        """returns the Arena.Sphere detections of the last detected frame, nearest first (empty when sphere_detection is off)"""
+        return self.__spheres
+
+    def get_tags(self):
+        """returns the Camera_Util.TAG_DTYPE tags of the last detected frame (empty when tag_detection is off)"""
+        return self.__tags
+
+    def get_pipeline_counters(self):
+        """returns the parallel detector counters (wall time, per detector time, late frames), or None when detecting in order"""
+        if self.__pipeline is None:
+            return None
+        return self.__pipeline.get_counters()
+
+    def get_pose(self):
+        """returns the (top_servo_deg, bottom_servo_deg, settled) mount pose of the frame the current buoys were detected on, None without a sweep"""
+        return self.__pose
+
+    def get_robot_bearings(self):
+        """returns the last buoy bearings relative to the robot's heading (camera bearing plus pan), None without a sweep"""
+        if self.__pose is None:
+            return None
+        return robot_bearings(self.__reds['bearing'], self.__pose[1])
+
+    def __target_bearings(self, pose):
+        """returns the robot bearings of the spheres (or buoys when sphere_detection is off) seen at a mount pose"""
+        if self.__sphere_detection:
+            return robot_bearings([sphere.get_bearing() for sphere in self.__spheres], pose[1])
+        return robot_bearings(self.__reds['bearing'], pose[1])
+
+    def __stamp(self, frame, timestamp:float):
+        """stamps the frame with the sweep pose at exposure, about one frame period before the capture timestamp"""
+        pose = self.__sweep.pose_at(timestamp - 1.0 / self.__framerate)
+        frame.set_mount(pose)
+        return pose
+
+    def get_tracks(self):
+        """returns the confirmed Tracker.TRACK_DTYPE tracks, or None when tracking is off"""
+        if self.__tracker is None:
+            return None
+        return self.__tracker.get_tracks()
+
+    def stop(self):
+        if self.__capture_thread is not None:
+            self.__capture_thread.stop()
+        if self.__worker is not None:
+            self.__worker.stop()
+        if self.__pipeline is not None:
+            self.__pipeline.stop()
+        self.__frame_writer.stop()
+
+    def run(self, gyro_rate=None, camera_tilt:float=None):
+        """
+        gyro_rate => current angular rate in deg/s (ADCS.get_gyro()), used by the motion gate to drop blurred frames.\n
+        camera_tilt => CameraMount top servo degrees, used by the floor ROI.
+        """
         if(self.__enabled):
-            try:
-                self.__camera.start_preview()
-                self.__camera.capture(self.__image, 'bgr')
-            except:
-                # restart the camera
-                # self.__camera = picamera.PiCamera()
-                self.__camera.resolution = (640, 480)
-                self.__camera.framerate = 24
-                time.sleep(0.05) # camera warmup time
-                
-            image = self.__image.reshape((480, 640, 3))
-            reds,_,_,_= detect_buoys(image)
+            if self.__worker is not None:
+                self.__run_worker(gyro_rate, camera_tilt)
+                return
+            if self.__capture_thread is not None:
+                frame_id, timestamp, image = self.__capture_thread.get_latest()
+                if (image is None) or (frame_id == self.__last_frame_id):
+                    # no new frame since the last tick, don't block waiting for one
+                    return
+                self.__last_frame_id = frame_id
+                if(self.__capture_format == "yuv"):
+                    frame = VisionFrame.from_yuv(image, self.__resolution, frame_id, timestamp)
+                else:
+                    frame = VisionFrame(image, frame_id, timestamp)
+            else:
+                try:
+                    self.__camera.start_preview()
+                    self.__camera.capture(self.__image, self.__capture_format)
+                except:
+                    # restart the camera
+                    # self.__camera = picamera.PiCamera()
+                    self.__camera.resolution = (640, 480)
+                    self.__camera.framerate = 24
+                    time.sleep(0.05) # camera warmup time
+                    
+                if(self.__capture_format == "yuv"):
+                    image = self.__image
+                    frame = VisionFrame.from_yuv(image, self.__resolution)
+                else:
+                    image = self.__image.reshape((480, 640, 3))
+                    frame = VisionFrame(image)
+            panned = False
+            if self.__sweep is not None:
+                pose = self.__stamp(frame, frame.get_timestamp())
+                if not pose[2]:
+                    # the mount is still moving, the frame is smeared and its pan angle uncertain
+                    return
+                if camera_tilt is None:
+                    camera_tilt = pose[0]
+                # results from another pan angle say nothing about this view, and tracks there are in other pixels
+                panned = (self.__pose is not None) and (pose[1] != self.__pose[1])
+                if self.__tracker is not None:
+                    self.__tracker.set_pan(pose[1])
+                if panned and (self.__motion_gate is not None):
+                    self.__motion_gate.reset()
+            decision = DETECT
+            if self.__motion_gate is not None:
+                decision = self.__motion_gate.decide(frame, gyro_rate)
+                if decision == DISCARD:
+                    return
+            if (decision == DETECT) and (self.__tracker is not None) and (not self.__tracker.needs_detection()):
+                #the tracks are fresh, so move them along instead of detecting
+                self.__tracker.predict(frame.get_timestamp())
+                decision = REUSE
+            elif (decision == REUSE) and (self.__tracker is not None):
+                self.__tracker.predict(frame.get_timestamp())
+            if decision == DETECT:
+                start = time.perf_counter()
+                #all detectors share the frame, so each color conversion runs once per frame
+                top_row = 0
+                if (self.__floor_roi is not None) and (camera_tilt is not None):
+                    top_row = self.__floor_roi.top_row(camera_tilt)
+                fresh = True
+                if self.__pipeline is not None:
+                    private = self.__private_frame(frame, image)
+                    results = self.__pipeline.run(private, top_row=top_row)
+                    #the buoys (and spheres) come from one detector, its result carries the frame it was computed on
+                    target = "spheres" if self.__sphere_detection else "buoys"
+                    source = self.__pipeline.get_result_frame(target)
+                    if source is not None:
+                        if self.__sphere_detection:
+                            self.__spheres, self.__reds = results["spheres"]
+                        else:
+                            self.__reds = results["buoys"]
+                        self.__pose = source.get_mount()
+                    if self.__tag_detection and (results["tags"] is not None):
+                        self.__tags = results["tags"]
+                    #a late detector's result is from an earlier frame, its timestamp and pose are not this frame's
+                    fresh = source is private
+                else:
+                    if self.__sphere_detection:
+                        self.__spheres, self.__reds = detect_spheres_and_buoys(frame, top_row)
+                    else:
+                        self.__reds,_,_= detect_buoys(frame, top_row)
+                    if self.__tag_detection:
+                        self.__tags = detect_apriltags(frame)
+                    self.__pose = frame.get_mount()
+                if self.__tracker is not None:
+                    if not fresh:
+                        self.__tracker.predict(frame.get_timestamp())
+                    elif self.__sphere_detection:
+                        detections, kinds = sphere_records(self.__spheres)
+                        self.__tracker.update(detections, frame.get_timestamp(), kinds)
+                    else:
+                        self.__tracker.update(self.__reds, frame.get_timestamp())
+                if fresh and (self.__pose is not None):
+                    self.__sweep.observe(self.__pose[1], self.__target_bearings(self.__pose), frame.get_timestamp())
+                if self.__motion_gate is not None:
+                    self.__motion_gate.add_detect_time(time.perf_counter() - start)
+            reds = self.__reds
             print(reds)
-            if len(reds) != 0: 
+            if (len(reds) != 0) and (decision == DETECT): 
                 self.__buzzer.play(tone=Tone("A4"))
                 time.sleep(1)
                 self.__buzzer.stop()
                 for red in reds:
-                    print(f"RED DETECTED at {red}")
+                    print(f"RED DETECTED at {red['bearing']} deg ({red['x']},{red['y']}), area {red['area']}")
                     
 
             #detect APRIL TAGS
-            # detected, image, tagFamilies, tagIds, centers, angles, corners = detect_apriltags(image)
-            # if(detected == True):
-            #     if(self.__verbose==True):
-            #         print(f"TAG(s) DETECTED:")
-            #     for tagId in tagIds:
-            #         if(self.__verbose==True):
-            #             print(tagId)
-            # else:
-                
-            #     print(f"NO TAG(s) DETECTED!")
+            if self.__tag_detection and (self.__verbose==True):
+                if(len(self.__tags) != 0):
+                    print(f"TAG(s) DETECTED:")
+                    for tag in self.__tags:
+                        print(f"{tag['family']} {tag['id']} at {tag['bearing']} deg")
+                else:
+                    print(f"NO TAG(s) DETECTED!")
 
             
             #detect SPHERES
-            # detect_spheres(image)
+            if self.__sphere_detection and (self.__verbose ==True):
+                print(f"[CAM] spheres {self.__spheres}")
 
-            # log the image
-            fn = self.__image_dir / f"frame_{int(datetime.datetime.utcnow().timestamp())}.jpg"
             if (self.__verbose ==True):
-                print(f"Took image {fn}.")
-            cv2.imwrite(str(fn), image)
+                print(f"[CAM] frame cache {frame.get_cache_counters()}")
+                if self.__motion_gate is not None:
+                    print(f"[GATE] {decision} {self.__motion_gate.get_counters()}")
+                if self.__tracker is not None:
+                    print(f"[TRACK] {self.__tracker.get_tracks()[['id', 'kind', 'bearing']]}")
+
+            self.__log(frame, image, reds)
+
+    def __private_frame(self, frame, image):
+        """copies the frame into a preallocated buffer that no late pipeline detector is still reading"""
+        if len(self.__pipeline_buffers) == 0:
+            self.__pipeline_buffers = [np.empty_like(image) for _ in range(len(self.__pipeline.get_names()) + 1)]
+        buffer = next(b for b in self.__pipeline_buffers if not self.__pipeline.is_holding(b))
+        np.copyto(buffer, image)
+        if frame.is_yuv():
+            private = VisionFrame.from_yuv(buffer, self.__resolution, frame.get_frame_id(), frame.get_timestamp())
+        else:
+            private = VisionFrame(buffer, frame.get_frame_id(), frame.get_timestamp())
+        #the pose goes with the copy, so a late result still knows where the mount was
+        private.set_mount(frame.get_mount())
+        return private
+
+    def __log(self, frame, image, reds):
+        # log the image, encoding and writing happen on the frame writer thread
+        overlays = {"buoys": reds} if self.__log_overlay else None
+        yuv_resolution = self.__resolution if frame.is_yuv() else None
+        queued = self.__frame_writer.submit(image, frame.get_timestamp(), detected=(len(reds) != 0), overlays=overlays,
+                                            yuv_resolution=yuv_resolution)
+        if (self.__verbose ==True):
+            print(f"[LOG] frame {frame.get_frame_id()} {'queued' if queued else 'not logged'} {self.__frame_writer.get_counters()}")
+
+    def __run_worker(self, gyro_rate, camera_tilt):
+        """collects the newest vision worker result without waiting, the detection itself ran in the worker process"""
+        if (self.__sweep is not None) and (camera_tilt is None):
+            camera_tilt = self.__sweep.pose_at()[0]
+        self.__worker.set_state(gyro_rate, camera_tilt)
+        result = self.__worker.poll()
+        if result is None:
+            return
+        timestamp = result["timestamp"]
+        pose = None
+        if self.__sweep is not None:
+            pose = self.__sweep.pose_at(timestamp - 1.0 / self.__framerate)
+            if not pose[2]:
+                return
+            if self.__tracker is not None:
+                self.__tracker.set_pan(pose[1])
+        if result["buoys"] is not None:
+            self.__pose = pose
+            self.__reds = result["buoys"]
+            if self.__sphere_detection:
+                self.__spheres = result["spheres"]
+            if self.__tag_detection:
+                self.__tags = result["tags"]
+            if self.__tracker is not None:
+                if self.__sphere_detection:
+                    detections, kinds = sphere_records(self.__spheres)
+                    self.__tracker.update(detections, timestamp, kinds)
+                else:
+                    self.__tracker.update(self.__reds, timestamp)
+            if pose is not None:
+                self.__sweep.observe(pose[1], self.__target_bearings(pose), timestamp)
+            for red in self.__reds:
+                print(f"RED DETECTED at {red['bearing']} deg ({red['x']},{red['y']}), area {red['area']}")
+        elif self.__tracker is not None:
+            self.__tracker.predict(timestamp)
+        if (self.__verbose ==True):
+            print(f"[WORKER] {result['decision']} frame {result['frame_id']} {self.__worker.get_counters()}")
+
+        # the frame stays in shared memory until released, the writer copies it
+        image = self.__worker.get_frame(result["frame_id"])
+        if image is not None:
+            if(self.__capture_format == "yuv"):
+                frame = VisionFrame.from_yuv(image, self.__resolution, result["frame_id"], timestamp)
+            else:
+                frame = VisionFrame(image, result["frame_id"], timestamp)
+            frame.set_mount(pose)
+            self.__log(frame, image, self.__reds)
+            self.__worker.release_frame()
 
 if __name__ == '__main__':
     from CameraMount import CameraMount
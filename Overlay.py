@@ -0,0 +1,43 @@
+import numpy as np
+import cv2
+
+BUOY_COLOR = (0, 0, 255)
+TAG_COLOR = (0, 255, 0)
+CENTER_COLOR = (0, 0, 255)
+
+
+def draw_buoys(image, buoys):
+    """draws the bounding box, centroid and bearing of each buoy record (Camera_Util.DETECTION_DTYPE) onto image in place"""
+    for buoy in buoys:
+        left, top = int(buoy['left']), int(buoy['top'])
+        cv2.rectangle(image, (left, top), (left + int(buoy['width']), top + int(buoy['height'])), BUOY_COLOR, 2)
+        cv2.circle(image, (int(round(buoy['x'])), int(round(buoy['y']))), 5, CENTER_COLOR, -1)
+        cv2.putText(image, f"{buoy['bearing']:.1f} deg", (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, BUOY_COLOR, 2)
+    return image
+
+
+def draw_tags(image, tags):
+    """draws the outline, center and family/id of each tag record (Camera_Util.TAG_DTYPE) onto image in place"""
+    for tag in tags:
+        corners = np.rint(tag['corners']).astype(np.int32)
+        cv2.polylines(image, [corners.reshape(-1, 1, 2)], True, TAG_COLOR, 2)
+        cv2.circle(image, (int(round(tag['x'])), int(round(tag['y']))), 5, CENTER_COLOR, -1)
+        cv2.putText(image, f"{tag['family']} {tag['id']}", (int(corners[0][0]), int(corners[0][1]) - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, TAG_COLOR, 2)
+    return image
+
+
+def render_overlay(image, buoys=None, tags=None, copy:bool=True):
+    """
+    returns image annotated with the detection records. The records are only drawn here, so frames that are never
+    saved or streamed cost nothing to annotate.\n
+    copy => draw onto a copy and leave image untouched, pass False when image is already a private copy (e.g. on the
+    frame writer thread).
+    """
+    if copy:
+        image = image.copy()
+    if buoys is not None:
+        draw_buoys(image, buoys)
+    if tags is not None:
+        draw_tags(image, tags)
+    return image
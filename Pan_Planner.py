@@ -0,0 +1,175 @@
+import threading
+
+import numpy as np
+
+from Camera_Model import SENSOR_SIZE, FOCAL_LENGTH
+from Sweep_Scheduler import SWEEP_ANGLES
+
+#horizontal field of view of the Pi camera in degrees
+CAMERA_FOV = float(np.degrees(2 * np.arctan(SENSOR_SIZE[0] / 2 / FOCAL_LENGTH)))
+
+
+def wrap_degrees(angles):
+    """wraps angles in degrees to [-180, 180)"""
+    return (np.asarray(angles, dtype=np.float64) + 180.0) % 360.0 - 180.0
+
+
+class PanPlanner(object):
+    """
+    Picks the next camera pan angle by expected payoff instead of a fixed sweep.\n
+    The 360 degrees around the robot are split into bins. Each bin keeps when it was last in view and a running
+    average of how many targets were seen in it (unvisited bins start at optimistic_count, so everything gets
+    looked at). What is known about a bin fades as it goes unseen, so its uncertainty is
+    (average count + prior_count) * (1 - exp(-unseen time / memory)): busy bins that have not been looked at for a
+    while are worth most, and empty bins still come back up slowly.\n
+    The payoff of a pan angle is the uncertainty of the bins it brings into view divided by the time it costs, the
+    servo travel (|move| / slew_rate) plus settle_time and dwell_time. All candidate angles are scored at once with a
+    precomputed coverage matrix.
+    """
+    def __init__(self, angles=None, bin_deg:float=10.0, fov_deg:float=CAMERA_FOV, memory:float=8.0,
+                 prior_count:float=0.05, optimistic_count:float=1.0, smoothing:float=0.3, slew_rate:float=300.0,
+                 settle_time:float=0.1, dwell_time:float=0.2, verbose:bool=False):
+        """
+        angles => candidate pan (bottom servo) angles, defaults to -180 to 165 in 15 degree steps.\n
+        bin_deg => width of the bearing bins the history is kept in.\n
+        memory => seconds for a bin's observation to go stale (about how long a target stays put).\n
+        prior_count, optimistic_count => expected targets in an empty bin and in a never seen bin.\n
+        smoothing => weight of a new count in a bin's running average.\n
+        slew_rate, settle_time, dwell_time => cost of a move (see Servo_Profile), dwell_time is the time spent detecting.
+        """
+        self.__angles = np.arange(-180.0, 180.0, 15.0) if angles is None else np.asarray(angles, dtype=np.float64)
+        self.__bins = np.arange(-180.0, 180.0, bin_deg) + bin_deg / 2
+        self.__bin_deg = bin_deg
+        self.__fov_deg = fov_deg
+        self.__memory = memory
+        self.__prior_count = prior_count
+        self.__smoothing = smoothing
+        self.__slew_rate = slew_rate
+        self.__settle_time = settle_time
+        self.__dwell_time = dwell_time
+        self.__verbose = verbose
+        self.__lock = threading.Lock()
+        self.__coverage = self.coverage(self.__angles).astype(np.float64)
+        self.__counts = np.full(len(self.__bins), optimistic_count, dtype=np.float64)
+        self.__last_seen = np.full(len(self.__bins), -np.inf, dtype=np.float64)
+        self.__observations = 0
+
+    def get_angles(self):
+        return self.__angles
+
+    def get_bins(self):
+        return self.__bins
+
+    def set_timing(self, slew_rate:float=None, settle_time:float=None, dwell_time:float=None):
+        """sets the move cost to the sweep's own timing (SweepScheduler calls this with its values)"""
+        if slew_rate is not None:
+            self.__slew_rate = slew_rate
+        if settle_time is not None:
+            self.__settle_time = settle_time
+        if dwell_time is not None:
+            self.__dwell_time = dwell_time
+
+    def get_timing(self):
+        """returns (slew_rate, settle_time, dwell_time) the moves are costed with"""
+        return (self.__slew_rate, self.__settle_time, self.__dwell_time)
+
+    def coverage(self, pan_angles):
+        """returns a (pan angles, bins) boolean matrix of the bins in view at each pan angle"""
+        offsets = wrap_degrees(self.__bins[None, :] - np.atleast_1d(pan_angles)[:, None])
+        return np.abs(offsets) <= self.__fov_deg / 2
+
+    def uncertainty(self, t:float):
+        """returns the uncertainty (expected unknown targets) of every bin at time t"""
+        unseen = t - self.__last_seen
+        return (self.__counts + self.__prior_count) * -np.expm1(-unseen / self.__memory)
+
+    def scores(self, current_pan:float, t:float):
+        """returns the expected payoff per second of moving to each candidate angle"""
+        with self.__lock:
+            gain = self.__coverage @ self.uncertainty(t)
+        cost = np.abs(self.__angles - current_pan) / self.__slew_rate + self.__settle_time + self.__dwell_time
+        return gain / cost
+
+    def next_angle(self, current_pan:float, t:float):
+        """returns the candidate pan angle with the best expected payoff per second"""
+        scores = self.scores(current_pan, t)
+        best = int(np.argmax(scores))
+        if(self.__verbose):
+            print(f"[PLAN] pan {current_pan} -> {self.__angles[best]} (payoff {scores[best]:.3f}/s)")
+        return float(self.__angles[best])
+
+    def observe(self, pan_deg:float, bearings, t:float):
+        """
+        records a frame taken at pan angle pan_deg at time t, with the robot bearings (degrees) of the targets
+        detected on it.
+        """
+        in_view = self.coverage(pan_deg)[0]
+        index = np.floor((wrap_degrees(bearings) + 180.0) / self.__bin_deg).astype(np.intp) % len(self.__bins)
+        counts = np.bincount(index, minlength=len(self.__bins)).astype(np.float64)
+        with self.__lock:
+            a = self.__smoothing
+            self.__counts[in_view] = (1 - a) * self.__counts[in_view] + a * counts[in_view]
+            self.__last_seen[in_view] = t
+            self.__observations += 1
+
+    def get_counters(self):
+        """returns a dictionary with the observations made and the current per-bin average counts"""
+        with self.__lock:
+            return {"observations": self.__observations, "counts": self.__counts.copy()}
+
+
+class FixedSweep(object):
+    """the CameraMount.revolve() order, with the PanPlanner interface so the two can be compared"""
+    def __init__(self, angles:tuple=SWEEP_ANGLES):
+        self.__angles = tuple(angles)
+        self.__index = 0
+
+    def next_angle(self, current_pan:float, t:float):
+        angle = self.__angles[self.__index]
+        self.__index = (self.__index + 1) % len(self.__angles)
+        return float(angle)
+
+    def observe(self, pan_deg:float, bearings, t:float):
+        pass
+
+
+def simulate(policy, arena, duration:float=300.0, slew_rate:float=300.0, settle_time:float=0.1,
+             dwell_time:float=0.2, fov_deg:float=CAMERA_FOV):
+    """
+    runs a pan policy (PanPlanner or FixedSweep) against an Arena.SimulatedArena for duration simulated seconds.
+    Each step moves the mount (travel at slew_rate plus settle_time), then detects for dwell_time.\n
+    returns a dictionary with the targets found (distinct balls seen at least once), targets found per second, the
+    share of the balls that appeared that were found, and the moves made.
+    """
+    t = 0.0
+    pan = 0.0
+    found = set()
+    moves = 0
+    while t < duration:
+        target = policy.next_angle(pan, t)
+        t += abs(target - pan) / slew_rate + settle_time
+        pan = target
+        seen = arena.observe(pan, t, fov_deg)
+        t += dwell_time
+        found.update(i for i, _ in seen)
+        policy.observe(pan, [bearing for _, bearing in seen], t)
+        moves += 1
+    return {"found": len(found),
+            "found_per_second": len(found) / t,
+            "found_fraction": len(found) / max(arena.get_spawned(), 1),
+            "moves": moves}
+
+
+def compare(duration:float=300.0, seeds:tuple=(0, 1, 2, 3, 4), **arena_kwargs):
+    """returns {policy name: mean simulate() results over seeds} for the fixed sweep and the planner"""
+    from Arena import SimulatedArena
+    results = {}
+    for name, make in (("fixed_sweep", FixedSweep), ("planner", PanPlanner)):
+        runs = [simulate(make(), SimulatedArena(seed=seed, **arena_kwargs), duration) for seed in seeds]
+        results[name] = {key: float(np.mean([run[key] for run in runs])) for key in runs[0]}
+    return results
+
+
+if __name__ == '__main__':
+    for name, result in compare().items():
+        print(f"[INFO] {name}: {result}")
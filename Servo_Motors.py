@@ -1,36 +1,82 @@
+import threading
+import time
+
 from gpiozero import Servo
 
+from Servo_Profile import ServoProfile
+
 class ServoMotor(object):
-    def __init__(self, pin:int=9, initial_degree:float=0.0):
+    def __init__(self, pin:int=9, initial_degree:float=0.0, slew_rate:float=None, settle_time:float=0.05,
+                 step_period:float=0.02):
+        """
+        slew_rate => degrees per second, moves are then stepped along a ServoProfile on a background thread every
+        step_period seconds (one 50Hz servo frame) instead of jumping to the target. None writes the target at once.\n
+        settle_time => seconds after a move before the servo counts as arrived.
+        """
         self.__pin = pin
         self.__degree = self.__initial_degree = initial_degree
         self.__value = self.__initial_value = self.__initial_degree/180.0
 
         self.__servoMotor = Servo(self.__pin, initial_value=self.__value)
-        pass
+        #without a slew rate the servo is assumed to get anywhere within a fast servo's worst case
+        self.__profile = ServoProfile(slew_rate or 600.0, settle_time, initial_degree)
+        self.__stepped = slew_rate is not None
+        self.__step_period = step_period
+        self.__wake = threading.Event()
+        if(self.__stepped):
+            threading.Thread(target=self.__step_loop, daemon=True).start()
 
-    def rotateToDegree(self, deg:float=0):
+    def __write(self, deg:float):
         #constrain degree between -180 and 180 where 0 is the midpoint, scale this to -1 to 1 where 0 is the midpoint
-        self.__degree = deg
-        if(deg > 180):
+        if deg >= 180:
             self.__servoMotor.max()
-        if deg < 180:
+        elif deg <= -180:
             self.__servoMotor.min()
-        if deg == 0:
+        elif deg == 0:
             self.__servoMotor.mid()
         else:
-            self.__value = self.__degree/180.0 
+            self.__value = deg/180.0
             self.__servoMotor.value = self.__value
-    
+
+    def __step_loop(self):
+        while True:
+            self.__wake.wait()
+            self.__wake.clear()
+            while True:
+                now = time.time()
+                self.__write(self.__profile.position_at(now))
+                if self.__profile.position_at(now) == self.__profile.get_target():
+                    break
+                time.sleep(self.__step_period)
+
+    def rotateToDegree(self, deg:float=0):
+        """commands a move to deg, returns the time the servo will have arrived (see arrived() and wait())"""
+        self.__degree = deg
+        arrival = self.__profile.command(deg)
+        if(self.__stepped):
+            self.__wake.set()
+        else:
+            self.__write(deg)
+        return arrival
+
     def get_degree(self):
+        """returns the last commanded angle, see estimate_degree() for where the servo actually is"""
         return(self.__degree)
-    
-    def resetToInitial(self):
-        self.rotateToDegree(self.__initial_degree)
 
-    
-    
+    def estimate_degree(self, t:float=None):
+        """returns the estimated angle at time t (now by default) from the motion profile"""
+        return self.__profile.position_at(t)
 
+    def arrival_time(self):
+        return self.__profile.arrival_time()
 
+    def arrived(self, t:float=None):
+        """returns True once the servo has reached the last commanded angle and settled"""
+        return self.__profile.arrived(t)
 
+    def wait(self, timeout:float=None):
+        """blocks only as long as the current move physically needs, returns True if the servo arrived"""
+        return self.__profile.wait(timeout)
 
+    def resetToInitial(self):
+        self.rotateToDegree(self.__initial_degree)
@@ -0,0 +1,95 @@
+import threading
+import time
+
+
+class ServoProfile(object):
+    """
+    Time based motion model of a hobby servo, which has no position feedback. A commanded move travels at slew_rate
+    degrees per second from wherever the servo is estimated to be, and takes settle_time more to stop ringing, so
+    position_at(t) estimates the real angle and arrival_time() says when the servo will be there.\n
+    ServoMotor writes position_at(now) to the servo every step while a move is running, which also rate limits the
+    writes, instead of jumping straight to the target. Callers ask arrived() or wait() rather than sleeping a fixed time.
+    """
+    def __init__(self, slew_rate:float=300.0, settle_time:float=0.05, initial_degree:float=0.0,
+                 min_degree:float=-180.0, max_degree:float=180.0):
+        """
+        slew_rate => degrees per second the servo turns at (an SG90 is about 600 deg/s unloaded at 5V).\n
+        settle_time => seconds after the travel ends until the servo is still.\n
+        min_degree, max_degree => commands are clamped to this range.
+        """
+        assert slew_rate > 0, "[ERR] The slew rate must be positive."
+        self.__slew_rate = slew_rate
+        self.__settle_time = settle_time
+        self.__min_degree = min_degree
+        self.__max_degree = max_degree
+        self.__lock = threading.Lock()
+        self.__start_time = 0.0
+        self.__start_degree = initial_degree
+        self.__target = initial_degree
+        self.__arrived_event = threading.Event()
+        self.__arrived_event.set()
+
+    def get_slew_rate(self):
+        return self.__slew_rate
+
+    def get_target(self):
+        return self.__target
+
+    def command(self, degree:float, now:float=None):
+        """
+        starts a move to degree from the current estimated angle.\n
+        returns the time (time.time() seconds) the servo will have arrived and settled.
+        """
+        now = time.time() if now is None else now
+        degree = min(max(degree, self.__min_degree), self.__max_degree)
+        with self.__lock:
+            self.__start_degree = self.__position(now)
+            self.__start_time = now
+            self.__target = degree
+            if self.__start_degree != degree:
+                self.__arrived_event.clear()
+            return self.__arrival_time()
+
+    def __position(self, t:float):
+        travel = self.__slew_rate * max(t - self.__start_time, 0.0)
+        delta = self.__target - self.__start_degree
+        if abs(delta) <= travel:
+            return self.__target
+        return self.__start_degree + (travel if delta > 0 else -travel)
+
+    def __arrival_time(self):
+        return self.__start_time + abs(self.__target - self.__start_degree) / self.__slew_rate + self.__settle_time
+
+    def position_at(self, t:float=None):
+        """returns the estimated servo angle at time t (now by default)"""
+        with self.__lock:
+            return self.__position(time.time() if t is None else t)
+
+    def arrival_time(self):
+        """returns the time the current move will have arrived and settled"""
+        with self.__lock:
+            return self.__arrival_time()
+
+    def arrived(self, t:float=None):
+        """returns True once the servo has reached the last commanded angle and settled"""
+        t = time.time() if t is None else t
+        with self.__lock:
+            arrived = t >= self.__arrival_time()
+        if arrived:
+            self.__arrived_event.set()
+        return arrived
+
+    def wait(self, timeout:float=None):
+        """
+        blocks only until the servo has arrived (or timeout seconds), a later command extends the wait.\n
+        returns True if the servo arrived.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.arrived():
+            remaining = self.arrival_time() - time.time()
+            if deadline is not None:
+                remaining = min(remaining, deadline - time.time())
+                if remaining <= 0:
+                    return False
+            self.__arrived_event.wait(max(remaining, 0.001))
+        return True
@@ -0,0 +1,180 @@
+import numpy as np
+import cv2
+
+from Arena import PingPongBall, TennisBall, RedBuoy
+from Camera_Model import get_camera_model
+from Camera_Util import ColorClassifier, YUVColorClassifier, extract_blobs, DETECTION_DTYPE
+from Vision_Frame import as_frame
+
+#{name: (Sphere class, (red_range, green_range, blue_range))}, exclusive ranges as in get_ranges
+SPHERE_CLASSES = {
+    "red_buoy": (RedBuoy, ((110, 255), (0, 50), (0, 50))),
+    "ping_pong_ball": (PingPongBall, ((200, 256), (70, 170), (-1, 70))),
+    "tennis_ball": (TennisBall, ((110, 235), (170, 256), (-1, 100))),
+}
+
+
+class SphereDetector(object):
+    """
+    Detects every target class in one pass: the frame is box filtered once, one ColorClassifier lookup gives each
+    pixel a bitmask of the classes it belongs to, and one connected component pass labels every classified pixel. Each
+    blob takes the class most of its pixels belong to, so nothing runs once per color over the whole frame.\n
+    The range to each sphere comes from its apparent radius (half the larger side of the blob's bounding box) and the
+    known sphere radius, range = radius / sin(atan(pixel_radius / focal_length_pixels)).\n
+    YUV frames (VisionFrame.from_yuv) are classified at chroma resolution with a YUVColorClassifier, like BuoyDetector.
+    Scratch buffers are preallocated per frame size.\n
+    The blob records of the last detect() stay available per class (get_blobs()), so the red buoys the control loop
+    needs as DETECTION_DTYPE records come out of the same pass instead of a second BuoyDetector pass.
+    """
+    def __init__(self, classes:dict=SPHERE_CLASSES, filter_size:int=5, min_area:int=30, min_fill:float=0.5,
+                 resolution:tuple=(640, 480), capture_format:str="bgr", verbose:bool=False):
+        """
+        classes => {name: (Sphere class, (red_range, green_range, blue_range))}, at most 8.\n
+        filter_size => the shared blur, smaller than BuoyDetector's since blurring moves blob edges by up to filter_size/2
+        pixels, which biases the range.\n
+        min_area => smallest blob (full resolution pixels) reported.\n
+        min_fill => smallest blob area / bounding box area, a disc fills 0.79 of its box, walls and stripes much less.\n
+        capture_format => "yuv" builds the YUVColorClassifier table now instead of on the first YUV frame.
+        """
+        self.__names = list(classes.keys())
+        self.__types = [classes[name][0] for name in self.__names]
+        self.__color_ranges = {name: classes[name][1] for name in self.__names}
+        self.__classifier = ColorClassifier(self.__color_ranges)
+        self.__yuv_classifier = YUVColorClassifier(self.__color_ranges) if capture_format == "yuv" else None
+        self.__filter_size = filter_size
+        self.__min_area = min_area
+        self.__min_fill = min_fill
+        self.__verbose = verbose
+        self.__shape = None
+        self.__allocate((resolution[1], resolution[0], 3))
+        self.__blobs = np.empty((0,), dtype=DETECTION_DTYPE)
+        self.__kinds = np.empty((0,), dtype=np.intp)
+
+    def get_names(self):
+        return self.__names
+
+    def get_blobs(self, name:str):
+        """returns the DETECTION_DTYPE records (full frame coordinates and bearings) of the last detect()'s blobs of a class"""
+        return self.__blobs[self.__kinds == self.__names.index(name)]
+
+    def __allocate(self, shape:tuple):
+        if shape == self.__shape:
+            return
+        self.__shape = shape
+        height, width = shape[:2]
+        self.__filtered = np.empty(shape, dtype=np.uint8)
+        self.__codes = np.empty(shape, dtype=np.uint8)
+        self.__classes = np.empty((height, width), dtype=np.uint8)
+        self.__class_mask = np.empty((height, width), dtype=np.uint8)
+        self.__labels = np.empty((height, width), dtype=np.int32)
+        self.__index = np.empty((height, width), dtype=np.uint32)
+        self.__scratch = np.empty((height, width), dtype=np.uint32)
+        self.__half_luma = np.empty((height, width), dtype=np.uint8)
+
+    def __classify_bgr(self, frame, top_row:int):
+        image = frame.get_image()
+        self.__allocate(image.shape)
+        filtered = cv2.boxFilter(image[top_row:], -1, (self.__filter_size, self.__filter_size), dst=self.__filtered[top_row:])
+        return self.__classifier.classify(filtered, out=self.__classes[top_row:], codes=self.__codes[top_row:]), 1
+
+    def __classify_yuv(self, frame, top_row:int):
+        if self.__yuv_classifier is None:
+            self.__yuv_classifier = YUVColorClassifier(self.__color_ranges)
+        y, u, v = frame.yuv_planes()
+        self.__allocate(u.shape + (3,))
+        rows, cols = u.shape
+        top = top_row // 2
+        cv2.resize(y[2*top:2*rows], (cols, rows - top), dst=self.__half_luma[top:], interpolation=cv2.INTER_NEAREST)
+        merged = cv2.merge((self.__half_luma[top:], u[top:], v[top:]), dst=self.__codes[top:])
+        filter_size = max(1, self.__filter_size // 2)
+        filtered = cv2.boxFilter(merged, -1, (filter_size, filter_size), dst=self.__filtered[top:])
+        classes = self.__yuv_classifier.classify(filtered, out=self.__classes[top:], index=self.__index[top:],
+                                                 scratch=self.__scratch[top:])
+        return classes, 2
+
+    def detect(self, img, top_row:int=0):
+        """
+        img => BGR image or VisionFrame.\n
+        top_row => rows above this are not searched (see Floor_ROI).\n
+        returns a list of Sphere objects (PingPongBall, TennisBall, RedBuoy, ...) with range and bearing, nearest first.
+        """
+        frame = as_frame(img)
+        height, width = frame.get_shape()[:2]
+        top_row = min(max(int(top_row), 0), height)
+        self.__blobs = np.empty((0,), dtype=DETECTION_DTYPE)
+        self.__kinds = np.empty((0,), dtype=np.intp)
+        if top_row == height:
+            return []
+        if frame.is_yuv():
+            classes, scale = self.__classify_yuv(frame, top_row)
+        else:
+            classes, scale = self.__classify_bgr(frame, top_row)
+        top = top_row // scale
+        camera_model = get_camera_model((width, height))
+        focal_length = camera_model.get_focal_length_pixels()
+
+        #one labelling pass over every classified pixel, each blob then takes the class most of its pixels belong to
+        mask = cv2.compare(classes, 0, cv2.CMP_GT, dst=self.__class_mask[top:])
+        if cv2.countNonZero(mask) == 0:
+            return []
+        blobs = extract_blobs(mask, max(1, self.__min_area // (scale * scale)), labels=self.__labels[top:], origin=(0, top))
+        fill = blobs['area'] / np.maximum(blobs['width'] * blobs['height'], 1)
+        blobs = blobs[fill >= self.__min_fill]
+        bits = np.array([1 << bit for bit in range(len(self.__names))], dtype=np.uint8)
+        kinds = np.empty((len(blobs),), dtype=np.intp)
+        for i, blob in enumerate(blobs):
+            y0 = blob['top'] - top
+            crop = classes[y0:y0 + blob['height'], blob['left']:blob['left'] + blob['width']]
+            kinds[i] = np.argmax([np.count_nonzero(crop & bit) for bit in bits])
+        if scale != 1:
+            blobs['x'] = scale * blobs['x'] + (scale - 1) / 2
+            blobs['y'] = scale * blobs['y'] + (scale - 1) / 2
+            for field in ('left', 'top', 'width', 'height'):
+                blobs[field] *= scale
+            blobs['area'] *= scale * scale
+        pixel_radius = np.maximum(blobs['width'], blobs['height']) / 2
+        bearings = camera_model.bearings(blobs['x'], blobs['y'])
+        blobs['bearing'] = bearings
+        self.__blobs = blobs
+        self.__kinds = kinds
+
+        spheres = []
+        for blob, kind, radius, bearing in zip(blobs, kinds, pixel_radius, bearings):
+            sphere_type = self.__types[kind]
+            distance = sphere_type.RADIUS / np.sin(np.arctan(radius / focal_length))
+            position = (float(distance * np.cos(np.radians(bearing))), float(distance * np.sin(np.radians(bearing))),
+                        float(distance), float(bearing))
+            spheres.append(sphere_type(position, pixel_center=(float(blob['x']), float(blob['y'])),
+                                       pixel_radius=float(radius)))
+        spheres.sort(key=lambda sphere: sphere.get_range())
+        if(self.__verbose):
+            print(f"[SPHERE] {spheres}")
+        return spheres
+
+
+sphere_detector = None
+
+def configure_sphere_detector(**kwargs):
+    """replaces the detector used by detect_spheres, kwargs are SphereDetector arguments (e.g. capture_format="yuv")"""
+    global sphere_detector
+    sphere_detector = SphereDetector(**kwargs)
+    return sphere_detector
+
+def detect_spheres(img, top_row:int=0):
+    """
+    img => BGR image or VisionFrame.\n
+    returns the Sphere detections of every target class, nearest first (see SphereDetector).
+    """
+    global sphere_detector
+    if sphere_detector is None:
+        sphere_detector = SphereDetector()
+    return sphere_detector.detect(img, top_row)
+
+def detect_spheres_and_buoys(img, top_row:int=0):
+    """
+    img => BGR image or VisionFrame.\n
+    returns (spheres, buoys): the Sphere detections like detect_spheres, and the red buoy blobs of the same pass as
+    Camera_Util.DETECTION_DTYPE records like detect_buoys.
+    """
+    spheres = detect_spheres(img, top_row)
+    return spheres, sphere_detector.get_blobs("red_buoy")
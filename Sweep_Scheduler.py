@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+#bottom servo angles CameraMount.revolve() steps through
+SWEEP_ANGLES = (0, 90, 180, 90, 0, -90, -180, 90)
+
+
+def robot_bearings(camera_bearings, bottom_servo_deg:float, pan_sign:float=1.0):
+    """
+    returns bearings relative to the robot's heading from camera bearings (Camera_Model.bearings) and the pan servo
+    angle the frame was taken at. pan_sign flips the servo direction if the mount turns the other way.
+    """
+    return (np.asarray(camera_bearings, dtype=np.float32) + pan_sign * bottom_servo_deg + 180.0) % 360.0 - 180.0
+
+
+class SweepScheduler(threading.Thread):
+    """
+    Sweeps the CameraMount through its pan angles on its own thread, instead of revolve() sleeping a second inside
+    every control tick. The mount's motion profile (CameraMount.getArrivalTime) says when each move arrives, the
+    mount then gets settle_time for vibration to die down and is held for dwell_time (the frames worth detecting on)
+    before the next move. Mounts without a motion profile are given settle_time from the command instead.\n
+    Every command is kept in a short history, so pose_at(timestamp) gives the mount angles a frame was exposed at and
+    whether the mount had settled by then. The control loop stamps frames with it and turns detection bearings into
+    robot bearings (robot_bearings) without ever waiting on the servos.\n
+    With a planner (Pan_Planner.PanPlanner) the next angle is the one it expects the most from, and observe() feeds
+    it what each settled frame saw, instead of stepping through angles in order.
+    """
+    def __init__(self, camera_mount, angles:tuple=SWEEP_ANGLES, settle_time:float=0.1, dwell_time:float=0.6,
+                 top_servo_deg:float=None, history:int=64, planner=None, slew_rate:float=300.0, verbose:bool=False):
+        """
+        angles => bottom (pan) servo degrees visited in order, then repeated.\n
+        settle_time => seconds after the mount arrives before frames count as settled.\n
+        dwell_time => seconds the mount stays settled at each angle.\n
+        top_servo_deg => tilt held during the sweep, defaults to the current tilt.\n
+        planner => picks the pan angles instead of angles, see Pan_Planner. It costs moves with this sweep's
+        settle_time, dwell_time and slew_rate.\n
+        slew_rate => degrees per second of the pan servo (the CameraMount's slew_rate), only used by the planner.
+        """
+        super().__init__(daemon=True)
+        self.__camera_mount = camera_mount
+        self.__angles = tuple(angles)
+        self.__settle_time = settle_time
+        self.__dwell_time = dwell_time
+        current_top, current_bottom = camera_mount.getSphericalCoordinates()
+        self.__top = current_top if top_servo_deg is None else top_servo_deg
+        self.__bottom = current_bottom
+        self.__planner = planner
+        if planner is not None:
+            planner.set_timing(slew_rate, settle_time, dwell_time)
+        self.__verbose = verbose
+        self.__lock = threading.Lock()
+        self.__stop_event = threading.Event()
+        #(command time, top, bottom, settled time) of each command, oldest first
+        self.__history = deque([(0.0, current_top, current_bottom, 0.0)], maxlen=history)
+        self.__index = 0
+        self.__moves = 0
+
+    def set_timing(self, settle_time:float=None, dwell_time:float=None):
+        if settle_time is not None:
+            self.__settle_time = settle_time
+        if dwell_time is not None:
+            self.__dwell_time = dwell_time
+        if self.__planner is not None:
+            self.__planner.set_timing(settle_time=settle_time, dwell_time=dwell_time)
+
+    def get_settle_time(self):
+        return self.__settle_time
+
+    def move_to(self, top_servo_deg:float, bottom_servo_deg:float):
+        """commands the mount now and records the command, returns the time the mount will have settled"""
+        now = time.time()
+        arrival = self.__camera_mount.moveToSphericalCoordinate(top_servo_deg, bottom_servo_deg)
+        settled = (now if arrival is None else max(arrival, now)) + self.__settle_time
+        with self.__lock:
+            self.__history.append((now, top_servo_deg, bottom_servo_deg, settled))
+            self.__moves += 1
+        if(self.__verbose):
+            print(f"[SWEEP] T{top_servo_deg},B{bottom_servo_deg} @ {now:.3f}, settled in {settled - now:.3f} s")
+        return settled
+
+    def step(self):
+        """moves to the next sweep angle, returns the seconds until the one after should be commanded"""
+        if self.__planner is not None:
+            self.__bottom = self.__planner.next_angle(self.__bottom, time.time())
+        else:
+            self.__bottom = self.__angles[self.__index]
+            self.__index = (self.__index + 1) % len(self.__angles)
+        settled = self.move_to(self.__top, self.__bottom)
+        return max(settled - time.time(), 0.0) + self.__dwell_time
+
+    def run(self):
+        if(self.__verbose):
+            print(f"[INFO] Sweep started over {self.__angles}.")
+        while not self.__stop_event.is_set():
+            self.__stop_event.wait(self.step())
+
+    def stop(self, timeout:float=1.0):
+        self.__stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def pose_at(self, timestamp:float=None):
+        """
+        timestamp => frame exposure time (time.time() seconds), None for now.\n
+        returns (top_servo_deg, bottom_servo_deg, settled), the last angles commanded before timestamp and whether
+        the mount had arrived and settled there.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.__lock:
+            history = list(self.__history)
+        _, top, bottom, settled = history[0]
+        for entry in history:
+            if entry[0] > timestamp:
+                break
+            _, top, bottom, settled = entry
+        return (top, bottom, timestamp >= settled)
+
+    def observe(self, bottom_servo_deg:float, bearings, timestamp:float):
+        """reports the robot bearings of the targets seen on a settled frame taken at this pan angle to the planner"""
+        if self.__planner is not None:
+            self.__planner.observe(bottom_servo_deg, bearings, timestamp)
+
+    def get_counters(self):
+        """returns a dictionary with the moves commanded and the current pose"""
+        top, bottom, settled = self.pose_at()
+        return {"moves": self.__moves, "top": top, "bottom": bottom, "settled": settled}
+
+
+if __name__ == '__main__':
+    from CameraMount import CameraMount
+    sweep = SweepScheduler(CameraMount(10, 9), verbose=True)
+    sweep.start()
+    for tick in range(100):
+        print(f"tick {tick}: {sweep.pose_at()}")
+        time.sleep(0.1)
+    sweep.stop()
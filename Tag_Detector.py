@@ -0,0 +1,128 @@
+import time
+
+import numpy as np
+try:
+    import apriltag
+except ImportError:
+    apriltag = None
+
+
+def apriltag_available():
+    """returns True if the apriltag library can be imported on this machine"""
+    return apriltag is not None
+
+
+class TagDetector(object):
+    """
+    A persistent AprilTag detector. One apriltag.Detector is kept alive for the life of the robot, with
+    quad_decimate, nthreads and the tag families exposed.\n
+    Once a tag has been found, the next frame is only searched inside a padded region of interest around the
+    last known corners. If nothing is found there the same frame is searched in full, and tracking restarts from
+    whatever the full search finds.
+    """
+    def __init__(self, families:tuple=("tag36h11", "tag16h5"), quad_decimate:float=2.0, nthreads:int=4,
+                 roi_tracking:bool=True, roi_padding:int=48, verbose:bool=False):
+        """
+        families => tag families to search for, restricting this to the families in use speeds up decoding.\n
+        quad_decimate => decimation of the image used for quad detection, higher is faster but less sensitive.\n
+        nthreads => threads used by the apriltag library.\n
+        roi_padding => pixels added around the last known tag corners when tracking.
+        """
+        assert apriltag is not None, "[ERR] The apriltag library is not installed."
+        self.__families = list(families)
+        self.__quad_decimate = quad_decimate
+        self.__nthreads = nthreads
+        self.__roi_tracking = roi_tracking
+        self.__roi_padding = roi_padding
+        self.__verbose = verbose
+        self.__roi = None
+        self.__detector = None
+        self.__build()
+
+        self.__latency_last = 0.0
+        self.__latency_sum = 0.0
+        self.__frames = 0
+        self.__roi_searches = 0
+        self.__roi_misses = 0
+        self.__full_searches = 0
+
+    def __build(self):
+        options = apriltag.DetectorOptions(families=self.__families,
+                                           quad_decimate=self.__quad_decimate,
+                                           nthreads=self.__nthreads)
+        self.__detector = apriltag.Detector(options)
+
+    def set_families(self, families:tuple):
+        """restricts the detector to the given tag families"""
+        self.__families = list(families)
+        self.__build()
+
+    def set_quad_decimate(self, quad_decimate:float):
+        self.__quad_decimate = quad_decimate
+        self.__build()
+
+    def set_nthreads(self, nthreads:int):
+        self.__nthreads = nthreads
+        self.__build()
+
+    def get_roi(self):
+        """returns the current search region (x0, y0, x1, y1), or None when the next search is full frame"""
+        return self.__roi
+
+    def reset(self):
+        """forgets the tracked region, so the next frame is searched in full"""
+        self.__roi = None
+
+    def __detect_in(self, gray, roi):
+        x0, y0, x1, y1 = roi
+        results = self.__detector.detect(gray[y0:y1, x0:x1])
+        if (x0 == 0) and (y0 == 0):
+            return results
+        offset = np.array((x0, y0), dtype=np.float64)
+        shift = np.array([[1, 0, x0], [0, 1, y0], [0, 0, 1]], dtype=np.float64)
+        return [r._replace(center=r.center + offset, corners=r.corners + offset, homography=shift @ r.homography)
+                for r in results]
+
+    def __update_roi(self, results, shape):
+        if (not self.__roi_tracking) or (len(results) == 0):
+            self.__roi = None
+            return
+        corners = np.concatenate([r.corners for r in results], axis=0)
+        height, width = shape
+        x0, y0 = np.floor(corners.min(axis=0)).astype(int) - self.__roi_padding
+        x1, y1 = np.ceil(corners.max(axis=0)).astype(int) + self.__roi_padding
+        self.__roi = (max(int(x0), 0), max(int(y0), 0), min(int(x1), width), min(int(y1), height))
+
+    def detect(self, gray):
+        """
+        gray => uint8 grayscale image.\n
+        returns a list of apriltag detections in full frame coordinates.
+        """
+        start = time.time()
+        height, width = gray.shape
+        results = []
+        if self.__roi is not None:
+            self.__roi_searches += 1
+            results = self.__detect_in(gray, self.__roi)
+            if len(results) == 0:
+                self.__roi_misses += 1
+        if len(results) == 0:
+            self.__full_searches += 1
+            results = self.__detect_in(gray, (0, 0, width, height))
+        self.__update_roi(results, (height, width))
+
+        self.__latency_last = time.time() - start
+        self.__latency_sum += self.__latency_last
+        self.__frames += 1
+        if(self.__verbose):
+            print(f"[TAG] {len(results)} tag(s) in {1000*self.__latency_last:.1f} ms, roi={self.__roi}")
+        return results
+
+    def get_counters(self):
+        """returns a dictionary with the search counts and the last/mean detection latency in seconds"""
+        return {"frames": self.__frames,
+                "roi_searches": self.__roi_searches,
+                "roi_misses": self.__roi_misses,
+                "full_searches": self.__full_searches,
+                "latency_last": self.__latency_last,
+                "latency_mean": (self.__latency_sum / self.__frames) if self.__frames else 0.0}
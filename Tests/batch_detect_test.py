@@ -0,0 +1,81 @@
+import sys
+import pathlib
+import tempfile
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Batch_Detect import run_batch, DEFAULT_PARAMS, ColumnWriter, assemble, parts_dir
+from Camera_Util import DETECTION_DTYPE
+from Frame_Logger import frame_filename, sorted_frame_paths
+
+
+def write_frames(frame_dir, count):
+    for i in range(count):
+        image = np.full((240, 320, 3), 200, dtype=np.uint8)
+        image[100:140, 20 + 30 * i:60 + 30 * i] = (20, 20, 200)
+        cv2.imwrite(str(pathlib.Path(frame_dir, frame_filename(100.0 + i, i))), image)
+
+
+def test_cache_hits_and_misses():
+    with tempfile.TemporaryDirectory() as run_dir:
+        write_frames(run_dir, 4)
+        paths = sorted_frame_paths(run_dir)
+        cache_path = pathlib.Path(run_dir, 'cache.sqlite')
+        out_path = pathlib.Path(run_dir, 'detections.npz')
+        counts = run_batch(paths, out_path, DEFAULT_PARAMS, cache_path, workers=2, verbose=False)
+        assert counts == {"frames": 4, "cached": 0, "detected": 4}
+        assert not parts_dir(out_path).exists()
+        with np.load(out_path) as first:
+            first = dict(first)
+        assert np.array_equal(first["buoy_offsets"], [0, 1, 2, 3, 4])
+        assert np.allclose(first["buoy_x"], [39.5, 69.5, 99.5, 129.5], atol=1)
+
+        # unchanged frames come from the cache, a changed frame is detected again
+        image = cv2.imread(str(paths[2]))
+        image[180:220, 200:240] = (20, 20, 200)
+        cv2.imwrite(str(paths[2]), image)
+        counts = run_batch(paths, out_path, DEFAULT_PARAMS, cache_path, workers=2, verbose=False)
+        assert counts == {"frames": 4, "cached": 3, "detected": 1}
+        with np.load(out_path) as second:
+            assert np.array_equal(second["buoy_offsets"], [0, 1, 2, 4, 5])
+            assert np.array_equal(second["frame"], first["frame"])
+
+        # other detector parameters miss the cache
+        params = dict(DEFAULT_PARAMS, min_area=50)
+        counts = run_batch(paths, out_path, params, cache_path, workers=1, verbose=False)
+        assert counts["cached"] == 0 and counts["detected"] == 4
+
+
+def result(buoys, tags):
+    detections = np.zeros((buoys,), dtype=DETECTION_DTYPE)
+    detections['x'] = np.arange(buoys)
+    return {"buoys": detections, "tag_ids": list(range(tags)), "tag_families": ["tag36h11"] * tags,
+            "tag_centers": [(1.0, 2.0)] * tags, "tag_angles": [3.0] * tags}
+
+
+def test_interrupted_run_keeps_streamed_results():
+    with tempfile.TemporaryDirectory() as run_dir:
+        out_path = pathlib.Path(run_dir, 'detections.npz')
+        columns = ColumnWriter(out_path, ["a.jpg", "b.jpg", "c.jpg"], [1.0, 2.0, 3.0], flush_every=1)
+        # results arrive out of order, and the run stops before frame 1 is done
+        columns.add(2, result(1, 2))
+        columns.add(0, result(2, 1))
+        assert not out_path.exists()
+        with open(parts_dir(out_path) / "buoys.bin", 'ab') as part:
+            part.write(b"torn")
+        assemble(parts_dir(out_path), out_path)
+        with np.load(out_path) as columns:
+            assert np.array_equal(columns["done"], [True, False, True])
+            assert np.array_equal(columns["buoy_offsets"], [0, 2, 2, 3])
+            assert np.array_equal(columns["buoy_x"], [0, 1, 0])
+            assert np.array_equal(columns["tag_offsets"], [0, 1, 1, 3])
+            assert np.array_equal(columns["tag_id"], [0, 0, 1])
+            assert np.array_equal(columns["frame"], ["a.jpg", "b.jpg", "c.jpg"])
+
+
+if __name__ == "__main__":
+    test_cache_hits_and_misses()
+    test_interrupted_run_keeps_streamed_results()
+    print("[INFO] batch detect tests passed.")
@@ -0,0 +1,61 @@
+import sys
+import pathlib
+import tracemalloc
+
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Camera_Util import BuoyDetector, detect_buoys_reference
+
+FRAME_DIR = pathlib.Path(__file__).resolve().parents[1] / 'Frames'
+#a 640x480 mask is 300 KB, anything image sized is far above this
+IMAGE_BYTES = 64 * 1024
+
+
+def load_frames(count:int=20):
+    return [cv2.imread(str(path)) for path in sorted(FRAME_DIR.glob('*.jpg'))[:count]]
+
+
+def traced_allocations(detect, frames):
+    """returns (peak bytes, number of live blocks of at least IMAGE_BYTES) traced while detect runs over frames"""
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    large = 0
+    for image in frames:
+        before = tracemalloc.take_snapshot()
+        result = detect(image)
+        after = tracemalloc.take_snapshot()
+        large += sum(1 for stat in after.compare_to(before, 'traceback') if stat.size_diff >= IMAGE_BYTES)
+        del result
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - baseline, large
+
+
+def test_detector_does_not_allocate_images():
+    frames = load_frames()
+    detector = BuoyDetector()
+    detector.detect(frames[0])
+    peak, large = traced_allocations(detector.detect, frames)
+    assert large == 0, f"[ERR] {large} image sized allocations in steady state detection"
+    assert peak < IMAGE_BYTES, f"[ERR] steady state detection peaked at {peak} traced bytes"
+
+
+def test_detector_reallocates_for_new_resolution():
+    frames = load_frames(2)
+    detector = BuoyDetector(resolution=(320, 240))
+    detections, surface, img_out = detector.detect(frames[0])
+    assert surface.shape == img_out.shape == frames[0].shape[:2]
+    peak, large = traced_allocations(detector.detect, frames[1:])
+    assert large == 0
+
+
+if __name__ == "__main__":
+    test_detector_does_not_allocate_images()
+    test_detector_reallocates_for_new_resolution()
+    frames = load_frames()
+    detector = BuoyDetector()
+    detector.detect(frames[0])
+    print(f"[INFO] BuoyDetector peak, large allocations: {traced_allocations(detector.detect, frames)}")
+    print(f"[INFO] reference path peak, large allocations: {traced_allocations(detect_buoys_reference, frames)}")
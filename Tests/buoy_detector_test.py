@@ -0,0 +1,86 @@
+import sys
+import io
+import contextlib
+import pathlib
+import time
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Camera_Util import BuoyDetector, detect_buoys, detect_buoys_reference, extract_blobs
+
+FRAME_DIR = pathlib.Path(__file__).resolve().parents[1] / 'Frames'
+
+
+def load_frames():
+    return [(path.name, cv2.imread(str(path))) for path in sorted(FRAME_DIR.glob('*.jpg'))]
+
+
+def test_buoy_detector_matches_reference():
+    detector = BuoyDetector(min_area=0)
+    for name, img in load_frames():
+        ref_angles, ref_centers, _, ref_out = detect_buoys_reference(img)
+        detections, _, img_out = detector.detect(img)
+        if len(ref_centers) != 0:
+            assert (img_out == ref_out).all(), f"[ERR] Thresholded image differs on {name}"
+        assert len(detections) == len(ref_centers), f"[ERR] Blob count differs on {name}"
+        for center in ref_centers:
+            #the area centroid differs slightly from the old contour point mean, but must sit inside the same blob
+            inside = ((detections['left'] <= center[0]) & (center[0] < detections['left'] + detections['width']) &
+                      (detections['top'] <= center[1]) & (center[1] < detections['top'] + detections['height']))
+            assert inside.any(), f"[ERR] No blob around {center} on {name}"
+
+
+def test_extract_blobs_filters_by_area():
+    binary = np.zeros((480, 640), dtype=np.uint8)
+    binary[10:20, 10:20] = 255
+    binary[100:150, 300:340] = 255
+    detections = extract_blobs(binary, min_area=200)
+    assert len(detections) == 1
+    blob = detections[0]
+    assert (blob['area'], blob['left'], blob['top'], blob['width'], blob['height']) == (2000, 300, 100, 40, 50)
+    assert (blob['x'], blob['y']) == (319.5, 124.5)
+    assert abs(blob['bearing']) < 0.1
+
+
+def test_detection_leaves_frame_and_stdout_alone():
+    name, img = load_frames()[0]
+    original = img.copy()
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        detect_buoys(img)
+    assert output.getvalue() == ""
+    assert (img == original).all()
+
+
+def test_pyramid_matches_full_resolution():
+    full = BuoyDetector()
+    pyramid = BuoyDetector(pyramid_level=2)
+    for name, img in load_frames():
+        expected, _, _ = full.detect(img)
+        found, _, _ = pyramid.detect(img)
+        assert len(found) == len(expected), f"[ERR] Blob count differs on {name}"
+        for blob in expected:
+            assert (np.hypot(found['x'] - blob['x'], found['y'] - blob['y']) < 5).any(), f"[ERR] Missed blob at ({blob['x']}, {blob['y']}) on {name}"
+
+
+def benchmark(repeats:int=3):
+    frames = [img for _, img in load_frames()]
+    detector = BuoyDetector()
+    for label, detect in (("reference", detect_buoys_reference), ("BuoyDetector", detector.detect)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for img in frames:
+                detect(img)
+        elapsed = (time.perf_counter() - start) / (repeats * len(frames))
+        print(f"[BENCH] {label}: {1000*elapsed:.2f} ms/frame ({1/elapsed:.1f} frames/s) over {len(frames)} frames")
+
+
+if __name__ == "__main__":
+    test_buoy_detector_matches_reference()
+    test_extract_blobs_filters_by_area()
+    test_pyramid_matches_full_resolution()
+    test_detection_leaves_frame_and_stdout_alone()
+    print("[INFO] BuoyDetector matches the reference path.")
+    benchmark()
@@ -0,0 +1,47 @@
+import sys
+import pathlib
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Camera_Model import CameraModel
+from Camera_Util import sensor_position, sensor_angle, focal_length
+
+
+def test_bearings_match_sensor_angle():
+    for resolution in ((640, 480), (320, 240)):
+        model = CameraModel(resolution, cache_dir=None)
+        width, height = resolution
+        xs, ys = np.meshgrid(np.arange(width), np.arange(height))
+        expected = sensor_angle(*sensor_position(xs, ys, width, height), focal_length)
+        # the float32 table agrees with the float64 formula to within 1e-6 degrees
+        assert np.abs(model.bearings(xs, ys) - expected).max() < 1e-6
+    # the optical axis is straight ahead, and pixels right of it have positive azimuth
+    model = CameraModel((640, 480), cache_dir=None)
+    assert model.bearings(320, 240) == 0.0
+    assert model.bearings(600, 240) > 0 > model.bearings(40, 240)
+    assert model.elevations(320, 10) > 0 > model.elevations(320, 470)
+
+
+def test_cache_round_trip():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        built = CameraModel((160, 120), cache_dir=cache_dir)
+        cached = list(pathlib.Path(cache_dir).glob('bearing_160x120_*.npz'))
+        assert len(cached) == 1
+        loaded = CameraModel((160, 120), cache_dir=cache_dir)
+        assert np.array_equal(built.get_azimuth_table(), loaded.get_azimuth_table())
+        assert np.array_equal(built.get_elevation_table(), loaded.get_elevation_table())
+        # other parameters get their own cache file
+        CameraModel((160, 120), distortion=(0.1, 0.0, 0.0, 0.0), cache_dir=cache_dir)
+        assert len(list(pathlib.Path(cache_dir).glob('bearing_160x120_*.npz'))) == 2
+        # a corrupt cache is rebuilt rather than trusted
+        cached[0].write_bytes(b"not an npz")
+        rebuilt = CameraModel((160, 120), cache_dir=cache_dir)
+        assert np.array_equal(built.get_azimuth_table(), rebuilt.get_azimuth_table())
+
+
+if __name__ == "__main__":
+    test_bearings_match_sensor_angle()
+    test_cache_round_trip()
+    print("[INFO] camera model tests passed.")
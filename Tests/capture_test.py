@@ -0,0 +1,93 @@
+import sys
+import pathlib
+import time
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Frame_Capture import FrameRingBuffer, CaptureThread, FakeCamera, yuv_buffer_shape, yuv_planes
+from Vision_Frame import VisionFrame
+from Camera_Util import BuoyDetector
+
+FRAME_DIR = pathlib.Path(__file__).resolve().parents[1] / 'Frames'
+
+
+def test_ring_buffer_never_hands_out_the_write_slot():
+    ring = FrameRingBuffer((4, 4, 3), slots=3)
+    ring.get_write_buffer()[:] = 1
+    assert ring.publish(1.0) == 0
+    frame_id, timestamp, frame = ring.get_latest()
+    assert (frame_id, timestamp) == (0, 1.0)
+    assert (frame == 1).all()
+    # the writer keeps going while the reader holds frame 0
+    for value in range(2, 6):
+        ring.get_write_buffer()[:] = value
+        ring.publish(float(value))
+    assert (frame == 1).all(), "[ERR] Frame held by the reader was overwritten."
+    frame_id, timestamp, frame = ring.get_latest()
+    assert (frame_id, timestamp) == (4, 5.0)
+    assert (frame == 5).all()
+    assert ring.get_counters() == {"published": 5, "dropped": 3}
+
+
+def test_capture_thread_with_fake_camera():
+    camera = FakeCamera(FRAME_DIR, framerate=100)
+    capture = CaptureThread(camera)
+    capture.start()
+    deadline = time.time() + 5
+    frame_id = -1
+    while (frame_id < 5) and (time.time() < deadline):
+        frame_id, timestamp, frame = capture.get_latest()
+        time.sleep(0.01)
+    capture.stop()
+    camera.close()
+    assert frame_id >= 5
+    assert frame.shape == (480, 640, 3)
+    counters = capture.get_counters()
+    assert counters["frames"] >= 6
+    assert counters["errors"] == 0
+    assert counters["interval_mean"] > 0
+
+
+def test_yuv_frames_need_no_color_conversion():
+    image = np.full((480, 640, 3), 200, dtype=np.uint8)
+    image[200:260, 300:360] = (20, 20, 200)
+    buffer = np.zeros(yuv_buffer_shape((640, 480)), dtype=np.uint8)
+    for plane, values in zip(yuv_planes(buffer, (640, 480)), yuv_planes(cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420), (640, 480))):
+        plane[:] = values
+    frame = VisionFrame.from_yuv(buffer, (640, 480))
+    assert frame.gray().shape == (480, 640)
+    assert np.shares_memory(frame.gray(), buffer)
+    expected, _, _ = BuoyDetector().detect(image)
+    detections, surface, _ = BuoyDetector().detect(frame)
+    assert surface.shape == (240, 320)
+    assert len(detections) == len(expected) == 1
+    assert abs(detections[0]['x'] - expected[0]['x']) < 2 and abs(detections[0]['y'] - expected[0]['y']) < 2
+    assert abs(int(detections[0]['area']) - int(expected[0]['area'])) < 0.1 * expected[0]['area']
+    # nothing asked for the BGR image
+    assert 'bgr' not in repr(frame)
+
+
+def test_capture_thread_yuv():
+    camera = FakeCamera(FRAME_DIR, framerate=100)
+    capture = CaptureThread(camera, capture_format='yuv')
+    capture.start()
+    deadline = time.time() + 5
+    frame_id = -1
+    while (frame_id < 2) and (time.time() < deadline):
+        frame_id, timestamp, buffer = capture.get_latest()
+        time.sleep(0.01)
+    capture.stop()
+    camera.close()
+    assert buffer.shape == (720, 640)
+    frame = VisionFrame.from_yuv(buffer, camera.resolution, frame_id, timestamp)
+    assert frame.get_image().shape == (480, 640, 3)
+
+
+if __name__ == "__main__":
+    test_ring_buffer_never_hands_out_the_write_slot()
+    test_capture_thread_with_fake_camera()
+    test_yuv_frames_need_no_color_conversion()
+    test_capture_thread_yuv()
+    print("[INFO] capture tests passed.")
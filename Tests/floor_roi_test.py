@@ -0,0 +1,39 @@
+import sys
+import pathlib
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Floor_ROI import FloorROI
+from Camera_Util import BuoyDetector
+from Vision_Frame import VisionFrame
+
+
+def test_floor_rows_follow_tilt():
+    roi = FloorROI(camera_height=0.12, target_height=0.07, margin_deg=0.0)
+    rows = [roi.top_row(tilt) for tilt in (-40, -10, 0, 10, 40)]
+    assert rows == sorted(rows)
+    assert rows[0] == 0 and rows[-1] == 480
+    # level camera: the floor starts just below the horizon in the middle of the frame
+    assert 240 <= rows[2] < 260
+
+
+def test_roi_detections_are_in_full_frame_coordinates():
+    image = np.full((480, 640, 3), 200, dtype=np.uint8)
+    image[40:80, 100:140] = (20, 20, 200)
+    image[300:360, 400:460] = (20, 20, 200)
+    for frame in (image, VisionFrame.from_yuv(cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420), (640, 480))):
+        full, _, _ = BuoyDetector().detect(frame)
+        cropped, surface, _ = BuoyDetector().detect(frame, top_row=200)
+        assert len(full) == 2 and len(cropped) == 1
+        floor = full[full['y'] > 200][0]
+        assert abs(cropped[0]['x'] - floor['x']) < 0.5 and abs(cropped[0]['y'] - floor['y']) < 0.5
+        assert abs(cropped[0]['bearing'] - floor['bearing']) < 0.1
+        assert not surface[:100].any()
+
+
+if __name__ == "__main__":
+    test_floor_rows_follow_tilt()
+    test_roi_detections_are_in_full_frame_coordinates()
+    print("[INFO] floor ROI tests passed.")
@@ -0,0 +1,103 @@
+import sys
+import pathlib
+import tempfile
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Frame_Logger import FrameWriter, frame_filename, parse_frame_timestamp, sorted_frame_paths
+from Camera_Util import DETECTION_DTYPE
+from Video_Log import VideoFrameWriter, VideoLogReader, VideoLogWriter, index_path
+
+
+def test_frame_filenames_are_unique_and_parseable():
+    names = [frame_filename(1681891319.0, sequence) for sequence in range(3)]
+    assert len(set(names)) == 3
+    assert parse_frame_timestamp(names[0]) == 1681891319.0
+    assert parse_frame_timestamp('frame_1681891319.jpg') == 1681891319.0
+
+
+def test_drop_policies():
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as log_dir:
+        writer = FrameWriter(pathlib.Path(log_dir, 'detection'), max_queue=8, drop_policy="detection")
+        writer.start()
+        for i in range(10):
+            writer.submit(image, 100.0 + i, detected=(i % 2 == 0))
+        writer.stop()
+        counters = writer.get_counters()
+        assert (counters["queued"], counters["written"], counters["skipped"]) == (5, 5, 5)
+        paths = sorted_frame_paths(pathlib.Path(log_dir, 'detection'))
+        assert [parse_frame_timestamp(p) for p in paths] == [100.0, 102.0, 104.0, 106.0, 108.0]
+
+        # the writer thread is not started, so the queue fills up
+        for policy, queued in (("newest", 2), ("oldest", 5)):
+            writer = FrameWriter(pathlib.Path(log_dir, policy), max_queue=2, drop_policy=policy)
+            for i in range(5):
+                writer.submit(image, 200.0 + i)
+            counters = writer.get_counters()
+            assert (counters["queued"], counters["dropped"], counters["pending"]) == (queued, 3, 2)
+
+
+def test_overlays_are_drawn_on_the_writer_thread():
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    buoys = np.zeros((1,), dtype=DETECTION_DTYPE)
+    buoys[0] = (32.0, 24.0, 100, 27, 19, 10, 10, 0.0)
+    with tempfile.TemporaryDirectory() as log_dir:
+        writer = FrameWriter(log_dir, max_queue=4)
+        writer.start()
+        writer.submit(image, 100.0, overlays={"buoys": buoys})
+        writer.submit(image, 101.0)
+        writer.stop()
+        assert not image.any(), "[ERR] the caller's frame was drawn on"
+        annotated, clean = [cv2.imread(str(p)) for p in sorted_frame_paths(log_dir)]
+        assert annotated[24, 32, 2] > 200 and clean.max() < 8
+
+
+def test_video_log_seeks_by_time():
+    with tempfile.TemporaryDirectory() as log_dir:
+        video_path = pathlib.Path(log_dir, 'run.avi')
+        writer = VideoFrameWriter(video_path, fps=10, max_queue=16)
+        writer.start()
+        for i in range(10):
+            image = np.full((48, 64, 3), 20 * i, dtype=np.uint8)
+            writer.submit(image, 100.0 + 0.1 * i)
+        writer.stop()
+        assert writer.get_counters()["written"] == 10
+        assert index_path(video_path).exists()
+
+        reader = VideoLogReader(video_path)
+        assert len(reader) == 10
+        frame, timestamp, image = reader.read_at(100.45)
+        assert (frame, round(timestamp, 6)) == (4, 100.4)
+        assert image.shape == (48, 64, 3)
+        assert abs(int(image.mean()) - 80) <= 2
+        assert reader.read_jpeg(9)[:2] == b'\xff\xd8'
+        reader.close()
+
+
+def test_unclosed_video_log_keeps_its_index():
+    with tempfile.TemporaryDirectory() as log_dir:
+        video_path = pathlib.Path(log_dir, 'run.avi')
+        log = VideoLogWriter(video_path, fps=10, flush_every=8)
+        rng = np.random.default_rng(0)
+        # noisy frames are large enough that OpenCV writes them out before the video is closed
+        for i in range(40):
+            log.write(rng.integers(0, 256, (480, 640, 3), dtype=np.uint8), 100.0 + 0.1 * i)
+        # the process dies here: the index has timestamps but no offsets
+        reader = VideoLogReader(video_path)
+        assert 8 <= len(reader) <= 40
+        assert np.allclose(reader.get_timestamps(), 100.0 + 0.1 * np.arange(len(reader)))
+        assert reader.read(len(reader) - 1).shape == (480, 640, 3)
+        reader.close()
+        assert log.close() == 40
+
+
+if __name__ == "__main__":
+    test_frame_filenames_are_unique_and_parseable()
+    test_drop_policies()
+    test_overlays_are_drawn_on_the_writer_thread()
+    test_video_log_seeks_by_time()
+    test_unclosed_video_log_keeps_its_index()
+    print("[INFO] frame logger tests passed.")
@@ -0,0 +1,34 @@
+import sys
+import pathlib
+import tempfile
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Frame_Store import FrameStore, build_frame_store
+from Frame_Logger import frame_filename
+
+
+def test_frame_store_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        frame_dir = pathlib.Path(tmp, 'Frames')
+        frame_dir.mkdir()
+        for i in range(5):
+            image = np.full((480, 640, 3), 40 * i, dtype=np.uint8)
+            cv2.imwrite(str(frame_dir / frame_filename(1000.0 + i, i)), image)
+        assert build_frame_store(frame_dir, pathlib.Path(tmp, 'store')) == 5
+
+        store = FrameStore(pathlib.Path(tmp, 'store'))
+        assert len(store) == 5
+        assert list(store.get_timestamps()) == [1000.0, 1001.0, 1002.0, 1003.0, 1004.0]
+        run = store.between(1001.0, 1003.0)
+        assert run.shape == (3, 480, 640, 3)
+        assert np.shares_memory(run, store.get_frames())
+        assert abs(int(run[1].mean()) - 80) <= 1
+        assert store.frame_at(1002.5) == 2
+
+
+if __name__ == "__main__":
+    test_frame_store_round_trip()
+    print("[INFO] frame store tests passed.")
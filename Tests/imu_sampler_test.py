@@ -0,0 +1,140 @@
+import sys
+import pathlib
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from IMU_Sampler import IMU_DTYPE, IMUSampler, FakeBNO055
+
+
+class CountingSensor(object):
+    """every property returns how many reads were made, so a torn sample has fields that disagree"""
+    def __init__(self):
+        self.reads = 0
+
+    def __getattr__(self, name):
+        size = dict(euler=3, quaternion=4).get(name, 3)
+        value = float(self.reads // 7)
+        self.reads += 1
+        return (value,) * size
+
+
+class BusSensor(object):
+    """a slow sensor that counts reads made while another read is still on the bus"""
+    def __init__(self):
+        self.busy = False
+        self.overlaps = 0
+
+    def __getattr__(self, name):
+        if self.busy:
+            self.overlaps += 1
+        self.busy = True
+        time.sleep(0.0005)
+        self.busy = False
+        return (0.0,) * dict(quaternion=4).get(name, 3)
+
+
+def test_fake_sensor_readings():
+    sensor = FakeBNO055(yaw_rate=90.0, noise=0.0)
+    assert np.allclose(sensor.gravity, (0.0, 0.0, 9.81))
+    assert np.isclose(sensor.gyro[2], np.pi / 2)
+    assert len(sensor.quaternion) == 4
+    time.sleep(0.1)
+    assert 5.0 < sensor.euler[0] < 20.0
+
+
+def test_latest_and_window():
+    sampler = IMUSampler(FakeBNO055(noise=0.0), rate=200.0, capacity=64)
+    assert sampler.get_latest() is None
+    assert len(sampler.get_window()) == 0
+    first = sampler.sample()
+    assert first.dtype == IMU_DTYPE
+    assert sampler.get_latest()['timestamp'] == first['timestamp']
+    middle = time.time()
+    for _ in range(99):
+        sampler.sample()
+    # the ring keeps only the newest capacity samples, oldest first
+    window = sampler.get_window()
+    assert len(window) == 64
+    assert np.all(np.diff(window['timestamp']) >= 0)
+    assert window['timestamp'][-1] == sampler.get_latest()['timestamp']
+    assert np.all(sampler.get_window(start=middle)['timestamp'] >= middle)
+    assert sampler.get_counters()["samples"] == 100
+
+
+def test_fields_subset():
+    sampler = IMUSampler(FakeBNO055(), fields=("gyro",))
+    latest = sampler.sample()
+    assert not np.any(np.isnan(latest['gyro']))
+    assert np.all(np.isnan(latest['euler']))
+
+
+def test_background_rate():
+    sampler = IMUSampler(FakeBNO055(), rate=100.0)
+    sampler.start()
+    time.sleep(0.5)
+    sampler.stop()
+    assert 35 <= sampler.get_count() <= 55
+    timestamps = sampler.get_window()['timestamp']
+    assert abs(np.median(np.diff(timestamps)) - 0.01) < 0.005
+
+
+def test_readers_never_see_torn_samples():
+    sampler = IMUSampler(CountingSensor(), rate=2000.0, capacity=16)
+    sampler.start()
+    torn = []
+    end = time.time() + 0.4
+
+    def read():
+        while time.time() < end:
+            for record in sampler.get_window():
+                values = np.concatenate([record[name].ravel() for name in IMU_DTYPE.names[1:]])
+                if not np.all(values == values[0]):
+                    torn.append(record)
+            latest = sampler.get_latest()
+            if latest is not None and not np.all(latest['gyro'] == latest['euler'][0]):
+                torn.append(latest)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    sampler.stop()
+    assert sampler.get_count() > 16
+    assert not torn
+
+
+def test_pause_hands_over_the_bus():
+    sensor = BusSensor()
+    sampler = IMUSampler(sensor, rate=500.0)
+    sampler.start()
+    time.sleep(0.05)
+    # like ADCS calibration, read the sensor directly while the sampler is paused
+    for _ in range(2):
+        sampler.pause()
+    assert sampler.is_paused()
+    count = sampler.get_count()
+    for _ in range(50):
+        sensor.gyro
+    assert sampler.sample() is None
+    assert sampler.get_count() == count
+    sampler.resume()
+    assert sampler.is_paused()
+    sampler.resume()
+    time.sleep(0.05)
+    sampler.stop()
+    assert sensor.overlaps == 0
+    assert sampler.get_count() > count > 0
+
+
+if __name__ == "__main__":
+    test_fake_sensor_readings()
+    test_latest_and_window()
+    test_fields_subset()
+    test_background_rate()
+    test_readers_never_see_torn_samples()
+    test_pause_hands_over_the_bus()
+    print("[INFO] IMU sampler tests passed.")
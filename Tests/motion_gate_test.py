@@ -0,0 +1,43 @@
+import sys
+import pathlib
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Motion_Gate import MotionGate, DETECT, REUSE, DISCARD
+from Vision_Frame import VisionFrame
+
+FRAME_DIR = pathlib.Path(__file__).resolve().parents[1] / 'Frames'
+
+
+def test_gate_decisions():
+    gate = MotionGate(diff_threshold=4.0, max_rate=90.0, max_reuse=3)
+    image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    assert gate.decide(VisionFrame(image)) == DETECT
+    # sensor noise alone does not count as a change
+    noisy = cv2.add(image, np.full_like(image, 1))
+    assert gate.decide(VisionFrame(noisy), gyro_rate=(0.0, 0.0, 5.0)) == REUSE
+    assert gate.decide(VisionFrame(255 - image)) == DETECT
+    assert gate.decide(VisionFrame(255 - image), gyro_rate=(0.0, 0.0, 200.0)) == DISCARD
+    # stale results are refreshed after max_reuse frames in a row
+    decisions = [gate.decide(VisionFrame(255 - image)) for _ in range(4)]
+    assert decisions == [REUSE, REUSE, REUSE, DETECT]
+    counters = gate.get_counters()
+    assert (counters["frames"], counters["detected"], counters["reused"], counters["discarded"]) == (8, 3, 4, 1)
+
+
+def replay(frame_dir=FRAME_DIR):
+    """prints how many of the recorded frames the gate would have skipped"""
+    gate = MotionGate()
+    for path in sorted(frame_dir.glob('*.jpg')):
+        image = cv2.imread(str(path))
+        if gate.decide(VisionFrame(image)) == DETECT:
+            gate.add_detect_time(0.004)
+    print(f"[GATE] {gate.get_counters()}")
+
+
+if __name__ == "__main__":
+    test_gate_decisions()
+    print("[INFO] motion gate tests passed.")
+    replay()
@@ -0,0 +1,41 @@
+import sys
+import pathlib
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Servo_Profile import ServoProfile
+
+
+def test_position_follows_slew_rate():
+    profile = ServoProfile(slew_rate=100.0, settle_time=0.1, initial_degree=0.0)
+    arrival = profile.command(50.0, now=10.0)
+    assert abs(arrival - 10.6) < 1e-9
+    assert profile.position_at(10.0) == 0.0
+    assert abs(profile.position_at(10.25) - 25.0) < 1e-9
+    assert profile.position_at(10.5) == 50.0
+    assert not profile.arrived(10.55)
+    assert profile.arrived(10.6)
+    # a new command starts from the estimated angle, not the old target
+    arrival = profile.command(-50.0, now=10.25)
+    assert abs(arrival - (10.25 + 0.75 + 0.1)) < 1e-9
+    assert abs(profile.position_at(10.5) - 0.0) < 1e-9
+    # commands are clamped to the servo range
+    profile.command(400.0, now=20.0)
+    assert profile.get_target() == 180.0
+
+
+def test_wait_only_as_long_as_needed():
+    profile = ServoProfile(slew_rate=1000.0, settle_time=0.02)
+    assert profile.wait(0.0)
+    start = time.time()
+    profile.command(60.0)
+    assert not profile.wait(0.01)
+    assert profile.wait(1.0)
+    assert 0.07 <= time.time() - start < 0.2
+    assert profile.arrived()
+
+
+if __name__ == "__main__":
+    test_position_follows_slew_rate()
+    test_wait_only_as_long_as_needed()
+    print("[INFO] servo profile tests passed.")
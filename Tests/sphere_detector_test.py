@@ -0,0 +1,84 @@
+import sys
+import pathlib
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Arena import PingPongBall, TennisBall, RedBuoy
+from Camera_Model import get_camera_model
+from Sphere_Detector import SphereDetector, detect_spheres_and_buoys
+from Camera_Util import BuoyDetector
+from Vision_Frame import VisionFrame
+
+
+def draw_scene():
+    """draws a ping pong ball at 50 cm, a tennis ball at 80 cm and a buoy at 60 cm, returns the image and expected spheres"""
+    focal_length = get_camera_model((640, 480)).get_focal_length_pixels()
+    image = np.full((480, 640, 3), 90, dtype=np.uint8)
+    expected = []
+    for sphere_type, color, center, distance in ((PingPongBall, (30, 140, 240), (160, 300), 50.0),
+                                                 (TennisBall, (60, 210, 190), (420, 320), 80.0),
+                                                 (RedBuoy, (20, 20, 200), (560, 150), 60.0)):
+        radius = focal_length * np.tan(np.arcsin(sphere_type.RADIUS / distance))
+        cv2.circle(image, center, int(round(radius)), color, -1)
+        expected.append((sphere_type, center, distance))
+    return image, expected
+
+
+def check(spheres, expected):
+    assert len(spheres) == len(expected), spheres
+    for sphere_type, center, distance in expected:
+        found = [s for s in spheres if type(s) is sphere_type]
+        assert len(found) == 1, f"[ERR] expected one {sphere_type.__name__} in {spheres}"
+        x, y = found[0].get_pixel_center()
+        assert abs(x - center[0]) < 2 and abs(y - center[1]) < 2
+        assert abs(found[0].get_range() - distance) < 0.1 * distance, f"[ERR] {found[0]} should be at {distance} cm"
+        bearing = get_camera_model((640, 480)).bearings(center[0], center[1])
+        assert abs(found[0].get_bearing() - bearing) < 0.5
+
+
+def test_all_classes_in_one_pass():
+    image, expected = draw_scene()
+    spheres = SphereDetector().detect(image)
+    check(spheres, expected)
+    assert [s.get_range() for s in spheres] == sorted(s.get_range() for s in spheres)
+
+
+def test_yuv_frames_and_roi():
+    image, expected = draw_scene()
+    frame = VisionFrame.from_yuv(cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420), (640, 480))
+    detector = SphereDetector()
+    check(detector.detect(frame), expected)
+    # the buoy is above row 200, the balls below
+    check(detector.detect(image, top_row=200), expected[:2])
+    assert len(detector.get_blobs("red_buoy")) == 0
+
+
+def test_buoy_records_come_from_the_sphere_pass():
+    image, expected = draw_scene()
+    spheres, buoys = detect_spheres_and_buoys(image)
+    check(spheres, expected)
+    reference, _, _ = BuoyDetector().detect(image)
+    assert len(buoys) == len(reference) == 1
+    assert abs(buoys[0]['x'] - reference[0]['x']) < 1 and abs(buoys[0]['y'] - reference[0]['y']) < 1
+    assert buoys[0]['bearing'] == get_camera_model((640, 480)).bearings(buoys[0]['x'], buoys[0]['y'])
+
+
+def test_yuv_records_are_in_full_resolution_pixels():
+    image, _ = draw_scene()
+    frame = VisionFrame.from_yuv(cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420), (640, 480))
+    _, bgr = detect_spheres_and_buoys(image)
+    _, yuv = detect_spheres_and_buoys(frame)
+    assert len(bgr) == len(yuv) == 1
+    for field in ('x', 'y', 'left', 'top', 'width', 'height'):
+        assert abs(int(yuv[0][field]) - int(bgr[0][field])) <= 2, (field, yuv[0], bgr[0])
+    assert abs(yuv[0]['area'] - bgr[0]['area']) < 0.1 * bgr[0]['area']
+
+
+if __name__ == "__main__":
+    test_all_classes_in_one_pass()
+    test_yuv_frames_and_roi()
+    test_buoy_records_come_from_the_sphere_pass()
+    test_yuv_records_are_in_full_resolution_pixels()
+    print("[INFO] sphere detector tests passed.")
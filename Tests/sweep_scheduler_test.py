@@ -0,0 +1,85 @@
+import sys
+import pathlib
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Servo_Profile import ServoProfile
+from Sweep_Scheduler import SweepScheduler, robot_bearings
+from Pan_Planner import PanPlanner
+
+
+class FakeMount(object):
+    """records the commanded angles instead of driving servos"""
+    def __init__(self):
+        self.angles = (10.0, 0.0)
+        self.commands = []
+
+    def moveToSphericalCoordinate(self, top_servo_deg, bottom_servo_deg):
+        self.angles = (top_servo_deg, bottom_servo_deg)
+        self.commands.append(self.angles)
+
+    def getSphericalCoordinates(self):
+        return self.angles
+
+
+class ProfiledMount(FakeMount):
+    """a fake mount whose pan servo reports its arrival time like CameraMount"""
+    def __init__(self, slew_rate):
+        super().__init__()
+        self.profile = ServoProfile(slew_rate, settle_time=0.0)
+
+    def moveToSphericalCoordinate(self, top_servo_deg, bottom_servo_deg):
+        super().moveToSphericalCoordinate(top_servo_deg, bottom_servo_deg)
+        return self.profile.command(bottom_servo_deg)
+
+
+def test_pose_history():
+    mount = FakeMount()
+    sweep = SweepScheduler(mount, angles=(0, 90), settle_time=0.2)
+    before = time.time()
+    settled = sweep.move_to(10.0, 90.0)
+    assert sweep.pose_at(before - 1.0) == (10.0, 0.0, True)
+    assert sweep.pose_at(settled - 0.1) == (10.0, 90.0, False)
+    assert sweep.pose_at(settled) == (10.0, 90.0, True)
+    # with a motion profile the settle time starts when the servo arrives, a 90 degree move at 450 deg/s takes 0.2 s
+    sweep = SweepScheduler(ProfiledMount(450.0), settle_time=0.1)
+    before = time.time()
+    settled = sweep.move_to(10.0, 90.0)
+    assert abs((settled - before) - 0.3) < 0.01
+    assert not sweep.pose_at(before + 0.25)[2]
+
+
+def test_sweep_runs_without_blocking():
+    mount = FakeMount()
+    sweep = SweepScheduler(mount, angles=(0, 90, 180), settle_time=0.02, dwell_time=0.03)
+    start = time.perf_counter()
+    sweep.start()
+    assert time.perf_counter() - start < 0.05
+    time.sleep(0.27)
+    sweep.stop()
+    assert [bottom for _, bottom in mount.commands[:4]] == [0, 90, 180, 0]
+    assert all(top == 10.0 for top, _ in mount.commands)
+
+
+def test_planner_uses_the_sweep_timing():
+    planner = PanPlanner()
+    sweep = SweepScheduler(FakeMount(), settle_time=0.1, dwell_time=0.6, planner=planner, slew_rate=450.0)
+    assert planner.get_timing() == (450.0, 0.1, 0.6)
+    sweep.set_timing(dwell_time=1.0)
+    assert planner.get_timing() == (450.0, 0.1, 1.0)
+
+
+def test_robot_bearings():
+    bearings = robot_bearings([10.0, -20.0], 90.0)
+    assert np.allclose(bearings, [100.0, 70.0])
+    assert np.allclose(robot_bearings([10.0], 180.0), [-170.0])
+
+
+if __name__ == "__main__":
+    test_pose_history()
+    test_sweep_runs_without_blocking()
+    test_planner_uses_the_sweep_timing()
+    test_robot_bearings()
+    print("[INFO] sweep scheduler tests passed.")
@@ -0,0 +1,97 @@
+import sys
+import pathlib
+import collections
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+import Camera_Util
+import Tag_Detector
+from Camera_Model import get_camera_model
+
+Detection = collections.namedtuple('Detection', ['tag_family', 'tag_id', 'hamming', 'goodness', 'decision_margin',
+                                                 'homography', 'center', 'corners'])
+
+
+class StubDetector(object):
+    """reports every bright square in the image it is given as tag 7, in that image's coordinates like apriltag"""
+    created = []
+
+    def __init__(self, options):
+        self.shapes = []
+        StubDetector.created.append(self)
+
+    def detect(self, gray):
+        self.shapes.append(gray.shape)
+        ys, xs = np.nonzero(gray > 128)
+        if len(xs) == 0:
+            return []
+        x0, y0, x1, y1 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+        corners = np.array([[x0, y1], [x1, y1], [x1, y0], [x0, y0]], dtype=np.float64)
+        homography = np.array([[1, 0, (x0 + x1) / 2], [0, 1, (y0 + y1) / 2], [0, 0, 1]], dtype=np.float64)
+        return [Detection(b"tag36h11", 7, 0, 0.0, 50.0, homography, corners.mean(axis=0), corners)]
+
+
+class StubApriltag(object):
+    DetectorOptions = staticmethod(lambda **options: options)
+    Detector = StubDetector
+
+
+def make_detector(**kwargs):
+    saved = Tag_Detector.apriltag
+    Tag_Detector.apriltag = StubApriltag
+    try:
+        return Tag_Detector.TagDetector(**kwargs)
+    finally:
+        Tag_Detector.apriltag = saved
+
+
+def tag_image(x0, y0, size=40):
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    image[y0:y0 + size, x0:x0 + size] = 255
+    return image
+
+
+def test_roi_results_come_back_in_full_frame_coordinates():
+    detector = make_detector(roi_padding=20)
+    saved = Camera_Util.tag_detector
+    Camera_Util.tag_detector = detector
+    try:
+        tags = Camera_Util.detect_apriltags(tag_image(400, 300))
+        assert detector.get_roi() == (380, 280, 460, 360)
+        # the tag moved a little, the next frame is only searched around where it was
+        tags = Camera_Util.detect_apriltags(tag_image(410, 305))
+    finally:
+        Camera_Util.tag_detector = saved
+    stub = StubDetector.created[-1]
+    assert stub.shapes == [(480, 640), (80, 80)]
+    assert len(tags) == 1 and tags[0]['id'] == 7 and tags[0]['family'] == "tag36h11"
+    assert (tags[0]['x'], tags[0]['y']) == (430.0, 325.0)
+    assert np.array_equal(tags[0]['corners'], [[410, 345], [450, 345], [450, 305], [410, 305]])
+    assert tags[0]['bearing'] == get_camera_model((640, 480)).bearings(430.0, 325.0)
+    # the ROI grows around the new corners
+    assert detector.get_roi() == (390, 285, 470, 365)
+    counters = detector.get_counters()
+    assert (counters["roi_searches"], counters["roi_misses"], counters["full_searches"]) == (1, 0, 1)
+
+
+def test_roi_miss_falls_back_to_full_frame():
+    detector = make_detector(roi_padding=10)
+    gray = tag_image(100, 100)[:, :, 0]
+    detector.detect(gray)
+    results = detector.detect(tag_image(500, 50)[:, :, 0])
+    assert np.allclose(results[0].center, (520, 70))
+    # the homography maps tag coordinates into the full frame too
+    assert np.allclose(results[0].homography[:2, 2], (520, 70))
+    stub = StubDetector.created[-1]
+    assert stub.shapes[1] == (60, 60) and stub.shapes[2] == (480, 640)
+    assert detector.get_counters()["roi_misses"] == 1
+    # nothing found anywhere drops the ROI
+    detector.detect(np.zeros((480, 640), dtype=np.uint8))
+    assert detector.get_roi() is None
+
+
+if __name__ == "__main__":
+    test_roi_results_come_back_in_full_frame_coordinates()
+    test_roi_miss_falls_back_to_full_frame()
+    print("[INFO] tag detector tests passed.")
@@ -0,0 +1,93 @@
+import sys
+import pathlib
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Camera_Util import DETECTION_DTYPE
+from Tracker import Tracker
+
+
+def make_detections(centers, size=20):
+    detections = np.zeros((len(centers),), dtype=DETECTION_DTYPE)
+    for i, (x, y) in enumerate(centers):
+        detections[i] = (x, y, size * size, x - size // 2, y - size // 2, size, size, 0.0)
+    return detections
+
+
+def test_cost_matrix_and_assignment():
+    tracker = Tracker(max_distance=50.0)
+    tracker.update(make_detections([(100, 100), (300, 200)]), 0.0, kinds=["buoy", "TennisBall"])
+    cost = tracker.cost_matrix(make_detections([(305, 198), (102, 101), (500, 400)]), ["TennisBall", "buoy", "buoy"])
+    assert cost.shape == (2, 3)
+    # different kinds and far away detections can never match
+    assert np.isinf(cost[0, 0]) and np.isinf(cost[1, 1]) and np.isinf(cost[:, 2]).all()
+    rows, cols = Tracker.assign(cost)
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 1), (1, 0)]
+    # greedy takes the cheapest pair first
+    rows, cols = Tracker.assign(np.array([[1.0, 2.0], [1.5, 10.0]]))
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 0), (1, 1)]
+
+
+def test_ids_persist_and_velocity_predicts():
+    tracker = Tracker(detect_every=3, min_hits=2)
+    ids = None
+    dt = 1 / 24
+    for frame in range(12):
+        timestamp = frame * dt
+        # two buoys drifting right at 120 px/s, only detected when the tracker asks
+        centers = [(100 + 120 * timestamp, 240), (400 + 120 * timestamp, 300)]
+        if tracker.needs_detection():
+            tracks = tracker.update(make_detections(centers), timestamp)
+        else:
+            tracks = tracker.predict(timestamp)
+        if len(tracks) == 2:
+            if ids is None:
+                ids = sorted(tracks['id'].tolist())
+            assert sorted(tracks['id'].tolist()) == ids
+    assert ids == [0, 1]
+    tracks = tracker.get_tracks()
+    assert np.allclose(tracks['vx'], 120, atol=25)
+    predicted = tracker.predict(12 * dt)
+    assert np.allclose(np.sort(predicted['x']), [100 + 120 * 12 * dt, 400 + 120 * 12 * dt], atol=3)
+    counters = tracker.get_counters()
+    assert counters["detections"] == 4 and counters["created"] == 2
+
+
+def test_unmatched_tracks_are_dropped():
+    tracker = Tracker(max_misses=2)
+    tracker.update(make_detections([(100, 100)]), 0.0)
+    for step in range(1, 4):
+        tracker.update(make_detections([]), step * 0.1)
+    assert len(tracker.get_tracks(confirmed=False)) == 0
+    assert tracker.get_counters()["dropped"] == 1
+
+
+def test_pan_between_frames_resets_tracks():
+    tracker = Tracker(detect_every=6, min_hits=2)
+    tracker.set_pan(0.0)
+    for frame in range(3):
+        tracker.update(make_detections([(200, 240)]), frame / 24)
+    assert tracker.get_tracks()['id'].tolist() == [0]
+    assert not tracker.needs_detection()
+    # the same pan keeps the tracks
+    assert not tracker.set_pan(0.0)
+    tracker.predict(3 / 24)
+    # after a pan move a different target lands near the old pixels, it must not take over the old track's id
+    assert tracker.set_pan(90.0)
+    assert tracker.needs_detection()
+    assert len(tracker.get_tracks(confirmed=False)) == 0
+    for frame in range(4, 6):
+        tracks = tracker.update(make_detections([(230, 240)]), frame / 24)
+    assert tracks['id'].tolist() == [1]
+    assert np.allclose(tracks['vx'], 0.0) and np.allclose(tracks['vy'], 0.0)
+    counters = tracker.get_counters()
+    assert counters["pan_resets"] == 1 and counters["dropped"] == 1
+
+
+if __name__ == "__main__":
+    test_cost_matrix_and_assignment()
+    test_ids_persist_and_velocity_predicts()
+    test_unmatched_tracks_are_dropped()
+    test_pan_between_frames_resets_tracks()
+    print("[INFO] tracker tests passed.")
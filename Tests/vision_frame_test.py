@@ -0,0 +1,30 @@
+import sys
+import pathlib
+
+import numpy as np
+import cv2
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Vision_Frame import VisionFrame, as_frame
+
+
+def test_derived_images_are_computed_once():
+    image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    frame = VisionFrame(image, frame_id=7, timestamp=1.0)
+    gray = frame.gray()
+    assert frame.gray() is gray
+    assert (gray == cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)).all()
+    assert (frame.rgb() == np.flip(image, axis=2)).all()
+    assert np.shares_memory(frame.rgb(), image)
+    assert frame.blurred(9) is frame.blurred(9)
+    assert frame.pyramid(2).shape == (120, 160, 3)
+    assert frame.pyramid(0) is image
+    # gray, rgb, blurred, pyramid 1 and 2 were each computed once
+    assert frame.get_cache_counters() == {"hits": 3, "misses": 5, "views": 5}
+    assert as_frame(frame) is frame
+    assert as_frame(image).get_image() is image
+
+
+if __name__ == "__main__":
+    test_derived_images_are_computed_once()
+    print("[INFO] vision frame tests passed.")
@@ -0,0 +1,65 @@
+import sys
+import pathlib
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Vision_Frame import VisionFrame
+from Vision_Pipeline import VisionPipeline
+
+
+def test_deadline_keeps_fast_results():
+    def slow(frame, scale):
+        time.sleep(0.2)
+        return "slow"
+    fast = lambda frame, scale: float(frame.get_image().mean()) * scale
+    pipeline = VisionPipeline({"fast": fast, "slow": slow}, deadline=0.05)
+    image = np.full((48, 64, 3), 2, dtype=np.uint8)
+    start = time.perf_counter()
+    first = VisionFrame(image, 0, 10.0)
+    results = pipeline.run(first, scale=3)
+    assert time.perf_counter() - start < 0.15
+    assert results == {"fast": 6.0, "slow": None}
+    assert pipeline.get_late() == ["slow"]
+    assert pipeline.get_result_frame("fast") is first and pipeline.get_result_frame("slow") is None
+    # the slow detector still holds the first frame, and is not given the next one
+    assert pipeline.is_holding(image)
+    other = np.zeros_like(image)
+    results = pipeline.run(VisionFrame(other), scale=1)
+    assert results["fast"] == 0.0
+    time.sleep(0.25)
+    third = VisionFrame(other, 2, 10.2)
+    results = pipeline.run(third, scale=1)
+    assert results["slow"] == "slow"
+    # the slow result came from the first frame, its run on the third frame is still going
+    assert pipeline.get_result_frame("slow") is first
+    assert pipeline.get_result_frame("slow").get_timestamp() == 10.0
+    assert pipeline.get_result_frame("fast") is third
+    assert not pipeline.is_holding(image)
+    results = pipeline.run(VisionFrame(other, 3, 10.3), scale=1, deadline=1.0)
+    assert pipeline.get_result_frame("slow") is third
+    pipeline.stop()
+    counters = pipeline.get_counters()
+    assert counters["busy"]["slow"] == 2 and counters["late"]["slow"] == 3
+
+
+def test_failing_detector_keeps_previous_result():
+    calls = []
+    def flaky(frame):
+        calls.append(1)
+        if len(calls) == 2:
+            raise ValueError("bad frame")
+        return len(calls)
+    pipeline = VisionPipeline({"flaky": flaky}, deadline=None)
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    assert pipeline.run(image)["flaky"] == 1
+    assert pipeline.run(image)["flaky"] == 1
+    assert pipeline.run(image)["flaky"] == 3
+    pipeline.stop()
+
+
+if __name__ == "__main__":
+    test_deadline_keeps_fast_results()
+    test_failing_detector_keeps_previous_result()
+    print("[INFO] vision pipeline tests passed.")
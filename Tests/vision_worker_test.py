@@ -0,0 +1,100 @@
+import sys
+import pathlib
+import time
+import multiprocessing
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+from Frame_Capture import FakeCamera
+from Vision_Worker import SharedFrameRing, VisionWorker
+
+FRAME_DIR = pathlib.Path(__file__).resolve().parents[1] / 'Frames'
+
+
+def _fill(handle, count):
+    ring = SharedFrameRing.attach(handle)
+    for value in range(count):
+        ring.get_write_buffer()[:] = value
+        ring.publish(float(value))
+    ring.close()
+
+
+def test_shared_ring_across_processes():
+    ring = SharedFrameRing((4, 4), slots=4, readers=2)
+    process = multiprocessing.Process(target=_fill, args=(ring.get_handle(), 5))
+    process.start()
+    process.join(10)
+    frame_id, timestamp, frame = ring.get_latest(reader=1)
+    assert (frame_id, timestamp) == (4, 4.0)
+    assert (frame == 4).all()
+    # a held frame is never chosen for writing, an overwritten one is gone
+    assert ring.get_frame(4, reader=0) is not None
+    assert ring.get_frame(0, reader=0) is None
+    assert ring.get_counters()["published"] == 5
+    ring.close()
+
+
+def test_reused_slot_is_not_returned():
+    ring = SharedFrameRing((4, 4), slots=4, readers=2)
+    for value in range(2):
+        ring.get_write_buffer()[:] = value
+        ring.publish(float(value))
+    # frame 0's slot is the write slot again, the writer is filling it with frame 2
+    ring.get_write_buffer()[:] = 2
+    assert ring.get_frame(0, reader=0) is None
+    held = ring.get_frame(1, reader=0)
+    assert (held == 1).all()
+    ring.publish(2.0)
+    # the held frame's slot is skipped, so it is still frame 1
+    ring.get_write_buffer()[:] = 3
+    assert (held == 1).all() and (ring.get_frame(1, reader=0) == 1).all()
+    ring.close()
+
+
+def test_worker_detects_recorded_frames():
+    worker = VisionWorker(FakeCamera(str(FRAME_DIR)), framerate=50)
+    detected = None
+    deadline = time.time() + 20
+    while (detected is None) and (time.time() < deadline):
+        result = worker.poll()
+        if (result is not None) and (result["buoys"] is not None):
+            detected = result
+        time.sleep(0.01)
+    assert detected is not None
+    assert detected["buoys"].dtype.names[:2] == ('x', 'y')
+    image = worker.get_frame(detected["frame_id"])
+    assert (image is None) or (image.shape == (480, 640, 3))
+    worker.release_frame()
+    worker.stop()
+    assert worker.get_counters()["results"] >= 1
+    assert not worker.is_alive()
+
+
+def test_worker_configures_its_own_detectors():
+    from Camera_Util import BuoyDetector
+    worker = VisionWorker(FakeCamera(str(FRAME_DIR)), framerate=50, buoy_pyramid_level=2, tag_detection=True)
+    checked = False
+    deadline = time.time() + 20
+    while (not checked) and (time.time() < deadline):
+        result = worker.poll()
+        if (result is not None) and (result["buoys"] is not None):
+            assert result["tags"] is not None and result["tags"].dtype.names[:2] == ('id', 'family')
+            image = worker.get_frame(result["frame_id"])
+            if image is not None:
+                # the worker detects with the pyramid level and tags it was given
+                expected, _, _ = BuoyDetector(pyramid_level=2).detect(image.copy())
+                assert np.array_equal(result["buoys"], expected)
+                checked = True
+            worker.release_frame()
+        time.sleep(0.01)
+    worker.stop()
+    assert checked
+
+
+if __name__ == "__main__":
+    test_shared_ring_across_processes()
+    test_reused_slot_is_not_returned()
+    test_worker_detects_recorded_frames()
+    test_worker_configures_its_own_detectors()
+    print("[INFO] vision worker tests passed.")
@@ -0,0 +1,267 @@
+import numpy as np
+
+from Camera_Model import get_camera_model
+
+TRACK_DTYPE = np.dtype([('id', np.int32), ('kind', 'U16'),
+                        ('x', np.float32), ('y', np.float32), ('vx', np.float32), ('vy', np.float32),
+                        ('width', np.int32), ('height', np.int32), ('area', np.int32), ('bearing', np.float32),
+                        ('hits', np.int32), ('misses', np.int32), ('last_seen', np.float64)])
+
+
+def sphere_records(spheres):
+    """
+    converts Sphere_Detector results into tracker input.\n
+    returns (detections, kinds): a record array with x, y, width, height and area, and the class name of each sphere.
+    """
+    detections = np.empty((len(spheres),), dtype=[('x', np.float32), ('y', np.float32), ('width', np.int32),
+                                                  ('height', np.int32), ('area', np.int32)])
+    for i, sphere in enumerate(spheres):
+        x, y = sphere.get_pixel_center()
+        size = int(round(2 * sphere.get_pixel_radius()))
+        detections[i] = (x, y, size, size, int(np.pi * sphere.get_pixel_radius() ** 2))
+    return detections, [type(sphere).__name__ for sphere in spheres]
+
+
+class Tracker(object):
+    """
+    Image space multi-object tracker. Each target keeps a persistent id and a constant velocity (pixels/s) estimate,
+    so the robot can act on tracks instead of raw detections that flicker from frame to frame.\n
+    Detections are matched to the predicted tracks through a cost matrix (center distance, plus a size change penalty)
+    built for all pairs at once, with pairs of different kinds or further apart than max_distance ruled out. Pairs are
+    then taken greedily, cheapest first, which is as good as an optimal assignment when targets are far apart compared
+    to how far they move per frame, as the few buoys and balls in the arena are.\n
+    Full detection only needs to run every detect_every frames, or sooner once a track is stale (its predicted motion
+    since it was last seen is too large to trust, or it is heading out of the frame). In between, predict() moves the
+    tracks along their velocities for the cost of a few array operations. Camera pan shows up as image motion too, so
+    the velocities also absorb a steady CameraMount sweep, but a stepped sweep (Sweep_Scheduler) jumps between angles:
+    set_pan() drops the tracks when the pan angle changes rather than matching pixels across two views.
+    """
+    def __init__(self, max_distance:float=60.0, max_misses:int=3, min_hits:int=2, velocity_gain:float=0.5,
+                 size_weight:float=0.5, detect_every:int=6, resolution:tuple=(640, 480), verbose:bool=False):
+        """
+        max_distance => farthest (pixels) a detection may be from a predicted track and still update it.\n
+        max_misses => full detections in a row a track may go unmatched before it is dropped.\n
+        min_hits => matched detections before a track is reported as confirmed.\n
+        velocity_gain => weight of a new velocity measurement against the previous estimate (0 to 1).\n
+        size_weight => cost per pixel of width/height change, added to the center distance.\n
+        detect_every => frames between full detections while every track is fresh.
+        """
+        self.__max_distance = max_distance
+        self.__max_misses = max_misses
+        self.__min_hits = min_hits
+        self.__velocity_gain = velocity_gain
+        self.__size_weight = size_weight
+        self.__detect_every = detect_every
+        self.__resolution = resolution
+        self.__verbose = verbose
+        self.__tracks = np.empty((0,), dtype=TRACK_DTYPE)
+        self.__next_id = 0
+        self.__timestamp = None
+        self.__frames_since_detect = None
+        self.__pan = None
+
+        self.__detections = 0
+        self.__predictions = 0
+        self.__created = 0
+        self.__dropped = 0
+        self.__pan_resets = 0
+
+    def reset(self):
+        """drops every track, so the next frame is detected"""
+        self.__tracks = np.empty((0,), dtype=TRACK_DTYPE)
+        self.__timestamp = None
+        self.__frames_since_detect = None
+
+    def set_pan(self, pan_deg:float):
+        """
+        pan_deg => camera pan (CameraMount bottom servo degrees) of the frame about to be detected or predicted.\n
+        pixel positions only mean something at one pan angle, so when it changes every track is dropped and the next
+        frame is detected. returns True if the tracks were reset.
+        """
+        panned = (self.__pan is not None) and (pan_deg != self.__pan)
+        self.__pan = pan_deg
+        if panned:
+            self.__dropped += len(self.__tracks)
+            self.__pan_resets += 1
+            self.reset()
+            if(self.__verbose):
+                print(f"[TRACK] pan moved to {pan_deg}, tracks reset")
+        return panned
+
+    def __stale(self):
+        """returns True when a track can no longer be trusted to be found near its prediction"""
+        if len(self.__tracks) == 0:
+            return False
+        tracks = self.__tracks
+        unseen = self.__timestamp - tracks['last_seen']
+        travel = np.hypot(tracks['vx'], tracks['vy']) * unseen
+        width, height = self.__resolution
+        outside = (tracks['x'] < 0) | (tracks['x'] >= width) | (tracks['y'] < 0) | (tracks['y'] >= height)
+        return bool(np.any(travel > self.__max_distance / 2) | np.any(outside))
+
+    def needs_detection(self):
+        """returns True when the next frame should run the full detectors rather than only predict()"""
+        if self.__frames_since_detect is None:
+            return True
+        return (self.__frames_since_detect + 1 >= self.__detect_every) or self.__stale()
+
+    def predict(self, timestamp:float):
+        """
+        moves every track to where its constant velocity puts it at timestamp (seconds).\n
+        returns the confirmed tracks.
+        """
+        self.__advance(timestamp)
+        if self.__frames_since_detect is not None:
+            self.__frames_since_detect += 1
+        self.__predictions += 1
+        return self.get_tracks()
+
+    def __advance(self, timestamp:float):
+        if self.__timestamp is not None:
+            dt = max(timestamp - self.__timestamp, 0.0)
+            self.__tracks['x'] += self.__tracks['vx'] * dt
+            self.__tracks['y'] += self.__tracks['vy'] * dt
+            self.__update_bearings()
+        self.__timestamp = timestamp
+
+    def __update_bearings(self):
+        if len(self.__tracks) == 0:
+            return
+        width, height = self.__resolution
+        x = np.clip(self.__tracks['x'], 0, width - 1)
+        y = np.clip(self.__tracks['y'], 0, height - 1)
+        self.__tracks['bearing'] = get_camera_model(self.__resolution).bearings(x, y)
+
+    def cost_matrix(self, detections, kinds):
+        """
+        returns the (tracks, detections) matching cost, np.inf where the pair may not be matched.\n
+        detections => records with x, y, width and height fields (Camera_Util.DETECTION_DTYPE).\n
+        kinds => class name of each detection.
+        """
+        tracks = self.__tracks
+        dx = tracks['x'][:, None] - detections['x'][None, :]
+        dy = tracks['y'][:, None] - detections['y'][None, :]
+        distance = np.hypot(dx, dy)
+        size_change = (np.abs(tracks['width'][:, None] - detections['width'][None, :]) +
+                       np.abs(tracks['height'][:, None] - detections['height'][None, :]))
+        cost = distance + self.__size_weight * size_change
+        gate = (distance > self.__max_distance) | (tracks['kind'][:, None] != np.asarray(kinds, dtype='U16')[None, :])
+        cost[gate] = np.inf
+        return cost
+
+    @staticmethod
+    def assign(cost):
+        """
+        greedy assignment on a cost matrix, cheapest pair first.\n
+        returns (rows, cols) index arrays of the matched pairs.
+        """
+        rows, cols = [], []
+        if cost.size == 0:
+            return np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+        order = np.argsort(cost, axis=None)
+        order = order[np.isfinite(cost.flat[order])]
+        row_used = np.zeros(cost.shape[0], dtype=bool)
+        col_used = np.zeros(cost.shape[1], dtype=bool)
+        for row, col in zip(*np.unravel_index(order, cost.shape)):
+            if row_used[row] or col_used[col]:
+                continue
+            row_used[row] = col_used[col] = True
+            rows.append(row)
+            cols.append(col)
+            if row_used.all() or col_used.all():
+                break
+        return np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+
+    def update(self, detections, timestamp:float, kinds=None):
+        """
+        detections => the full detection result for this frame, records with x, y, width and height fields
+        (Camera_Util.DETECTION_DTYPE, or sphere_records(spheres)).\n
+        timestamp => frame time in seconds.\n
+        kinds => class name of each detection, or one name for all of them (defaults to "buoy").\n
+        returns the confirmed tracks.
+        """
+        if (kinds is None) or isinstance(kinds, str):
+            kinds = [kinds or "buoy"] * len(detections)
+        self.__advance(timestamp)
+        self.__detections += 1
+        self.__frames_since_detect = 0
+
+        tracks = self.__tracks
+        rows, cols = self.assign(self.cost_matrix(detections, kinds))
+        if len(rows):
+            matched = detections[cols]
+            dt = timestamp - tracks['last_seen'][rows]
+            moving = dt > 0
+            #residual between the measurement and the prediction corrects the velocity of tracks seen before
+            gain = self.__velocity_gain
+            residual_x = matched['x'] - tracks['x'][rows]
+            residual_y = matched['y'] - tracks['y'][rows]
+            safe_dt = np.where(moving, dt, 1.0)
+            tracks['vx'][rows] += np.where(moving, gain * residual_x / safe_dt, 0.0)
+            tracks['vy'][rows] += np.where(moving, gain * residual_y / safe_dt, 0.0)
+            tracks['x'][rows] = matched['x']
+            tracks['y'][rows] = matched['y']
+            tracks['width'][rows] = matched['width']
+            tracks['height'][rows] = matched['height']
+            tracks['area'][rows] = matched['area']
+            tracks['hits'][rows] += 1
+            tracks['misses'][rows] = 0
+            tracks['last_seen'][rows] = timestamp
+
+        unmatched = np.ones(len(tracks), dtype=bool)
+        unmatched[rows] = False
+        tracks['misses'][unmatched] += 1
+        keep = tracks['misses'] <= self.__max_misses
+        self.__dropped += int(np.count_nonzero(~keep))
+        tracks = tracks[keep]
+
+        new = np.ones(len(detections), dtype=bool)
+        new[cols] = False
+        new_detections = detections[new]
+        born = np.zeros((len(new_detections),), dtype=TRACK_DTYPE)
+        born['id'] = np.arange(self.__next_id, self.__next_id + len(born))
+        born['kind'] = np.asarray(kinds, dtype='U16')[new]
+        for field in ('x', 'y', 'width', 'height', 'area'):
+            born[field] = new_detections[field]
+        born['hits'] = 1
+        born['last_seen'] = timestamp
+        self.__next_id += len(born)
+        self.__created += len(born)
+        self.__tracks = np.concatenate((tracks, born))
+        self.__update_bearings()
+        if(self.__verbose):
+            print(f"[TRACK] {len(rows)} matched, {len(born)} new, {len(self.__tracks)} tracks")
+        return self.get_tracks()
+
+    def get_tracks(self, confirmed:bool=True):
+        """returns a copy of the tracks (TRACK_DTYPE), only those matched at least min_hits times when confirmed"""
+        if confirmed:
+            return self.__tracks[self.__tracks['hits'] >= self.__min_hits]
+        return self.__tracks.copy()
+
+    def get_counters(self):
+        """returns a dictionary with the full detections, predicted frames, tracks created and dropped, and pan resets"""
+        return {"detections": self.__detections,
+                "predictions": self.__predictions,
+                "tracks": len(self.__tracks),
+                "created": self.__created,
+                "dropped": self.__dropped,
+                "pan_resets": self.__pan_resets}
+
+
+if __name__ == '__main__':
+    #replays the recorded frames, detecting every few frames and predicting in between
+    import cv2
+    from Camera_Util import detect_buoys
+    from Frame_Logger import sorted_frame_paths, parse_frame_timestamp
+
+    tracker = Tracker(verbose=True)
+    for path in sorted_frame_paths('Frames'):
+        timestamp = parse_frame_timestamp(path)
+        if tracker.needs_detection():
+            detections, _, _ = detect_buoys(cv2.imread(str(path)))
+            tracks = tracker.update(detections, timestamp)
+        else:
+            tracks = tracker.predict(timestamp)
+        print(f"[INFO] {path.name} {[(int(t['id']), round(float(t['bearing']), 1)) for t in tracks]}")
+    print(f"[INFO] {tracker.get_counters()}")
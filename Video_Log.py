@@ -0,0 +1,214 @@
+import argparse
+import bisect
+import csv
+import pathlib
+import struct
+import time
+
+import numpy as np
+import cv2
+
+from Frame_Logger import FrameWriter, sorted_frame_paths, parse_frame_timestamp
+
+
+def index_path(video_path):
+    """returns the path of the sidecar index for a video log, <video>.idx.csv"""
+    video_path = pathlib.Path(video_path)
+    return video_path.with_name(video_path.name + '.idx.csv')
+
+
+def index_avi(video_path):
+    """
+    walks the RIFF chunks of an MJPEG AVI and returns a list of (offset, size) for every video frame chunk,
+    where offset is the byte offset of the JPEG data in the file.
+    """
+    chunks = []
+    with open(video_path, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            fourcc, size = struct.unpack('<4sI', f.read(8))
+            if fourcc in (b'RIFF', b'LIST'):
+                #descend into the list, its contents start after the 4 byte list type
+                offset += 12
+                continue
+            if fourcc[2:] == b'dc':
+                if offset + 8 + size > file_size:
+                    #the last frame of a run that was never closed may be cut short
+                    break
+                chunks.append((offset + 8, size))
+            #chunks are padded to an even size
+            offset += 8 + size + (size & 1)
+    return chunks
+
+
+class VideoLogWriter(object):
+    """
+    Appends frames to an MJPEG AVI with cv2.VideoWriter, remembering each frame's capture timestamp.
+    On close the AVI is indexed and a sidecar <video>.idx.csv mapping frame number to timestamp and byte offset is
+    written, so replay tools can seek straight to a time in a run.\n
+    While recording, every frame's timestamp is appended to the index (offset and size -1, they are only known once
+    the AVI is closed) and the index is flushed every flush_every frames, so a run cut short by a crash still has its
+    timestamps. VideoLogReader then takes the offsets from the AVI itself.
+    """
+    def __init__(self, video_path, fps:float=24, jpeg_quality:int=90, flush_every:int=24, verbose:bool=False):
+        self.__video_path = pathlib.Path(video_path)
+        self.__video_path.parent.mkdir(parents=True, exist_ok=True)
+        self.__fps = fps
+        self.__quality = jpeg_quality
+        self.__verbose = verbose
+        self.__flush_every = flush_every
+        self.__writer = None
+        self.__size = None
+        self.__timestamps = []
+        self.__index_file = None
+        self.__index = None
+
+    def get_video_path(self):
+        return self.__video_path
+
+    def write(self, image, timestamp:float):
+        if self.__writer is None:
+            self.__size = (image.shape[1], image.shape[0])
+            self.__writer = cv2.VideoWriter(str(self.__video_path), cv2.VideoWriter_fourcc(*'MJPG'), self.__fps, self.__size)
+            assert self.__writer.isOpened(), f"[ERR] Could not open {self.__video_path} for writing."
+            self.__writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.__quality)
+            self.__index_file = open(index_path(self.__video_path), 'w', newline='')
+            self.__index = csv.writer(self.__index_file, delimiter=',')
+            self.__index.writerow(['Frame', 'Timestamp', 'Offset', 'Size'])
+        if (image.shape[1], image.shape[0]) != self.__size:
+            image = cv2.resize(image, self.__size, interpolation=cv2.INTER_AREA)
+        self.__writer.write(image)
+        self.__index.writerow([len(self.__timestamps), f"{timestamp:.6f}", -1, -1])
+        self.__timestamps.append(timestamp)
+        if len(self.__timestamps) % self.__flush_every == 0:
+            self.__index_file.flush()
+        return True
+
+    def close(self):
+        """closes the video and writes the sidecar index, returns the number of indexed frames"""
+        if self.__writer is None:
+            return 0
+        self.__writer.release()
+        self.__writer = None
+        self.__index_file.close()
+        self.__index_file = self.__index = None
+        chunks = index_avi(self.__video_path)
+        if len(chunks) != len(self.__timestamps):
+            print(f"[WARN] {self.__video_path} has {len(chunks)} frames but {len(self.__timestamps)} timestamps were logged.")
+        count = min(len(chunks), len(self.__timestamps))
+        with open(index_path(self.__video_path), 'w', newline='') as csvfile:
+            data = csv.writer(csvfile, delimiter=',')
+            data.writerow(['Frame', 'Timestamp', 'Offset', 'Size'])
+            for frame in range(count):
+                data.writerow([frame, f"{self.__timestamps[frame]:.6f}", chunks[frame][0], chunks[frame][1]])
+        if(self.__verbose):
+            print(f"[LOG] Indexed {count} frames of {self.__video_path}.")
+        return count
+
+
+class VideoFrameWriter(FrameWriter):
+    """
+    A FrameWriter that appends frames to one MJPEG AVI (plus its timestamp index) instead of writing one JPEG per frame.
+    Queueing and drop policies are the same as FrameWriter.
+    """
+    def __init__(self, video_path, fps:float=24, max_queue:int=8, drop_policy:str="newest", jpeg_quality:int=90, verbose:bool=False):
+        super().__init__(pathlib.Path(video_path).parent, max_queue=max_queue, drop_policy=drop_policy,
+                         jpeg_quality=jpeg_quality, verbose=verbose)
+        self.__log = VideoLogWriter(video_path, fps=fps, jpeg_quality=jpeg_quality, verbose=verbose)
+
+    def write_frame(self, sequence:int, timestamp:float, image):
+        return self.__log.write(image, timestamp)
+
+    def close_output(self):
+        self.__log.close()
+
+
+class VideoLogReader(object):
+    """
+    Random access to the frames of a video log through its sidecar index, by frame number or by capture time.\n
+    The index of a run that was never closed has no offsets, they are then read from the AVI's chunks (index_avi).
+    """
+    def __init__(self, video_path):
+        self.__video_path = pathlib.Path(video_path)
+        frames = np.genfromtxt(index_path(self.__video_path), delimiter=',', skip_header=1, ndmin=2, invalid_raise=False)
+        #a crash can leave the last row half written
+        frames = frames[np.isfinite(frames).all(axis=1)] if frames.size else np.empty((0, 4))
+        self.__timestamps = frames[:, 1].astype(np.float64)
+        self.__offsets = frames[:, 2].astype(np.int64)
+        self.__sizes = frames[:, 3].astype(np.int64)
+        if np.any(self.__offsets < 0):
+            chunks = np.array(index_avi(self.__video_path), dtype=np.int64).reshape(-1, 2)
+            count = min(len(chunks), len(self.__timestamps))
+            print(f"[WARN] {self.__video_path} was not closed, recovered {count} of {len(self.__timestamps)} logged frames.")
+            self.__timestamps = self.__timestamps[:count]
+            self.__offsets = chunks[:count, 0]
+            self.__sizes = chunks[:count, 1]
+        self.__file = open(self.__video_path, 'rb')
+
+    def __len__(self):
+        return len(self.__timestamps)
+
+    def close(self):
+        self.__file.close()
+
+    def get_timestamps(self):
+        return self.__timestamps
+
+    def read_jpeg(self, frame:int):
+        """returns the encoded JPEG bytes of a frame"""
+        self.__file.seek(int(self.__offsets[frame]))
+        return self.__file.read(int(self.__sizes[frame]))
+
+    def read(self, frame:int):
+        """returns the decoded BGR image of a frame"""
+        return cv2.imdecode(np.frombuffer(self.read_jpeg(frame), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    def frame_at(self, timestamp:float):
+        """returns the number of the last frame captured at or before timestamp (0 if timestamp is before the run)"""
+        return max(bisect.bisect_right(self.__timestamps, timestamp) - 1, 0)
+
+    def read_at(self, timestamp:float):
+        """returns (frame number, timestamp, image) for the last frame captured at or before timestamp"""
+        frame = self.frame_at(timestamp)
+        return frame, self.__timestamps[frame], self.read(frame)
+
+
+def pack_frames(frame_dir:str, video_path:str, fps:float=24, jpeg_quality:int=90, verbose:bool=False):
+    """packs a directory of frame_*.jpg logs into an MJPEG AVI with a timestamp index, returns the number of frames packed"""
+    log = VideoLogWriter(video_path, fps=fps, jpeg_quality=jpeg_quality, verbose=verbose)
+    for path in sorted_frame_paths(frame_dir):
+        image = cv2.imread(str(path))
+        if image is None:
+            print(f"[WARN] Could not read {path}, skipping.")
+            continue
+        log.write(image, parse_frame_timestamp(path))
+    return log.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pack a Frames/ directory into an indexed MJPEG AVI, or read a frame back by time.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack = subparsers.add_parser('pack', help="pack frame_*.jpg files into a video log")
+    pack.add_argument('frame_dir')
+    pack.add_argument('video_path')
+    pack.add_argument('--fps', type=float, default=24)
+    pack.add_argument('--quality', type=int, default=90)
+    seek = subparsers.add_parser('seek', help="extract the frame captured at a time from a video log")
+    seek.add_argument('video_path')
+    seek.add_argument('timestamp', type=float)
+    seek.add_argument('--out', default='frame.jpg')
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        start = time.time()
+        count = pack_frames(args.frame_dir, args.video_path, fps=args.fps, jpeg_quality=args.quality, verbose=True)
+        print(f"[INFO] Packed {count} frames into {args.video_path} in {time.time()-start:.1f} s.")
+    elif args.command == 'seek':
+        reader = VideoLogReader(args.video_path)
+        frame, timestamp, image = reader.read_at(args.timestamp)
+        cv2.imwrite(args.out, image)
+        print(f"[INFO] Frame {frame} @ {timestamp:.6f} written to {args.out}.")
+        reader.close()
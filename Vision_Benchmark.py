@@ -0,0 +1,224 @@
+import argparse
+import json
+import pathlib
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import cv2
+
+import Camera_Util
+from Frame_Logger import sorted_frame_paths, parse_frame_timestamp
+from Tag_Detector import apriltag_available
+from Vision_Frame import VisionFrame
+from Sphere_Detector import detect_spheres
+
+
+def load_frames(frame_dir:str='./Frames', video_path:str=None, limit:int=None, store_dir:str=None):
+    """
+    decodes the recorded frames once, from a Frames/ directory or an indexed video log, or maps them from a
+    decoded frame store (Frame_Store.py) without decoding at all.\n
+    returns (timestamps, list of BGR images)
+    """
+    timestamps = []
+    images = []
+    if store_dir is not None:
+        from Frame_Store import FrameStore
+        store = FrameStore(store_dir)
+        count = len(store) if limit is None else min(limit, len(store))
+        return store.get_timestamps()[:count], [store[i] for i in range(count)]
+    if video_path is not None:
+        from Video_Log import VideoLogReader
+        reader = VideoLogReader(video_path)
+        count = len(reader) if limit is None else min(limit, len(reader))
+        for frame in range(count):
+            images.append(reader.read(frame))
+            timestamps.append(float(reader.get_timestamps()[frame]))
+        reader.close()
+    else:
+        paths = sorted_frame_paths(frame_dir)
+        for path in (paths if limit is None else paths[:limit]):
+            image = cv2.imread(str(path))
+            if image is not None:
+                images.append(image)
+                timestamps.append(parse_frame_timestamp(path))
+    return np.array(timestamps, dtype=np.float64), images
+
+
+def reference_masks(images):
+    """precomputes the get_ranges masks so find_centers can be timed on its own"""
+    masks = []
+    for image in images:
+        rgb_image = np.flip(image, axis=2)
+        masks.append((Camera_Util.get_ranges((110,255), (0,50), (0,50), rgb_image), rgb_image))
+    return masks
+
+
+def default_stages(images):
+    """
+    returns {stage name: function(frame index)}. Each stage is timed separately over every frame.
+    """
+    masks = reference_masks(images)
+    stages = {
+        "detect_buoys": lambda i: Camera_Util.detect_buoys(images[i]),
+        "detect_buoys_reference": lambda i: Camera_Util.detect_buoys_reference(images[i]),
+        "find_centers": lambda i: Camera_Util.find_centers(masks[i][0], masks[i][1], 50),
+    }
+    for level in (2, 3):
+        detector = Camera_Util.BuoyDetector(pyramid_level=level)
+        stages[f"detect_buoys_pyramid{level}"] = lambda i, detector=detector: detector.detect(images[i])
+    yuv_frames = [cv2.cvtColor(image, cv2.COLOR_BGR2YUV_I420) for image in images]
+    stages["detect_buoys_yuv"] = lambda i: Camera_Util.detect_buoys(
+        VisionFrame.from_yuv(yuv_frames[i], (images[i].shape[1], images[i].shape[0])))
+    stages["detect_spheres"] = lambda i: detect_spheres(images[i])
+    if apriltag_available():
+        stages["detect_apriltags"] = lambda i: Camera_Util.detect_apriltags(images[i])
+    return stages
+
+
+def pyramid_accuracy(images, levels:tuple=(1, 2, 3), refine_windows:tuple=(16, 32), match_distance:float=5.0):
+    """
+    compares pyramid buoy detection against the full resolution detector on every frame.\n
+    returns a list of {level, refine_window, ms_per_frame, recall, false_positives, mean_center_error_px}, where a
+    full resolution detection is recalled if a pyramid detection lies within match_distance pixels of it.
+    """
+    reference = [Camera_Util.BuoyDetector().detect(image)[0] for image in images]
+    rows = []
+    for level in levels:
+        for refine_window in refine_windows:
+            detector = Camera_Util.BuoyDetector(pyramid_level=level, refine_window=refine_window)
+            start = time.perf_counter()
+            results = [detector.detect(image)[0] for image in images]
+            elapsed = (time.perf_counter() - start) / len(images)
+            matched = missed = false_positives = 0
+            errors = []
+            for expected, found in zip(reference, results):
+                if (len(expected) == 0) or (len(found) == 0):
+                    missed += len(expected)
+                    false_positives += len(found)
+                    continue
+                distance = np.hypot(expected['x'][:, None] - found['x'][None, :], expected['y'][:, None] - found['y'][None, :])
+                nearest = distance.min(axis=1)
+                hits = nearest < match_distance
+                matched += int(hits.sum())
+                missed += int((~hits).sum())
+                false_positives += max(0, len(found) - int(hits.sum()))
+                errors.extend(nearest[hits].tolist())
+            rows.append({"level": level, "refine_window": refine_window,
+                         "ms_per_frame": 1000 * elapsed,
+                         "recall": matched / (matched + missed) if (matched + missed) else 1.0,
+                         "false_positives": false_positives,
+                         "mean_center_error_px": float(np.mean(errors)) if errors else 0.0})
+    return rows
+
+
+def time_stage(stage, count:int, repeat:int=1):
+    """returns the per-call latencies (seconds) of stage over count frames, repeated repeat times"""
+    latencies = np.empty((count * repeat,), dtype=np.float64)
+    n = 0
+    for _ in range(repeat):
+        for i in range(count):
+            start = time.perf_counter()
+            stage(i)
+            latencies[n] = time.perf_counter() - start
+            n += 1
+    return latencies
+
+
+def peak_memory(stage, count:int):
+    """returns the peak traced (numpy and Python) allocation, in bytes, of stage over count frames"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for i in range(count):
+        stage(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak - baseline
+
+
+def summarize(latencies, peak_bytes:int):
+    return {"calls": int(latencies.shape[0]),
+            "frames_per_s": float(latencies.shape[0] / latencies.sum()) if latencies.sum() > 0 else 0.0,
+            "mean_ms": float(1000 * latencies.mean()),
+            "p50_ms": float(1000 * np.percentile(latencies, 50)),
+            "p95_ms": float(1000 * np.percentile(latencies, 95)),
+            "p99_ms": float(1000 * np.percentile(latencies, 99)),
+            "max_ms": float(1000 * latencies.max()),
+            "peak_traced_bytes": int(peak_bytes)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=pathlib.Path(__file__).resolve().parent).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_benchmark(images, stages:dict, repeat:int=3, warmup:int=5, verbose:bool=True):
+    """times every stage over the frames, returns the result dictionary"""
+    results = {"revision": git_revision(),
+               "time": time.time(),
+               "platform": platform.platform(),
+               "machine": platform.machine(),
+               "frames": len(images),
+               "repeat": repeat,
+               "stages": {}}
+    for name, stage in stages.items():
+        time_stage(stage, min(warmup, len(images)))
+        latencies = time_stage(stage, len(images), repeat)
+        peak = peak_memory(stage, min(len(images), 20))
+        results["stages"][name] = summarize(latencies, peak)
+    results["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if(verbose):
+        print_results(results)
+    return results
+
+
+def print_results(results:dict, baseline:dict=None):
+    print(f"[BENCH] revision {results['revision']} on {results['machine']}, {results['frames']} frames x {results['repeat']}")
+    for name, stats in results["stages"].items():
+        line = (f"[BENCH] {name:24s} {stats['frames_per_s']:8.1f} frames/s  p50 {stats['p50_ms']:7.2f} ms  "
+                f"p95 {stats['p95_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms  peak {stats['peak_traced_bytes']/1e6:6.2f} MB")
+        if (baseline is not None) and (name in baseline["stages"]):
+            before = baseline["stages"][name]["p50_ms"]
+            line += f"  p50 {100*(stats['p50_ms'] - before)/before:+.1f}% vs {baseline['revision']}"
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless benchmark of the vision detectors over recorded frames.")
+    parser.add_argument('--frames', default='./Frames', help="directory of recorded frame_*.jpg files")
+    parser.add_argument('--video', default=None, help="indexed video log to read the frames from instead")
+    parser.add_argument('--store', default=None, help="decoded frame store (Frame_Store.py) to map the frames from instead")
+    parser.add_argument('--limit', type=int, default=None, help="only use the first N frames")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', nargs='*', default=None, help="stage names to run (default: all)")
+    parser.add_argument('--out', default='bench_results.json', help="machine-readable result file")
+    parser.add_argument('--pyramid', action='store_true', help="also report pyramid buoy detection accuracy vs speed")
+    parser.add_argument('--compare', default=None, help="previous result file to compare against")
+    args = parser.parse_args()
+
+    timestamps, images = load_frames(args.frames, args.video, args.limit, args.store)
+    assert len(images) != 0, "[ERR] No frames to benchmark."
+    stages = default_stages(images)
+    if args.stages:
+        stages = {name: stages[name] for name in args.stages}
+    results = run_benchmark(images, stages, repeat=args.repeat, verbose=(args.compare is None))
+    if args.compare is not None:
+        with open(args.compare) as f:
+            print_results(results, json.load(f))
+    if args.pyramid:
+        full_ms = 1000 * np.mean(time_stage(lambda i: Camera_Util.BuoyDetector().detect(images[i]), len(images)))
+        results["pyramid_accuracy"] = pyramid_accuracy(images)
+        print(f"[BENCH] full resolution buoy detection {full_ms:.2f} ms/frame")
+        for row in results["pyramid_accuracy"]:
+            print(f"[BENCH] pyramid level {row['level']} window {row['refine_window']:3d}: {row['ms_per_frame']:6.2f} ms/frame  "
+                  f"recall {row['recall']:.3f}  false positives {row['false_positives']}  center error {row['mean_center_error_px']:.3f} px")
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Results written to {args.out}")
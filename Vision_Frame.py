@@ -0,0 +1,137 @@
+import time
+
+import cv2
+
+
+class VisionFrame(object):
+    """
+    A captured BGR frame plus the derived images the detectors need (gray, RGB, HSV, blurred, pyramid levels).
+    Each derived image is computed the first time a detector asks for it and memoized, so every conversion runs at
+    most once per captured frame no matter how many detectors use it.\n
+    Derived images must be treated as read-only, they are shared between detectors.\n
+    Frames captured as YUV420 (VisionFrame.from_yuv) keep the raw buffer: gray() is a view of the Y plane,
+    yuv_half() is the half resolution YUV image color detectors classify, and the BGR image is only converted if
+    something asks for it.
+    """
+    def __init__(self, image, frame_id:int=-1, timestamp:float=None):
+        self.__image = image
+        self.__frame_id = frame_id
+        self.__timestamp = time.time() if timestamp is None else timestamp
+        self.__cache = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__yuv = None
+        self.__resolution = None if image is None else (image.shape[1], image.shape[0])
+        self.__mount = None
+
+    @classmethod
+    def from_yuv(cls, buffer, resolution:tuple=(640, 480), frame_id:int=-1, timestamp:float=None):
+        """wraps a YUV420 capture buffer (Frame_Capture.yuv_buffer_shape) of a resolution (width, height) frame, no copy is made"""
+        frame = cls(None, frame_id, timestamp)
+        frame.__yuv = buffer
+        frame.__resolution = tuple(resolution)
+        return frame
+
+    def __repr__(self):
+        return f"VisionFrame {self.__frame_id} @ {self.__timestamp:.3f} {self.get_shape()} cached{list(self.__cache.keys())}"
+
+    def __get(self, key, compute):
+        if key in self.__cache:
+            self.__hits += 1
+            return self.__cache[key]
+        self.__misses += 1
+        value = compute()
+        self.__cache[key] = value
+        return value
+
+    def get_image(self):
+        """returns the original BGR image, converted once from the YUV buffer for YUV frames"""
+        if self.__image is None:
+            width, height = self.__resolution
+            return self.__get('bgr', lambda: cv2.cvtColor(self.__yuv, cv2.COLOR_YUV2BGR_I420)[:height, :width])
+        return self.__image
+
+    def is_yuv(self):
+        return self.__yuv is not None
+
+    def get_yuv(self):
+        """returns the raw YUV420 buffer, or None for frames captured as BGR"""
+        return self.__yuv
+
+    def yuv_planes(self):
+        """returns zero-copy (Y, U, V) plane views of a YUV frame"""
+        from Frame_Capture import yuv_planes
+        return self.__get('yuv_planes', lambda: yuv_planes(self.__yuv, self.__resolution))
+
+    def yuv_half(self):
+        """
+        returns a (height/2, width/2, 3) YUV image: the Y plane subsampled to the chroma resolution next to the U and V
+        planes. For BGR frames it is converted from the image.
+        """
+        if self.__yuv is None:
+            return self.__get('yuv_half', lambda: cv2.resize(cv2.cvtColor(self.__image, cv2.COLOR_BGR2YUV),
+                                                             (self.__resolution[0] // 2, self.__resolution[1] // 2),
+                                                             interpolation=cv2.INTER_NEAREST))
+        y, u, v = self.yuv_planes()
+        return self.__get('yuv_half', lambda: cv2.merge((cv2.resize(y, (u.shape[1], u.shape[0]), interpolation=cv2.INTER_NEAREST), u, v)))
+
+    def get_frame_id(self):
+        return self.__frame_id
+
+    def get_timestamp(self):
+        return self.__timestamp
+
+    def set_mount(self, pose:tuple):
+        """stamps the frame with the camera mount pose at exposure, (top_servo_deg, bottom_servo_deg, settled), see Sweep_Scheduler"""
+        self.__mount = pose
+
+    def get_mount(self):
+        """returns the (top_servo_deg, bottom_servo_deg, settled) pose the frame was taken at, None if unknown"""
+        return self.__mount
+
+    def get_shape(self):
+        if self.__image is None:
+            return (self.__resolution[1], self.__resolution[0], 3)
+        return self.__image.shape
+
+    def put(self, key, value):
+        """stores a derived image computed elsewhere, so later lookups of key reuse it"""
+        self.__cache[key] = value
+
+    def cached(self, key, compute):
+        """returns the derived image stored under key, computing it with compute() on the first request"""
+        return self.__get(key, compute)
+
+    def gray(self):
+        """returns the grayscale frame, for YUV frames this is a view of the Y plane (no conversion or copy)"""
+        if self.__yuv is not None:
+            return self.yuv_planes()[0]
+        return self.__get('gray', lambda: cv2.cvtColor(self.__image, cv2.COLOR_BGR2GRAY))
+
+    def rgb(self):
+        """returns an RGB view of the frame (no copy is made)"""
+        return self.__get('rgb', lambda: self.get_image()[:, :, ::-1])
+
+    def hsv(self):
+        return self.__get('hsv', lambda: cv2.cvtColor(self.get_image(), cv2.COLOR_BGR2HSV))
+
+    def blurred(self, ksize:int=9):
+        """returns the BGR frame smoothed with a normalized ksize x ksize box filter"""
+        return self.__get(('blurred', ksize), lambda: cv2.boxFilter(self.get_image(), -1, (ksize, ksize)))
+
+    def pyramid(self, level:int=1):
+        """returns the BGR frame downsampled by 2**level with cv2.pyrDown, level 0 is the frame itself"""
+        if level == 0:
+            return self.get_image()
+        return self.__get(('pyramid', level), lambda: cv2.pyrDown(self.pyramid(level - 1)))
+
+    def get_cache_counters(self):
+        """returns a dictionary with the cache hits and misses (conversions actually run) for this frame"""
+        return {"hits": self.__hits, "misses": self.__misses, "views": len(self.__cache)}
+
+
+def as_frame(image):
+    """wraps a BGR image in a VisionFrame, frames that are already VisionFrames are returned as they are"""
+    if isinstance(image, VisionFrame):
+        return image
+    return VisionFrame(image)
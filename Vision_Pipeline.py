@@ -0,0 +1,154 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from Vision_Frame import as_frame
+
+
+class VisionPipeline(object):
+    """
+    Runs several detectors on the same frame at once on a thread pool. The OpenCV calls and the apriltag C library
+    release the GIL, so on the Pi's four cores the tag and color detectors overlap instead of running back to back.\n
+    run() waits for the detectors up to a per-frame deadline. A detector still running at the deadline does not hold
+    the others back: its last finished result is returned instead (and listed by get_late()), it keeps running in the
+    background, and it is not given a new frame until it finishes, so a slow detector never queues up work. Each
+    detector therefore only ever runs on one thread at a time, and may keep state (scratch buffers, tracking ROIs).\n
+    The frame is shared read-only, and a late detector still reads it after run() returns: use is_holding() before
+    reusing a capture buffer. A result may therefore come from an earlier frame than the one just given to run(),
+    get_result_frame() says which frame (with its timestamp and mount pose) each result was computed on. Derived images are memoized on the VisionFrame, so a view two detectors both need
+    (e.g. gray()) may be computed twice when they ask at the same moment, but is never corrupted.
+    """
+    def __init__(self, detectors:dict, deadline:float=0.030, workers:int=None, verbose:bool=False):
+        """
+        detectors => {name: function(frame, **context)}, frame is a VisionFrame.\n
+        deadline => seconds run() waits for the detectors, None waits for all of them.\n
+        workers => threads in the pool, defaults to one per detector.
+        """
+        self.__detectors = dict(detectors)
+        self.__deadline = deadline
+        self.__verbose = verbose
+        self.__executor = ThreadPoolExecutor(max_workers=workers or max(1, len(self.__detectors)),
+                                             thread_name_prefix="vision")
+        self.__pending = {}
+        self.__pending_frames = {}
+        self.__results = {name: None for name in self.__detectors}
+        self.__result_frames = {name: None for name in self.__detectors}
+        self.__late = []
+
+        self.__frames = 0
+        self.__late_counts = {name: 0 for name in self.__detectors}
+        self.__busy_counts = {name: 0 for name in self.__detectors}
+        self.__time_sums = {name: 0.0 for name in self.__detectors}
+        self.__runs = {name: 0 for name in self.__detectors}
+        self.__wall_sum = 0.0
+
+    def get_names(self):
+        return list(self.__detectors.keys())
+
+    def __timed(self, name, frame, context):
+        start = time.perf_counter()
+        result = self.__detectors[name](frame, **context)
+        return result, time.perf_counter() - start
+
+    def __collect(self, name, future):
+        """stores a finished detector's result, errors are reported and leave the previous result in place"""
+        del self.__pending[name]
+        frame = self.__pending_frames.pop(name)
+        try:
+            result, seconds = future.result()
+        except Exception as e:
+            print(f"[ERR] {name} detector failed: {e}")
+            return
+        self.__results[name] = result
+        self.__result_frames[name] = frame
+        self.__time_sums[name] += seconds
+        self.__runs[name] += 1
+
+    def run(self, frame, deadline:float=None, **context):
+        """
+        frame => BGR image or VisionFrame, which must not change until every detector given it has finished.\n
+        deadline => overrides the pipeline deadline (seconds) for this frame.\n
+        context => keyword arguments passed to every detector (e.g. top_row).\n
+        returns {name: result}, with the last finished result for detectors that missed the deadline (None if they
+        have never finished).
+        """
+        start = time.perf_counter()
+        frame = as_frame(frame)
+        self.__frames += 1
+        #detectors that finished late since the last frame are free again
+        for name, future in list(self.__pending.items()):
+            if future.done():
+                self.__collect(name, future)
+        for name in self.__detectors:
+            if name in self.__pending:
+                self.__busy_counts[name] += 1
+                continue
+            self.__pending[name] = self.__executor.submit(self.__timed, name, frame, context)
+            self.__pending_frames[name] = frame
+
+        deadline = self.__deadline if deadline is None else deadline
+        remaining = None if deadline is None else max(deadline - (time.perf_counter() - start), 0.0)
+        wait(list(self.__pending.values()), timeout=remaining)
+        for name, future in list(self.__pending.items()):
+            if future.done():
+                self.__collect(name, future)
+        self.__late = list(self.__pending.keys())
+        for name in self.__late:
+            self.__late_counts[name] += 1
+
+        self.__wall_sum += time.perf_counter() - start
+        if(self.__verbose):
+            print(f"[PIPE] frame in {1000*(time.perf_counter() - start):.1f} ms, late {self.__late}")
+        return dict(self.__results)
+
+    def is_holding(self, buffer):
+        """returns True while a late detector is still reading a frame backed by buffer (a BGR image or YUV buffer)"""
+        for frame in self.__pending_frames.values():
+            if (frame.get_yuv() if frame.is_yuv() else frame.get_image()) is buffer:
+                return True
+        return False
+
+    def get_result_frame(self, name:str):
+        """
+        returns the VisionFrame the detector's current result was computed on, None before its first result. It is
+        the frame just given to run() only if the result is fresh (not late, and the detector did not fail).
+        """
+        return self.__result_frames[name]
+
+    def get_late(self):
+        """returns the names of the detectors that missed the last frame's deadline"""
+        return self.__late
+
+    def get_counters(self):
+        """
+        returns a dictionary with the frames run, the mean wall time per frame in seconds, and per detector the mean
+        run time, how often it missed the deadline and how many frames it skipped while still busy.
+        """
+        return {"frames": self.__frames,
+                "wall_time_mean": (self.__wall_sum / self.__frames) if self.__frames else 0.0,
+                "detector_time_mean": {name: (self.__time_sums[name] / self.__runs[name]) if self.__runs[name] else 0.0
+                                       for name in self.__detectors},
+                "late": dict(self.__late_counts),
+                "busy": dict(self.__busy_counts)}
+
+    def stop(self):
+        """waits for the running detectors and shuts the pool down"""
+        self.__executor.shutdown(wait=True)
+
+
+if __name__ == '__main__':
+    #times the recorded frames through the pipeline, compare wall_time_mean with the sum of detector_time_mean
+    import cv2
+    import Camera_Util
+    from Frame_Logger import sorted_frame_paths
+    from Sphere_Detector import detect_spheres
+    from Tag_Detector import apriltag_available
+
+    detectors = {"buoys": lambda frame, top_row=0: Camera_Util.detect_buoys(frame, top_row)[0],
+                 "spheres": lambda frame, top_row=0: detect_spheres(frame, top_row)}
+    if apriltag_available():
+        detectors["tags"] = lambda frame, top_row=0: Camera_Util.detect_apriltags(frame)
+    pipeline = VisionPipeline(detectors, deadline=0.030)
+    for path in sorted_frame_paths('Frames'):
+        results = pipeline.run(cv2.imread(str(path)))
+    pipeline.stop()
+    print(f"[INFO] {pipeline.get_counters()}")
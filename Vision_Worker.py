@@ -0,0 +1,329 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+#header layout of a SharedFrameRing, int64 slots
+_WRITE_SLOT, _LATEST_SLOT, _NEXT_ID, _PUBLISHED, _DROPPED, _LAST_READ_ID, _FIXED = range(7)
+#shared control state written by the control loop and read by the worker, float64 slots
+_TILT, _GYRO_X, _GYRO_Y, _GYRO_Z, _TILT_VALID, _GYRO_VALID = range(6)
+
+
+class SharedFrameRing(object):
+    """
+    A FrameRingBuffer whose frames and bookkeeping live in multiprocessing.shared_memory, so a frame written in one
+    process is read in another without being copied or pickled. The interface matches FrameRingBuffer, so a
+    CaptureThread can fill it, and the writer again never touches the newest frame or a frame a reader holds.\n
+    Several readers are supported (the worker's detectors and the control loop's frame logging), each passes its
+    reader index. Use get_handle() to pass the ring to another process and SharedFrameRing.attach() there.
+    """
+    def __init__(self, shape:tuple=(480, 640, 3), slots:int=4, readers:int=2, dtype=np.uint8, lock=None, _names:tuple=None):
+        assert slots >= 2 + readers, "[ERR] The ring needs a slot per reader plus the writing and newest slots."
+        self.__shape = tuple(shape)
+        self.__slots = slots
+        self.__readers = readers
+        self.__dtype = np.dtype(dtype)
+        self.__lock = multiprocessing.Lock() if lock is None else lock
+        self.__owner = _names is None
+        frame_bytes = slots * int(np.prod(self.__shape)) * self.__dtype.itemsize
+        header_bytes = (_FIXED + 2 * slots + readers) * 8
+        if self.__owner:
+            self.__frames_shm = shared_memory.SharedMemory(create=True, size=frame_bytes)
+            self.__header_shm = shared_memory.SharedMemory(create=True, size=header_bytes)
+        else:
+            self.__frames_shm = shared_memory.SharedMemory(name=_names[0])
+            self.__header_shm = shared_memory.SharedMemory(name=_names[1])
+        self.__buffers = np.ndarray((slots,) + self.__shape, dtype=self.__dtype, buffer=self.__frames_shm.buf)
+        header = np.ndarray((_FIXED + 2 * slots + readers,), dtype=np.int64, buffer=self.__header_shm.buf)
+        self.__header = header[:_FIXED]
+        self.__frame_ids = header[_FIXED:_FIXED + slots]
+        self.__timestamps = header[_FIXED + slots:_FIXED + 2 * slots].view(np.float64)
+        self.__reading = header[_FIXED + 2 * slots:]
+        if self.__owner:
+            self.__buffers.fill(0)
+            self.__header[:] = (0, -1, 0, 0, 0, -1)
+            self.__frame_ids.fill(-1)
+            self.__timestamps.fill(0.0)
+            self.__reading.fill(-1)
+
+    def get_handle(self):
+        """returns what attach() needs to open this ring in another process (names, layout and the lock)"""
+        return ((self.__frames_shm.name, self.__header_shm.name), self.__shape, self.__slots, self.__readers,
+                self.__dtype.str, self.__lock)
+
+    @classmethod
+    def attach(cls, handle):
+        """opens a ring created in another process from its get_handle()"""
+        names, shape, slots, readers, dtype, lock = handle
+        return cls(shape, slots, readers, dtype, lock, _names=names)
+
+    def get_shape(self):
+        return self.__shape
+
+    def get_write_buffer(self):
+        """returns the buffer the writer should fill next"""
+        return self.__buffers[self.__header[_WRITE_SLOT]]
+
+    def publish(self, timestamp:float=None):
+        """
+        marks the write buffer as the newest finished frame, and moves the writer on to a free slot.\n
+        returns the id given to the published frame.
+        """
+        with self.__lock:
+            header = self.__header
+            latest = header[_LATEST_SLOT]
+            if (latest != -1) and (self.__frame_ids[latest] > header[_LAST_READ_ID]):
+                # the previous frame was never read before being replaced
+                header[_DROPPED] += 1
+            frame_id = int(header[_NEXT_ID])
+            header[_NEXT_ID] += 1
+            write_slot = header[_WRITE_SLOT]
+            self.__frame_ids[write_slot] = frame_id
+            self.__timestamps[write_slot] = time.time() if timestamp is None else timestamp
+            header[_LATEST_SLOT] = write_slot
+            header[_PUBLISHED] += 1
+            for slot in range(self.__slots):
+                if (slot != write_slot) and (slot not in self.__reading):
+                    header[_WRITE_SLOT] = slot
+                    #the frame in it is about to be overwritten, get_frame() must not find it any more
+                    self.__frame_ids[slot] = -1
+                    break
+        return frame_id
+
+    def get_latest(self, reader:int=0):
+        """
+        returns (frame_id, timestamp, frame) for the newest finished frame, or (-1, 0.0, None) if no frame has
+        been captured yet. The frame is a view into shared memory and stays valid until this reader's next call.
+        """
+        with self.__lock:
+            latest = self.__header[_LATEST_SLOT]
+            if latest == -1:
+                return (-1, 0.0, None)
+            self.__reading[reader] = latest
+            self.__header[_LAST_READ_ID] = max(self.__header[_LAST_READ_ID], self.__frame_ids[latest])
+            return (int(self.__frame_ids[latest]), float(self.__timestamps[latest]), self.__buffers[latest])
+
+    def get_frame(self, frame_id:int, reader:int=0):
+        """
+        returns the frame with this id, held for the reader like get_latest(), or None once its slot has been given
+        back to the writer.
+        """
+        if frame_id < 0:
+            return None
+        with self.__lock:
+            slots = np.nonzero(self.__frame_ids == frame_id)[0]
+            if len(slots) == 0:
+                return None
+            self.__reading[reader] = slots[0]
+            return self.__buffers[slots[0]]
+
+    def release(self, reader:int=0):
+        """lets the writer reuse the slot this reader holds"""
+        with self.__lock:
+            self.__reading[reader] = -1
+
+    def get_counters(self):
+        """returns a dictionary with the number of published and dropped (never read) frames"""
+        with self.__lock:
+            return {"published": int(self.__header[_PUBLISHED]), "dropped": int(self.__header[_DROPPED])}
+
+    def close(self):
+        """detaches from the shared memory, the creating process also frees it"""
+        self.__buffers = self.__header = self.__frame_ids = self.__timestamps = self.__reading = None
+        self.__frames_shm.close()
+        self.__header_shm.close()
+        if self.__owner:
+            self.__frames_shm.unlink()
+            self.__header_shm.unlink()
+
+
+def _worker_main(camera, options:dict, ring_handle, state, connection, stop_event):
+    """the vision process: captures into the shared ring and sends a compact result for every new frame"""
+    from Camera_Util import detect_buoys, detect_apriltags, configure_buoy_detector
+    from Frame_Capture import CaptureThread
+    from Floor_ROI import FloorROI
+    from Motion_Gate import MotionGate, DETECT, DISCARD
+    from Sphere_Detector import detect_spheres_and_buoys, configure_sphere_detector
+    from Vision_Frame import VisionFrame
+
+    ring = SharedFrameRing.attach(ring_handle)
+    #module level detector settings made in the parent after the fork never reach this process, so they are made here
+    if (options["buoy_pyramid_level"] > 0) or (options["capture_format"] == "yuv"):
+        configure_buoy_detector(pyramid_level=options["buoy_pyramid_level"], capture_format=options["capture_format"])
+    if options["sphere_detection"] and (options["capture_format"] == "yuv"):
+        configure_sphere_detector(capture_format=options["capture_format"])
+    if camera is None:
+        import picamera
+        camera = picamera.PiCamera()
+    camera.resolution = options["resolution"]
+    camera.framerate = options["framerate"]
+    time.sleep(0.1) #camera warm up time
+    capture = CaptureThread(camera, ring, capture_format=options["capture_format"], verbose=options["verbose"])
+    capture.start()
+    floor_roi = FloorROI(resolution=options["resolution"]) if options["floor_roi"] else None
+    motion_gate = MotionGate() if options["motion_gating"] else None
+    last_id = -1
+    try:
+        while not stop_event.is_set():
+            frame_id, timestamp, buffer = capture.get_latest()
+            if (buffer is None) or (frame_id == last_id):
+                time.sleep(0.002)
+                continue
+            last_id = frame_id
+            if options["capture_format"] == "yuv":
+                frame = VisionFrame.from_yuv(buffer, options["resolution"], frame_id, timestamp)
+            else:
+                frame = VisionFrame(buffer, frame_id, timestamp)
+            gyro_rate = tuple(state[_GYRO_X:_GYRO_Z + 1]) if state[_GYRO_VALID] else None
+            start = time.perf_counter()
+            decision = DETECT if motion_gate is None else motion_gate.decide(frame, gyro_rate)
+            result = {"frame_id": frame_id, "timestamp": timestamp, "decision": decision, "buoys": None, "spheres": None,
+                      "tags": None}
+            if decision == DETECT:
+                top_row = 0
+                if (floor_roi is not None) and state[_TILT_VALID]:
+                    top_row = floor_roi.top_row(state[_TILT])
+                if options["sphere_detection"]:
+                    #one pass finds the spheres and the buoy records
+                    result["spheres"], result["buoys"] = detect_spheres_and_buoys(frame, top_row)
+                else:
+                    result["buoys"], _, _ = detect_buoys(frame, top_row)
+                if options["tag_detection"]:
+                    result["tags"] = detect_apriltags(frame)
+                if motion_gate is not None:
+                    motion_gate.add_detect_time(time.perf_counter() - start)
+            result["detect_time"] = time.perf_counter() - start
+            if decision != DISCARD:
+                connection.send(result)
+    finally:
+        capture.stop()
+        if hasattr(camera, "close"):
+            camera.close()
+        connection.close()
+        ring.close()
+
+
+class VisionWorker(object):
+    """
+    Runs capture and detection in a separate process, so a slow frame costs another core rather than the control
+    loop's time slice (the GIL is not shared). Frames are written into a SharedFrameRing, and a compact result per
+    frame (frame id, timestamp, motion gate decision, DETECTION_DTYPE buoy records and optionally the spheres and
+    TAG_DTYPE tags) comes
+    back over a pipe. poll() never blocks, so the control loop's cost is a pipe read whatever vision takes.\n
+    The gyro rate and camera tilt the worker needs are passed through a small shared array with set_state().\n
+    Start the worker before other threads (the frame writer) so the fork does not copy them mid-operation. The camera
+    is opened in the worker, pass camera=None for the PiCamera or a Frame_Capture.FakeCamera.
+    """
+    def __init__(self, camera=None, capture_format:str="bgr", resolution:tuple=(640, 480), framerate:float=24,
+                 motion_gating:bool=False, floor_roi:bool=False, sphere_detection:bool=False, tag_detection:bool=False,
+                 buoy_pyramid_level:int=0, slots:int=4, verbose:bool=False):
+        from Frame_Capture import yuv_buffer_shape
+        width, height = resolution
+        shape = yuv_buffer_shape(resolution) if capture_format == "yuv" else (height, width, 3)
+        self.__ring = SharedFrameRing(shape, slots=slots, readers=2)
+        self.__state = multiprocessing.RawArray('d', 6)
+        self.__stop_event = multiprocessing.Event()
+        self.__connection, worker_connection = multiprocessing.Pipe(duplex=False)
+        self.__verbose = verbose
+        options = {"capture_format": capture_format, "resolution": tuple(resolution), "framerate": framerate,
+                   "motion_gating": motion_gating, "floor_roi": floor_roi, "sphere_detection": sphere_detection,
+                   "tag_detection": tag_detection, "buoy_pyramid_level": buoy_pyramid_level, "verbose": verbose}
+        self.__process = multiprocessing.Process(target=_worker_main, daemon=True,
+                                                 args=(camera, options, self.__ring.get_handle(), self.__state,
+                                                       worker_connection, self.__stop_event))
+        self.__process.start()
+        worker_connection.close()
+
+        self.__results = 0
+        self.__detected = 0
+        self.__latency_sum = 0.0
+        self.__latency_max = 0.0
+        self.__detect_time_sum = 0.0
+        self.__ring_counters = None
+
+    def set_state(self, gyro_rate=None, camera_tilt:float=None):
+        """gyro_rate => (x, y, z) deg/s (ADCS.get_gyro()), camera_tilt => CameraMount top servo degrees, None if unknown"""
+        if camera_tilt is not None:
+            self.__state[_TILT] = camera_tilt
+        self.__state[_TILT_VALID] = camera_tilt is not None
+        if gyro_rate is not None:
+            self.__state[_GYRO_X:_GYRO_Z + 1] = tuple(np.broadcast_to(np.asarray(gyro_rate, dtype=np.float64), (3,)))
+        self.__state[_GYRO_VALID] = gyro_rate is not None
+
+    def poll(self):
+        """
+        returns the newest result sent since the last call, or None. Older results are dropped, but a DETECT result
+        is kept over later REUSE ones so fresh detections are never skipped.
+        """
+        newest = None
+        try:
+            while self.__connection.poll():
+                result = self.__connection.recv()
+                self.__results += 1
+                latency = time.time() - result["timestamp"]
+                self.__latency_sum += latency
+                self.__latency_max = max(self.__latency_max, latency)
+                self.__detect_time_sum += result["detect_time"]
+                if result["buoys"] is not None:
+                    self.__detected += 1
+                    newest = result
+                elif (newest is None) or (newest["buoys"] is None):
+                    newest = result
+        except (EOFError, OSError):
+            if(self.__verbose):
+                print("[ERR] The vision worker has stopped.")
+        return newest
+
+    def get_frame(self, frame_id:int):
+        """returns the shared frame a result was detected on, or None once the camera has overwritten it"""
+        return self.__ring.get_frame(frame_id, reader=1)
+
+    def release_frame(self):
+        self.__ring.release(reader=1)
+
+    def is_alive(self):
+        return self.__process.is_alive()
+
+    def get_counters(self):
+        """
+        returns a dictionary with the ring counters, the results received and detected, the mean/max latency from
+        capture to result in seconds and the worker's mean detection time.
+        """
+        counters = self.__ring.get_counters() if self.__ring_counters is None else dict(self.__ring_counters)
+        counters["results"] = self.__results
+        counters["detected"] = self.__detected
+        counters["latency_mean"] = (self.__latency_sum / self.__results) if self.__results else 0.0
+        counters["latency_max"] = self.__latency_max
+        counters["detect_time_mean"] = (self.__detect_time_sum / self.__results) if self.__results else 0.0
+        return counters
+
+    def stop(self, timeout:float=2.0):
+        """stops the worker process and frees the shared memory"""
+        self.__stop_event.set()
+        self.__process.join(timeout)
+        if self.__process.is_alive():
+            self.__process.terminate()
+            self.__process.join(timeout)
+        self.__connection.close()
+        self.__ring_counters = self.__ring.get_counters()
+        self.__ring.close()
+
+
+if __name__ == '__main__':
+    #replays the recorded frames through a worker while a fake control loop measures its own tick jitter
+    from Frame_Capture import FakeCamera
+    worker = VisionWorker(FakeCamera('./Frames'), verbose=True)
+    ticks = []
+    last = time.perf_counter()
+    for tick in range(500):
+        result = worker.poll()
+        if (result is not None) and (result["buoys"] is not None) and len(result["buoys"]):
+            print(f"[INFO] frame {result['frame_id']}: {len(result['buoys'])} buoy(s) at {result['buoys']['bearing']}")
+        time.sleep(0.01)
+        now = time.perf_counter()
+        ticks.append(now - last)
+        last = now
+    worker.stop()
+    print(f"[INFO] control tick mean {1000*np.mean(ticks):.2f} ms, max {1000*np.max(ticks):.2f} ms")
+    print(f"[INFO] {worker.get_counters()}")